@@ -0,0 +1,88 @@
+"""
+Benchmark the daily staking calculation end to end on a synthetic ledger.
+
+Times DigitalMarketplace.calculate_staking_rewards(workers=N), which
+includes laying out the ledger, starting the process pool, the reward
+kernel and merging rewards back into the ledger. The layout and kernel
+are also timed on their own, and each worker count is reported with its
+speedup and parallel efficiency (speedup / workers) over one worker.
+
+The default ledger has 10^7 holders, the scale the sharding targets; it
+takes a few GB of memory, so pass a smaller --holders for a quick run.
+
+Usage:
+    python benchmarks/bench_sharded_staking.py --workers 1 2 4 8
+    python benchmarks/bench_sharded_staking.py --holders 1000000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from digital_marketplace.config import DECIMALS, STAKING_THRESHOLD_USDT
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.sharding import compute_rewards_sharded, layout_holders
+from digital_marketplace.utils import PriceOracle
+
+
+def synthetic_ledger(holders: int, seed: int = 0):
+    """
+    Build a synthetic address to balance ledger.
+
+    Balances are log-uniform between 1 token and 10x the staking threshold,
+    so a realistic fraction of holders is eligible. Addresses are 58
+    characters, like Algorand addresses.
+    """
+    rng = np.random.default_rng(seed)
+    high = np.log(STAKING_THRESHOLD_USDT * 10)
+    balances = (np.exp(rng.uniform(0, high, holders)) * (10 ** DECIMALS)).astype(np.int64)
+    return {f"{i:058d}": int(balance) for i, balance in enumerate(balances)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--holders", type=int, default=10_000_000,
+                        help="Synthetic ledger size (default: 10^7)")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                        help="Worker counts to compare; 1 is always run as the baseline")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    workers_list = sorted(set(args.workers) | {1})
+
+    print(f"holders={args.holders:,} cpus={os.cpu_count()}")
+    holders = synthetic_ledger(args.holders)
+    oracle = PriceOracle(fetch=lambda: 0.1945)
+    baseline = kernel_baseline = None
+    for workers in workers_list:
+        best = layout_best = kernel_best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            addresses, balances, bounds = layout_holders(holders, max(1, workers * 4))
+            layout_best = min(layout_best, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            compute_rewards_sharded(balances, bounds, 0.1945, workers)
+            kernel_best = min(kernel_best, time.perf_counter() - start)
+
+            contract = DigitalMarketplace(None, "CREATOR", None, "", price_oracle=oracle)
+            contract.token_holders = holders
+            contract.last_staking_calculation = 0
+            start = time.perf_counter()
+            contract.calculate_staking_rewards(workers=workers)
+            best = min(best, time.perf_counter() - start)
+
+        baseline = baseline or best
+        kernel_baseline = kernel_baseline or kernel_best
+        speedup = baseline / best
+        print(f"workers={workers:<3} total={best:.3f}s layout={layout_best:.3f}s "
+              f"kernel={kernel_best:.3f}s holders/s={args.holders / best:,.0f} "
+              f"speedup={speedup:.2f}x efficiency={speedup / workers:.0%} "
+              f"kernel_speedup={kernel_baseline / kernel_best:.2f}x "
+              f"holders/s/worker={args.holders / best / workers:,.0f} "
+              f"credited={len(contract.staking_rewards):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Change feed of ledger mutations for the Digital Marketplace.
+
+The contract publishes a MutationEvent for every balance or reward it
+changes. Subscribers read events through a blocking iterator or an async
+iterator. Each subscriber has a bounded buffer, and publishing never blocks:
+a coalescing subscriber merges queued events for the same address and
+field, and a subscriber that still falls behind receives a gap event
+telling it to resynchronise instead of stalling the contract.
+"""
+import asyncio
+import itertools
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, List, NamedTuple, Optional
+
+# Mutated fields
+FIELD_BALANCE = "balance"
+FIELD_REWARD = "reward"
+
+# Operation of the event sent when a subscriber has dropped events; its
+# sequence is the first dropped event and ``new`` the total dropped so far
+OPERATION_GAP = "gap"
+
+
+class MutationEvent(NamedTuple):
+    """A change to one address's token balance or pending reward."""
+    sequence: int
+    operation: str
+    address: str
+    field: str
+    old: int
+    new: int
+    txid: Optional[str] = None
+    round: Optional[int] = None
+
+
+class Subscription:
+    def __init__(self, feed: "ChangeFeed", max_buffer: int, coalesce: bool):
+        """
+        Initialize a subscription; use ChangeFeed.subscribe instead.
+
+        Args:
+            feed: The feed this subscription reads from
+            max_buffer: Maximum number of buffered events
+            coalesce: Merge buffered events for the same address and field
+        """
+        self._feed = feed
+        self.max_buffer = max_buffer
+        self.coalesce = coalesce
+        self.dropped = 0
+        self.closed = False
+
+        self._queue: Deque[MutationEvent] = deque()
+        self._pending: "OrderedDict[tuple, MutationEvent]" = OrderedDict()
+        self._gap_from: Optional[int] = None
+        self._cond = threading.Condition()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._pending) if self.coalesce else len(self._queue)
+
+    def _offer(self, event: MutationEvent) -> None:
+        """Buffer an event without ever blocking the publisher."""
+        with self._cond:
+            if self.closed:
+                return
+
+            if self._gap_from is not None:
+                # Drop everything until the consumer has seen the gap
+                self.dropped += 1
+            elif self.coalesce:
+                key = (event.address, event.field)
+                previous = self._pending.pop(key, None)
+                if previous is not None:
+                    event = event._replace(old=previous.old)
+                if previous is not None or len(self._pending) < self.max_buffer:
+                    self._pending[key] = event
+                else:
+                    self._overflow(event)
+            elif len(self._queue) < self.max_buffer:
+                self._queue.append(event)
+            else:
+                self._overflow(event)
+
+            self._cond.notify()
+        self._wake_async()
+
+    def _overflow(self, event: MutationEvent) -> None:
+        self.dropped += 1
+        if self._gap_from is None:
+            self._gap_from = event.sequence
+
+    def _take(self) -> Optional[MutationEvent]:
+        """Pop the next event; the caller must hold the condition."""
+        if self._gap_from is not None:
+            # Report the gap once the buffered events before it are drained
+            buffered = self._pending if self.coalesce else self._queue
+            if not buffered:
+                gap = MutationEvent(self._gap_from, OPERATION_GAP, "", "", 0, self.dropped)
+                self._gap_from = None
+                return gap
+        if self.coalesce:
+            if self._pending:
+                return self._pending.popitem(last=False)[1]
+        elif self._queue:
+            return self._queue.popleft()
+        return None
+
+    def get(self, timeout: Optional[float] = None) -> Optional[MutationEvent]:
+        """
+        Wait for the next event.
+
+        Args:
+            timeout: Seconds to wait, or None to wait until an event or close
+
+        Returns:
+            Optional[MutationEvent]: The event, or None on timeout or close
+        """
+        with self._cond:
+            event = self._take()
+            while event is None and not self.closed:
+                if not self._cond.wait(timeout):
+                    return None
+                event = self._take()
+            return event
+
+    def __iter__(self):
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+    def _wake_async(self) -> None:
+        if self._loop is not None and self._ready is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # The consumer's event loop has been closed
+                self._loop = None
+
+    def __aiter__(self):
+        return self._aiterate()
+
+    async def _aiterate(self):
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        while True:
+            with self._cond:
+                event = self._take()
+                if event is None:
+                    if self.closed:
+                        return
+                    self._ready.clear()
+            if event is not None:
+                yield event
+            else:
+                await self._ready.wait()
+
+    def close(self) -> None:
+        """Stop receiving events and end any waiting iterators."""
+        self._feed._unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._wake_async()
+
+
+class ChangeFeed:
+    def __init__(self):
+        """Initialize a change feed with no subscribers."""
+        self._subscribers: List[Subscription] = []
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether anyone is subscribed; publishers may skip work otherwise."""
+        return bool(self._subscribers)
+
+    def subscribe(self, max_buffer: int = 10_000, coalesce: bool = False) -> Subscription:
+        """
+        Subscribe to mutation events.
+
+        Args:
+            max_buffer: Maximum buffered events before events are dropped
+            coalesce: Merge buffered events for the same address and field,
+                keeping the first old value and the latest new value
+
+        Returns:
+            Subscription: Iterate it (sync or async) to receive events
+        """
+        subscription = Subscription(self, max_buffer, coalesce)
+        with self._lock:
+            # Copy on write so publishing can iterate without the lock
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+
+    def publish(self, operation: str, address: str, field: str, old: int, new: int,
+                txid: Optional[str] = None, round: Optional[int] = None) -> None:
+        """
+        Publish a mutation to every subscriber.
+
+        Args:
+            operation: The contract operation (deposit, withdraw, stake, claim, ...)
+            address: The address whose value changed
+            field: FIELD_BALANCE or FIELD_REWARD
+            old: Value before the change
+            new: Value after the change
+            txid: Transaction ID that caused the change, if any
+            round: Confirmed round of the transaction, if known
+        """
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        event = MutationEvent(next(self._sequence), operation, address, field,
+                              old, new, txid, round)
+        for subscription in subscribers:
+            subscription._offer(event)
+
+    def close(self) -> None:
+        """Close every subscription."""
+        for subscription in list(self._subscribers):
+            subscription.close()
@@ -0,0 +1,542 @@
+"""
+Command line interface for Digital Marketplace operations.
+
+Heavy dependencies (algosdk, requests, numpy) are imported inside the
+subcommands that need them, so quick commands such as ``quote`` and
+``balance`` start without loading them.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+# File deploy writes the asset ID to
+SUBMISSION_FILE = "workshop-submission.txt"
+
+DEFAULT_NODE = "https://testnet-api.algonode.cloud"
+
+# Validity window of distribute payouts, well inside MAX_TXN_LIFE so a
+# payout left in flight can be resolved on chain by the next run
+PAYOUT_VALIDITY_ROUNDS = 100
+
+
+def _algod_addresses() -> List[str]:
+    return os.getenv("ALGORAND_NODE", DEFAULT_NODE).split(",")
+
+
+def _algod_client():
+    """Build an algod client (a pool when several nodes are configured)."""
+    from algosdk.v2client import algod
+
+    addresses = _algod_addresses()
+    token = os.getenv("ALGORAND_TOKEN", "")
+    if len(addresses) > 1:
+        from .pool import AlgodClientPool
+
+        client = AlgodClientPool.from_addresses(addresses, token)
+        client.check_health()
+        client.start()
+        return client
+    return algod.AlgodClient(token, addresses[0])
+
+
+def _asset_id(args) -> Optional[int]:
+    if args.asset_id is not None:
+        return args.asset_id
+    if os.path.exists(SUBMISSION_FILE):
+        with open(SUBMISSION_FILE) as f:
+            content = f.read().strip()
+        if content.isdigit():
+            return int(content)
+    return None
+
+
+def load_state(contract, path: str) -> None:
+    """
+    Load ledger state from a JSON state file into a contract.
+
+    Args:
+        contract: The DigitalMarketplace to populate
+        path: Path of the state file; missing files are ignored
+    """
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        state = json.load(f)
+    contract.asset_id = state.get("asset_id")
+    contract.token_holders = state.get("token_holders", {})
+    contract.staking_rewards = state.get("staking_rewards", {})
+    contract.pending_payouts = state.get("pending_payouts", {})
+    contract.last_staking_calculation = state.get(
+        "last_staking_calculation", contract.last_staking_calculation
+    )
+    contract.staking_sweep = state.get("staking_sweep")
+
+
+def save_state(contract, path: str) -> None:
+    """
+    Atomically write a contract's ledger state to a JSON state file.
+
+    Args:
+        contract: The DigitalMarketplace to save
+        path: Path of the state file
+    """
+    state = {
+        "asset_id": contract.asset_id,
+        "token_holders": contract.token_holders,
+        "staking_rewards": contract.staking_rewards,
+        "pending_payouts": contract.pending_payouts,
+        "last_staking_calculation": contract.last_staking_calculation,
+        "staking_sweep": contract.staking_sweep,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _creator_contract(args, algod_client=None):
+    from algosdk import account, mnemonic
+    from .contract import DigitalMarketplace
+
+    creator_mnemonic = os.getenv("CREATOR_MNEMONIC")
+    if creator_mnemonic:
+        private_key = mnemonic.to_private_key(creator_mnemonic)
+        address = account.address_from_private_key(private_key)
+    else:
+        private_key, address = None, os.getenv("CREATOR_ADDRESS", "")
+
+    contract = DigitalMarketplace(
+        algod_client=algod_client,
+        creator_address=address,
+        creator_private_key=private_key,
+        github_handle=os.getenv("GITHUB_HANDLE", "")
+    )
+    load_state(contract, args.state)
+    return contract
+
+
+def cmd_deploy(args) -> int:
+    from algosdk import account, mnemonic
+    from .contract import DigitalMarketplace
+
+    github_handle = os.getenv("GITHUB_HANDLE")
+    if not github_handle:
+        raise ValueError("GITHUB_HANDLE environment variable is required")
+
+    algod_client = _algod_client()
+
+    # Create new account for contract deployment
+    private_key, address = account.generate_account()
+    print(f"Created new account: {address}")
+    print(f"Save this mnemonic safely: {mnemonic.from_private_key(private_key)}")
+
+    contract = DigitalMarketplace(
+        algod_client=algod_client,
+        creator_address=address,
+        creator_private_key=private_key,
+        github_handle=github_handle
+    )
+
+    try:
+        asset_id = contract.create_token()
+        print(f"Token created successfully with Asset ID: {asset_id}")
+
+        with open(SUBMISSION_FILE, "w") as f:
+            f.write(str(asset_id))
+
+        print(f"Deployment complete! Application ID saved to {SUBMISSION_FILE}")
+        return 0
+
+    except Exception as e:
+        print(f"Error deploying contract: {e}")
+        return 1
+
+
+def cmd_quote(args) -> int:
+    from .config import MarketplaceConfig
+    from .utils import format_amount, quote_deposit, quote_withdrawal
+
+    config = MarketplaceConfig() if args.fee is None else MarketplaceConfig(fixed_fee_usdt=args.fee)
+    if args.side == "deposit":
+        tokens = quote_deposit(args.amount, config, args.price)
+        if tokens <= 0:
+            print("Deposit amount too small to cover fees")
+            return 1
+        print(f"{format_amount(args.amount, 6)} ALGO -> {format_amount(tokens)} DMARKET")
+    else:
+        algo = quote_withdrawal(args.amount, config, args.price)
+        if algo <= 0:
+            print("Withdrawal amount too small to cover fees")
+            return 1
+        print(f"{format_amount(args.amount)} DMARKET -> {format_amount(algo, 6)} ALGO")
+    return 0
+
+
+def cmd_balance(args) -> int:
+    # Plain REST call so a balance check does not pay for importing algosdk
+    from urllib.request import Request, urlopen
+    from .utils import format_amount
+
+    node = _algod_addresses()[0].rstrip("/")
+    request = Request(f"{node}/v2/accounts/{args.address}")
+    token = os.getenv("ALGORAND_TOKEN")
+    if token:
+        request.add_header("X-Algo-API-Token", token)
+
+    with urlopen(request, timeout=10) as response:
+        account_info = json.load(response)
+
+    print(f"ALGO: {format_amount(account_info.get('amount', 0), 6)}")
+
+    asset_id = _asset_id(args)
+    if asset_id is not None:
+        holding = next(
+            (a for a in account_info.get("assets", []) if a.get("asset-id") == asset_id),
+            None
+        )
+        if holding is None:
+            print(f"DMARKET ({asset_id}): not opted in")
+        else:
+            print(f"DMARKET ({asset_id}): {format_amount(holding.get('amount', 0))}")
+
+    if args.state and os.path.exists(args.state):
+        with open(args.state) as f:
+            rewards = json.load(f).get("staking_rewards", {}).get(args.address, 0)
+        print(f"Pending rewards: {format_amount(rewards, 6)} ALGO")
+    return 0
+
+
+def cmd_stake_run(args) -> int:
+    contract = _creator_contract(args)
+    before = dict(contract.staking_rewards)
+
+    journal = None
+    if args.budget is not None:
+        from .sweep import StakingSweep, SweepJournal
+
+        # Journal every tick so an interrupted sweep resumes from its
+        # position without rewriting the whole state file per tick
+        journal = SweepJournal(f"{args.state}.sweep")
+        sweep = StakingSweep(contract, chunk_size=args.chunk_size)
+        if not journal.replay(contract) and (contract.staking_sweep is not None or sweep.begin()):
+            journal.start(contract.staking_sweep)
+        progress = sweep.run(args.budget, args.pause, on_tick=journal.record)
+        print(f"Swept {progress['processed']} holders in {progress['ticks']} ticks")
+    else:
+        contract.calculate_staking_rewards(workers=args.workers)
+
+    credited = sum(
+        1 for address, reward in contract.staking_rewards.items()
+        if reward != before.get(address, 0)
+    )
+    save_state(contract, args.state)
+    if journal is not None:
+        journal.clear()
+    print(f"Credited staking rewards to {credited} holders")
+    return 0
+
+
+def cmd_distribute(args) -> int:
+    from .scheduler import SubmissionScheduler
+
+    algod_client = _algod_client()
+    contract = _creator_contract(args, algod_client)
+    if contract.creator_private_key is None:
+        raise ValueError("CREATOR_MNEMONIC environment variable is required")
+    contract.scheduler = SubmissionScheduler(algod_client, rate=args.rate, burst=args.rate)
+
+    # Settle payouts a previous run sent before paying anyone again
+    for address, outcome in contract.resolve_payouts().items():
+        print(f"Payout to {address} from a previous run: {outcome}")
+    save_state(contract, args.state)
+
+    payable = [
+        address for address, reward in contract.staking_rewards.items()
+        if reward >= args.min_reward and address not in contract.pending_payouts
+    ]
+    paid = failed = in_flight = 0
+    try:
+        for address in payable:
+            try:
+                # The payout is saved as in flight before it is sent, so a
+                # crash or timeout leaves it to resolve_payouts on the next run
+                contract.claim_staking_rewards(
+                    address,
+                    on_pending=lambda: save_state(contract, args.state),
+                    validity_rounds=PAYOUT_VALIDITY_ROUNDS
+                )
+                paid += 1
+            except Exception as e:
+                print(f"Failed to pay {address}: {e}")
+                if address in contract.pending_payouts:
+                    in_flight += 1
+                else:
+                    failed += 1
+            save_state(contract, args.state)
+    finally:
+        contract.scheduler.close()
+
+    print(f"Paid {paid} holders, {failed} failed, {in_flight} in flight")
+    return 0 if failed == 0 and in_flight == 0 else 1
+
+
+def cmd_export(args) -> int:
+    from .export import export_ledger
+
+    with open(args.state) as f:
+        state = json.load(f)
+    manifest = export_ledger(
+        state.get("token_holders", {}), state.get("staking_rewards", {}),
+        args.out, args.format, args.chunk_size
+    )
+    print(f"Exported {manifest['rows']} holders to {args.out} ({manifest['format']})")
+    return 0
+
+
+def cmd_replay(args) -> int:
+    from .metrics import format_summary
+    from .replay import ReplayEngine, iter_log
+    from .simulator import LocalAlgodClient
+
+    speed = args.speed if args.speed > 0 else None
+    engine = ReplayEngine(LocalAlgodClient(round_time=args.round_time), speed=speed,
+                          algo_price=args.price)
+
+    profiler = None
+    if args.profile:
+        from .contract import DigitalMarketplace
+        from .profiling import SamplingProfiler
+
+        profiler = SamplingProfiler(sample_rate=args.profile_rate,
+                                    trace_allocations=args.profile_allocations)
+        profiler.attach(DigitalMarketplace)
+    try:
+        report = engine.run(iter_log(args.log))
+    finally:
+        if profiler is not None:
+            profiler.detach()
+
+    if profiler is not None:
+        stacks = profiler.write_collapsed(args.profile)
+        print(f"profile: {sum(profiler.profiled.values())} calls sampled, "
+              f"{stacks} stacks written to {args.profile}")
+        if args.profile_allocations:
+            stacks = profiler.write_collapsed(f"{args.profile}.alloc", allocations=True)
+            print(f"profile: {stacks} allocation stacks written to {args.profile}.alloc")
+
+    print(format_summary(report.summary()))
+    print(f"operations={report.operations} elapsed={report.elapsed:.3f}s "
+          f"throughput={report.throughput:,.0f} ops/s")
+    print(f"ledger digest: {report.digest}")
+    return 0
+
+
+async def _serve(service, contract, args) -> None:
+    import asyncio
+
+    server = await service.start(args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.sockets[0].getsockname()[1]}")
+
+    # Pick up ledger changes written to the state file by other commands
+    mtime = os.path.getmtime(args.state) if os.path.exists(args.state) else None
+    async with server:
+        while True:
+            await asyncio.sleep(args.reload_interval)
+            current = os.path.getmtime(args.state) if os.path.exists(args.state) else None
+            if current != mtime:
+                mtime = current
+                load_state(contract, args.state)
+                contract.ledger_version += 1
+
+
+def cmd_serve(args) -> int:
+    import asyncio
+    from .service import ReadService
+
+    contract = _creator_contract(args, _algod_client())
+    service = ReadService(contract, cache_ttl=args.cache_ttl, max_batch=args.max_batch)
+    try:
+        asyncio.run(_serve(service, contract, args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_loadtest(args) -> int:
+    from .loadtest import DEFAULT_MIX, LoadTest, parse_mix
+    from .metrics import format_summary
+    from .simulator import LocalAlgodClient
+    from .utils import format_amount
+
+    client = LocalAlgodClient(round_time=args.round_time, latency=args.latency,
+                              error_rate=args.error_rate)
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    load_test = LoadTest(client, users=args.users, rate=args.rate, duration=args.duration,
+                         mix=mix, mode=args.mode, algo_price=args.price)
+    report = load_test.run()
+
+    print(format_summary(report.summary()))
+    print(f"mode={report.mode} users={report.users} completed={report.completed} "
+          f"elapsed={report.elapsed:.1f}s throughput={report.throughput:,.1f} ops/s")
+    if not report.conserved:
+        print(f"Token ledger drifted from the total supply by "
+              f"{format_amount(report.drift)} DMARKET")
+        return 1
+    return 0
+
+
+def _time_command(argv: List[str], runs: int) -> float:
+    import subprocess
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "digital_marketplace.cli"] + argv,
+            stdout=subprocess.DEVNULL, check=True
+        )
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def cmd_bench(args) -> int:
+    # Startup latency of the quick commands, in fresh interpreters
+    quote_ms = _time_command(["quote", "deposit", "1000000", "--price", "0.2"], args.runs) * 1000
+    baseline_ms = _time_command(["--version"], args.runs) * 1000
+    print(f"startup: bare={baseline_ms:.1f}ms quote={quote_ms:.1f}ms (median of {args.runs})")
+
+    # Daily staking pass over a synthetic ledger
+    from .config import DECIMALS, STAKING_THRESHOLD_USDT
+    from .contract import DigitalMarketplace
+    from .utils import set_algo_price_usdt
+
+    set_algo_price_usdt(0.2)
+    step = STAKING_THRESHOLD_USDT * 2 * (10 ** DECIMALS) // max(args.holders, 1)
+    holders = {f"HOLDER_{i}": (i + 1) * step for i in range(args.holders)}
+
+    for workers in sorted({1, args.workers}):
+        contract = DigitalMarketplace(None, "CREATOR", None, "")
+        contract.token_holders = holders
+        contract.last_staking_calculation = 0
+
+        start = time.perf_counter()
+        try:
+            contract.calculate_staking_rewards(workers=workers)
+        except ImportError as e:
+            print(f"stake-run: workers={workers} skipped ({e})")
+            continue
+        elapsed = time.perf_counter() - start
+        print(f"stake-run: holders={args.holders} workers={workers} {elapsed * 1000:.1f}ms")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from . import __version__
+
+    parser = argparse.ArgumentParser(prog="dmarket", description="Digital Marketplace operations")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    deploy = subparsers.add_parser("deploy", help="Create a new account and token")
+    deploy.set_defaults(func=cmd_deploy)
+
+    quote = subparsers.add_parser("quote", help="Quote a deposit or withdrawal")
+    quote.add_argument("side", choices=["deposit", "withdraw"])
+    quote.add_argument("amount", type=int, help="microALGO to deposit or tokens to withdraw")
+    quote.add_argument("--price", type=float, help="ALGO price in USDT instead of the live price")
+    quote.add_argument("--fee", type=float,
+                       help="Fixed fee in USDT of the marketplace quoted instead of the default")
+    quote.set_defaults(func=cmd_quote)
+
+    balance = subparsers.add_parser("balance", help="Show an account's ALGO and token balance")
+    balance.add_argument("address")
+    balance.add_argument("--asset-id", type=int, help=f"Token asset ID (default: read {SUBMISSION_FILE})")
+    balance.add_argument("--state", help="State file to read pending rewards from")
+    balance.set_defaults(func=cmd_balance)
+
+    stake_run = subparsers.add_parser("stake-run", help="Run the daily staking reward calculation")
+    stake_run.add_argument("--state", required=True, help="Ledger state file")
+    stake_run.add_argument("--workers", type=int, default=1)
+    stake_run.add_argument("--budget", type=float,
+                           help="Sweep incrementally, spending at most this many seconds per tick")
+    stake_run.add_argument("--pause", type=float, default=0.0,
+                           help="Seconds between ticks of an incremental sweep")
+    stake_run.add_argument("--chunk-size", type=int, default=1000,
+                           help="Holders credited between checks of the tick budget")
+    stake_run.set_defaults(func=cmd_stake_run)
+
+    distribute = subparsers.add_parser("distribute", help="Pay out pending staking rewards")
+    distribute.add_argument("--state", required=True, help="Ledger state file")
+    distribute.add_argument("--min-reward", type=int, default=1, help="Smallest payout in microALGO")
+    distribute.add_argument("--rate", type=float, default=10.0, help="Payouts per second")
+    distribute.set_defaults(func=cmd_distribute)
+
+    export = subparsers.add_parser("export", help="Write a columnar snapshot of the ledger")
+    export.add_argument("--state", required=True, help="Ledger state file")
+    export.add_argument("--out", required=True, help="Snapshot directory")
+    export.add_argument("--format", choices=["npy", "parquet"], default="npy")
+    export.add_argument("--chunk-size", type=int, default=1_000_000)
+    export.set_defaults(func=cmd_export)
+
+    replay = subparsers.add_parser("replay", help="Replay a recorded operation log locally")
+    replay.add_argument("log", help="JSON lines operation log")
+    replay.add_argument("--speed", type=float, default=0,
+                        help="1 for real time, N for N times faster, 0 for maximum speed")
+    replay.add_argument("--price", type=float, default=0.1945, help="ALGO price in USDT")
+    replay.add_argument("--round-time", type=float, default=0.0,
+                        help="Seconds per round on the local node (0 confirms immediately)")
+    replay.add_argument("--profile", metavar="PATH",
+                        help="Write collapsed stacks of sampled contract calls to PATH")
+    replay.add_argument("--profile-rate", type=float, default=0.01,
+                        help="Fraction of contract calls profiled")
+    replay.add_argument("--profile-allocations", action="store_true",
+                        help="Also write tracemalloc allocation stacks to PATH.alloc")
+    replay.set_defaults(func=cmd_replay)
+
+    serve = subparsers.add_parser("serve", help="Serve balances, rewards and quotes over HTTP")
+    serve.add_argument("--state", required=True, help="Ledger state file")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--cache-ttl", type=float, default=1.0,
+                       help="Seconds token info and quotes are cached")
+    serve.add_argument("--max-batch", type=int, default=1000,
+                       help="Most addresses per batch request")
+    serve.add_argument("--reload-interval", type=float, default=1.0,
+                       help="Seconds between checks of the state file for changes")
+    serve.set_defaults(func=cmd_serve)
+
+    loadtest = subparsers.add_parser("loadtest", help="Drive concurrent users against a local node")
+    loadtest.add_argument("--users", type=int, default=100)
+    loadtest.add_argument("--rate", type=float, default=50.0, help="Arrivals per second")
+    loadtest.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    loadtest.add_argument("--mode", choices=["thread", "asyncio"], default="thread")
+    loadtest.add_argument("--mix", help="Operation weights, e.g. deposit=5,withdraw=3,claim=2")
+    loadtest.add_argument("--round-time", type=float, default=2.8,
+                          help="Seconds per round on the local node")
+    loadtest.add_argument("--latency", type=float, default=0.0, help="Seconds per node call")
+    loadtest.add_argument("--error-rate", type=float, default=0.0,
+                          help="Fraction of submissions failing with a transient error")
+    loadtest.add_argument("--price", type=float, default=0.1945, help="ALGO price in USDT")
+    loadtest.set_defaults(func=cmd_loadtest)
+
+    bench = subparsers.add_parser("bench", help="Measure startup and staking performance")
+    bench.add_argument("--runs", type=int, default=5)
+    bench.add_argument("--holders", type=int, default=100_000)
+    bench.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point for the ``dmarket`` console script."""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
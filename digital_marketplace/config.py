@@ -1,6 +1,7 @@
 """
 Configuration settings for the Digital Marketplace.
 """
+from typing import NamedTuple
 
 # Token configuration
 TOTAL_SUPPLY = 100_000_000  # 100 million tokens
@@ -11,4 +12,15 @@ FIXED_FEE_USDT = 0.0001945  # Fixed fee per transaction in USDT
 
 # Staking configuration
 STAKING_THRESHOLD_USDT = 10_000  # Minimum USDT value for staking rewards
-STAKING_REWARD_PERCENTAGE = 5  # 5% annual reward
\ No newline at end of file
+STAKING_REWARD_PERCENTAGE = 5  # 5% annual reward
+
+class MarketplaceConfig(NamedTuple):
+    """
+    Per-marketplace fee and staking settings.
+    
+    Defaults to the module settings above, so a marketplace created without
+    a config behaves as before; MarketplaceHost gives each deployment its own.
+    """
+    fixed_fee_usdt: float = FIXED_FEE_USDT
+    staking_threshold_usdt: float = STAKING_THRESHOLD_USDT
+    staking_reward_percentage: float = STAKING_REWARD_PERCENTAGE
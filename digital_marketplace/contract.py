@@ -1,31 +1,65 @@
 """
 Main contract implementation for the Digital Marketplace.
 """
-from typing import Dict, Optional, List, Tuple
+from typing import Callable, Dict, Optional, List, Tuple
 import base64
+import functools
+import threading
 
 from algosdk import account, mnemonic
 from algosdk.v2client import algod
 from algosdk.future import transaction
-from algosdk.error import AlgodHTTPError
+from algosdk.error import AlgodHTTPError, TransactionRejectedError
 
 from .config import (
     TOTAL_SUPPLY,
     DECIMALS,
-    FIXED_FEE_USDT,
-    STAKING_THRESHOLD_USDT,
-    STAKING_REWARD_PERCENTAGE
+    MarketplaceConfig
 )
 from .utils import (
     algo_to_usdt,
     usdt_to_algo,
+    get_algo_price_usdt,
     get_current_timestamp,
-    format_amount
+    format_amount,
+    PriceOracle
 )
+from .changefeed import ChangeFeed, FIELD_BALANCE, FIELD_REWARD
+from .history import RewardHistory, day_of
+from .idempotency import IdempotencyCache, derive_lease
+from .liquidity import CreatorLiquidity, Reservation
+from .versioning import VersionedLedger
+from .scheduler import (
+    SubmissionScheduler,
+    is_rejected,
+    last_valid_round,
+    LANE_WITHDRAWAL,
+    LANE_DEPOSIT,
+    LANE_REWARD
+)
+
+# Rounds a confirmed transaction stays visible to pending_transaction_info
+# (the consensus MaxTxnLife)
+MAX_TXN_LIFE = 1000
+
+# Outcomes of resolving an in-flight payout (see resolve_payouts)
+PAYOUT_PAID = "paid"
+PAYOUT_FAILED = "failed"
+PAYOUT_IN_FLIGHT = "in-flight"
+PAYOUT_UNKNOWN = "unknown"
 
 class DigitalMarketplace:
     def __init__(self, algod_client: algod.AlgodClient, creator_address: str, 
-                 creator_private_key: str, github_handle: str):
+                 creator_private_key: str, github_handle: str,
+                 scheduler: Optional[SubmissionScheduler] = None,
+                 change_feed: Optional[ChangeFeed] = None,
+                 clock: Optional[Callable[[], int]] = None,
+                 reward_history: Optional[RewardHistory] = None,
+                 liquidity: Optional[CreatorLiquidity] = None,
+                 config: Optional[MarketplaceConfig] = None,
+                 price_oracle: Optional[PriceOracle] = None,
+                 versioned_ledger: Optional[VersionedLedger] = None,
+                 log: Optional[Callable[[str], None]] = None):
         """
         Initialize the Digital Marketplace contract.
         
@@ -34,15 +68,201 @@ class DigitalMarketplace:
             creator_address: The Algorand address of the contract creator
             creator_private_key: The private key of the contract creator
             github_handle: The GitHub username of the deployer
+            scheduler: Optional submission scheduler; transactions are sent
+                inline when omitted
+            change_feed: Feed that balance and reward changes are published to
+            clock: Optional function returning the current UNIX timestamp,
+                e.g. a replay clock; defaults to get_current_timestamp
+            reward_history: Optional history that each staking run's
+                credited rewards are appended to
+            liquidity: Optional tracker of the creator's holdings; requests
+                the creator cannot cover are rejected before signing
+            config: Fee and staking settings; the config.py values when omitted
+            price_oracle: Optional oracle for the ALGO price; the shared
+                utils cache is used when omitted
+            versioned_ledger: Optional ledger that every balance change is
+                recorded in with its confirmed round, for as-of queries
+            log: Optional function the contract's progress and error
+                messages are written to; print when omitted
         """
         self.algod_client = algod_client
+        self.scheduler = scheduler
+        self.change_feed = change_feed or ChangeFeed()
+        self.idempotency = IdempotencyCache()
+        self.clock = clock
+        self.reward_history = reward_history
+        self.liquidity = liquidity
+        self.config = config or MarketplaceConfig()
+        self.price_oracle = price_oracle
+        self.versioned_ledger = versioned_ledger
+        self.log = log or print
         self.creator_address = creator_address
         self.creator_private_key = creator_private_key
         self.github_handle = github_handle
         self.asset_id = None
         self.token_holders: Dict[str, int] = {}
         self.staking_rewards: Dict[str, int] = {}
-        self.last_staking_calculation = get_current_timestamp()
+        # Reward payouts sent but not yet known to have landed, by holder:
+        # {"tx_id", "amount", "first_valid", "last_valid"} (see resolve_payouts)
+        self.pending_payouts: Dict[str, Dict] = {}
+        # Serializes read-modify-write balance updates; every deposit and
+        # withdrawal also moves the creator's balance
+        self._ledger_lock = threading.Lock()
+        # Incremented on every balance or reward change, e.g. for cache validation
+        self.ledger_version = 0
+        self.last_staking_calculation = self._now()
+        # Cursor of an incremental staking sweep in progress (see sweep.py)
+        self.staking_sweep: Optional[Dict] = None
+        # Per-bucket balance digests kept current by _set_balance, set by a
+        # Reconciler (see reconcile.py)
+        self.bucket_index = None
+
+    def _now(self) -> int:
+        """Get the current timestamp from the configured clock."""
+        if self.clock is not None:
+            return self.clock()
+        return get_current_timestamp()
+
+    def _algo_price(self) -> Optional[float]:
+        """Get the ALGO price from the configured oracle (None uses the utils cache)."""
+        if self.price_oracle is not None:
+            return self.price_oracle.price()
+        return None
+
+    def _send(self, signed_txns, lane: int = LANE_DEPOSIT) -> str:
+        """
+        Submit a signed transaction or atomic group.
+        
+        Args:
+            signed_txns: A signed transaction or a list forming an atomic group
+            lane: Priority lane used when a scheduler is configured
+            
+        Returns:
+            str: The transaction ID
+        """
+        if self.scheduler is not None:
+            return self.scheduler.send(signed_txns, lane)
+        
+        if isinstance(signed_txns, list):
+            return self.algod_client.send_transactions(signed_txns)
+        return self.algod_client.send_transaction(signed_txns)
+
+    def _reserve(self, algo: int = 0, tokens: int = 0, txns: int = 1) -> Reservation:
+        """Reserve creator holdings for a request when liquidity is tracked."""
+        if self.liquidity is None:
+            return Reservation(None, algo, tokens)
+        return self.liquidity.reserve(algo=algo, tokens=tokens, txns=txns)
+
+    def _submit(self, signed_txns, lane: int, reservation: Reservation) -> str:
+        """Send a request's transactions, settling its reservation if that fails."""
+        try:
+            return self._send(signed_txns, lane)
+        except Exception as e:
+            reservation.settle(e, last_valid_round(signed_txns))
+            raise
+
+    def _wait_settled(self, tx_id: str, reservation: Reservation, last_valid: int) -> dict:
+        """
+        Wait for a request's confirmation and settle its reservation.
+
+        A timeout leaves the reservation held, since the request may still
+        land before its last valid round.
+        """
+        try:
+            confirmed_txn = transaction.wait_for_confirmation(self.algod_client, tx_id, 4)
+        except Exception as e:
+            reservation.settle(e, last_valid)
+            raise
+        reservation.commit()
+        return confirmed_txn
+
+    @staticmethod
+    def _lease(address: str, idempotency_key: Optional[str], index: int) -> Optional[bytes]:
+        """Get the lease for a transaction of an idempotent request, if any."""
+        if idempotency_key is None:
+            return None
+        return derive_lease(address, idempotency_key, index)
+
+    def _finish_sent(self, address: str, idempotency_key: Optional[str],
+                     finish: Callable[[], Tuple[str, int]]) -> Tuple[str, int]:
+        """
+        Finish a request whose group was sent.
+
+        For an idempotent request, a retry after a failure here (e.g. a
+        confirmation timeout) runs ``finish`` again instead of sending a new
+        group. A group the node rejected releases the key.
+        """
+        if idempotency_key is None:
+            return finish()
+        
+        key = (address, idempotency_key)
+        self.idempotency.sent(key, finish)
+        try:
+            return finish()
+        except TransactionRejectedError:
+            self.idempotency.release(key)
+            raise
+
+    def _send_request(self, address: str, idempotency_key: Optional[str], signed_txns: list,
+                      lane: int, reservation: Reservation,
+                      finish: Callable[[str], Tuple[str, int]]) -> Tuple[str, int]:
+        """
+        Send a request's group and finish it.
+
+        For an idempotent request, ``finish`` is bound to the key with the
+        group's own transaction ID before anything is sent. A send error that
+        leaves the outcome unknown (a 5xx, a connection failure, a timeout)
+        keeps the key, so a retry waits for this group instead of building a
+        new one that the leases would reject. Only a group that can never
+        land releases the key.
+
+        Args:
+            address: The address making the request
+            idempotency_key: Optional client key
+            signed_txns: The signed group
+            lane: Priority lane used when a scheduler is configured
+            reservation: Creator holdings reserved for the request
+            finish: Waits for the group by transaction ID and updates the ledger
+
+        Returns:
+            Tuple[str, int]: The result of ``finish``
+        """
+        if idempotency_key is not None:
+            self.idempotency.sent((address, idempotency_key),
+                                  functools.partial(finish, signed_txns[0].get_txid()))
+        try:
+            tx_id = self._submit(signed_txns, lane, reservation)
+        except Exception as e:
+            if idempotency_key is not None and is_rejected(e):
+                self.idempotency.release((address, idempotency_key))
+            raise
+        self.log(f"Transaction ID: {tx_id}")
+        
+        return self._finish_sent(address, idempotency_key, functools.partial(finish, tx_id))
+
+    def _set_balance(self, operation: str, address: str, new_balance: int,
+                     tx_id: Optional[str] = None, confirmed_round: Optional[int] = None) -> None:
+        """Update a token balance and publish the change."""
+        old_balance = self.token_holders.get(address, 0)
+        self.token_holders[address] = new_balance
+        self.ledger_version += 1
+        if self.versioned_ledger is not None:
+            self.versioned_ledger.record(address, new_balance, confirmed_round, self._now())
+        if self.bucket_index is not None:
+            self.bucket_index.update(address, old_balance, new_balance)
+        if self.change_feed.active:
+            self.change_feed.publish(operation, address, FIELD_BALANCE,
+                                     old_balance, new_balance, tx_id, confirmed_round)
+
+    def _set_reward(self, operation: str, address: str, new_reward: int,
+                    tx_id: Optional[str] = None, confirmed_round: Optional[int] = None) -> None:
+        """Update a pending staking reward and publish the change."""
+        old_reward = self.staking_rewards.get(address, 0)
+        self.staking_rewards[address] = new_reward
+        self.ledger_version += 1
+        if self.change_feed.active:
+            self.change_feed.publish(operation, address, FIELD_REWARD,
+                                     old_reward, new_reward, tx_id, confirmed_round)
 
     def create_token(self) -> int:
         """
@@ -85,30 +305,93 @@ class DigitalMarketplace:
         
         # Submit the transaction to the network
         try:
-            tx_id = self.algod_client.send_transaction(signed_txn)
-            print(f"Transaction ID: {tx_id}")
+            tx_id = self._send(signed_txn)
+            self.log(f"Transaction ID: {tx_id}")
             
             # Wait for confirmation
             confirmed_txn = transaction.wait_for_confirmation(self.algod_client, tx_id, 4)
             asset_id = confirmed_txn["asset-index"]
-            print(f"Asset ID created: {asset_id}")
+            self.log(f"Asset ID created: {asset_id}")
             
             self.asset_id = asset_id
+            if self.liquidity is not None:
+                self.liquidity.asset_id = asset_id
+                self.liquidity.invalidate()
             
             # Initialize the creator's balance with the total supply
-            self.token_holders[self.creator_address] = TOTAL_SUPPLY * (10 ** DECIMALS)
+            self._set_balance("create", self.creator_address, TOTAL_SUPPLY * (10 ** DECIMALS),
+                              tx_id, confirmed_txn.get("confirmed-round"))
             
             return asset_id
         
         except AlgodHTTPError as e:
-            print(f"Failed to create asset: {e}")
+            self.log(f"Failed to create asset: {e}")
             raise
 
-    def deposit(self, sender_address: str, sender_private_key: str, algo_amount: int) -> Tuple[str, int]:
+    def opt_in(self, address: str, private_key: str) -> str:
+        """
+        Opt an account in to the token so it can receive deposits.
+        
+        Args:
+            address: The Algorand address to opt in
+            private_key: The private key of the address
+            
+        Returns:
+            str: Transaction ID
+        """
+        if self.asset_id is None:
+            raise ValueError("Token has not been created yet")
+        
+        params = self.algod_client.suggested_params()
+        
+        # An opt-in is a zero-amount transfer of the asset to oneself
+        txn = transaction.AssetTransferTxn(
+            sender=address,
+            sp=params,
+            receiver=address,
+            amt=0,
+            index=self.asset_id
+        )
+        signed_txn = txn.sign(private_key)
+        
+        try:
+            tx_id = self._send(signed_txn, LANE_DEPOSIT)
+            self.log(f"Transaction ID: {tx_id}")
+            
+            transaction.wait_for_confirmation(self.algod_client, tx_id, 4)
+            return tx_id
+        
+        except AlgodHTTPError as e:
+            self.log(f"Failed to opt in: {e}")
+            raise
+
+    def deposit(self, sender_address: str, sender_private_key: str, algo_amount: int,
+                idempotency_key: Optional[str] = None) -> Tuple[str, int]:
         """
         Deposit ALGO and receive equivalent tokens minus fees.
         Also stores the GitHub handle in a box.
+        
+        Args:
+            sender_address: The Algorand address of the sender
+            sender_private_key: The private key of the sender
+            algo_amount: The amount of ALGO to deposit in microALGO
+            idempotency_key: Optional client key; a retry with the same key
+                returns the original result instead of sending a new group
+            
+        Returns:
+            Tuple[str, int]: Transaction ID and tokens received
         """
+        if idempotency_key is None:
+            return self._deposit(sender_address, sender_private_key, algo_amount)
+        
+        return self.idempotency.run(
+            (sender_address, idempotency_key),
+            ("deposit", sender_address, algo_amount),
+            lambda: self._deposit(sender_address, sender_private_key, algo_amount, idempotency_key)
+        )
+
+    def _deposit(self, sender_address: str, sender_private_key: str, algo_amount: int,
+                 idempotency_key: Optional[str] = None) -> Tuple[str, int]:
         if self.asset_id is None:
             raise ValueError("Token has not been created yet")
         
@@ -124,19 +407,21 @@ class DigitalMarketplace:
             sender=sender_address,
             sp=params,
             index=self.asset_id,
-            on_complete=transaction.OnComplete.NoOp,
+            on_complete=transaction.OnComplete.NoOpOC,
             app_args=["set_github"],
-            boxes=[(self.asset_id, box_name.encode())]
+            boxes=[(self.asset_id, box_name.encode())],
+            lease=self._lease(sender_address, idempotency_key, 0)
         )
         
         # Convert ALGO to USDT equivalent for token calculation
-        usdt_equivalent = algo_to_usdt(algo_amount)
+        algo_price = self._algo_price()
+        usdt_equivalent = algo_to_usdt(algo_amount, algo_price)
         
         # Calculate fee in USDT (fixed fee per transaction)
-        fee_usdt = FIXED_FEE_USDT
+        fee_usdt = self.config.fixed_fee_usdt
         
         # Convert fee to ALGO
-        fee_algo = usdt_to_algo(fee_usdt)
+        fee_algo = usdt_to_algo(fee_usdt, algo_price)
         
         # Calculate net USDT amount after fee
         net_usdt = usdt_equivalent - fee_usdt
@@ -157,7 +442,8 @@ class DigitalMarketplace:
             sender=sender_address,
             sp=params,
             receiver=self.creator_address,
-            amt=algo_amount
+            amt=algo_amount,
+            lease=self._lease(sender_address, idempotency_key, 1)
         )
         
         # Create the asset transfer transaction for the tokens
@@ -166,37 +452,58 @@ class DigitalMarketplace:
             sp=params,
             receiver=sender_address,
             amt=tokens_to_receive,
-            index=self.asset_id
+            index=self.asset_id,
+            lease=self._lease(sender_address, idempotency_key, 2)
         )
         
         # Group all transactions
         transaction.assign_group_id([box_txn, payment_txn, asset_txn])
         
+        # Reserve the tokens so an underfunded creator is rejected before signing
+        reservation = self._reserve(tokens=tokens_to_receive)
+        
         # Sign all transactions
-        signed_box_txn = box_txn.sign(sender_private_key)
-        signed_payment_txn = payment_txn.sign(sender_private_key)
-        signed_asset_txn = asset_txn.sign(self.creator_private_key)
+        try:
+            signed_box_txn = box_txn.sign(sender_private_key)
+            signed_payment_txn = payment_txn.sign(sender_private_key)
+            signed_asset_txn = asset_txn.sign(self.creator_private_key)
+        except Exception:
+            reservation.release()
+            raise
         
         # Submit the transactions
         try:
-            tx_id = self.algod_client.send_transactions([signed_box_txn, signed_payment_txn, signed_asset_txn])
-            print(f"Transaction ID: {tx_id}")
-            
-            # Wait for confirmation
-            transaction.wait_for_confirmation(self.algod_client, tx_id, 4)
-            
-            # Update token balances
-            self.token_holders[self.creator_address] = available_tokens - tokens_to_receive
-            current_balance = self.token_holders.get(sender_address, 0)
-            self.token_holders[sender_address] = current_balance + tokens_to_receive
-            
-            return tx_id, tokens_to_receive
+            return self._send_request(
+                sender_address, idempotency_key,
+                [signed_box_txn, signed_payment_txn, signed_asset_txn], LANE_DEPOSIT, reservation,
+                lambda tx_id: self._confirm_deposit(tx_id, sender_address, tokens_to_receive,
+                                                    reservation, params.last)
+            )
             
         except AlgodHTTPError as e:
-            print(f"Failed to process deposit: {e}")
+            self.log(f"Failed to process deposit: {e}")
             raise
 
-    def withdraw(self, sender_address: str, sender_private_key: str, token_amount: int) -> Tuple[str, int]:
+    def _confirm_deposit(self, tx_id: str, sender_address: str, tokens_to_receive: int,
+                         reservation: Reservation, last_valid: int) -> Tuple[str, int]:
+        """Wait for a sent deposit group and credit the tokens in the ledger."""
+        # Wait for confirmation
+        confirmed_txn = self._wait_settled(tx_id, reservation, last_valid)
+        confirmed_round = confirmed_txn.get("confirmed-round")
+        
+        # Update token balances
+        with self._ledger_lock:
+            creator_balance = self.token_holders.get(self.creator_address, 0)
+            self._set_balance("deposit", self.creator_address,
+                              creator_balance - tokens_to_receive, tx_id, confirmed_round)
+            current_balance = self.token_holders.get(sender_address, 0)
+            self._set_balance("deposit", sender_address,
+                              current_balance + tokens_to_receive, tx_id, confirmed_round)
+        
+        return tx_id, tokens_to_receive
+
+    def withdraw(self, sender_address: str, sender_private_key: str, token_amount: int,
+                 idempotency_key: Optional[str] = None) -> Tuple[str, int]:
         """
         Withdraw tokens and receive equivalent ALGO minus fees.
         
@@ -204,10 +511,23 @@ class DigitalMarketplace:
             sender_address: The Algorand address of the sender
             sender_private_key: The private key of the sender
             token_amount: The amount of tokens to withdraw
+            idempotency_key: Optional client key; a retry with the same key
+                returns the original result instead of sending a new group
             
         Returns:
             Tuple[str, int]: Transaction ID and ALGO received
         """
+        if idempotency_key is None:
+            return self._withdraw(sender_address, sender_private_key, token_amount)
+        
+        return self.idempotency.run(
+            (sender_address, idempotency_key),
+            ("withdraw", sender_address, token_amount),
+            lambda: self._withdraw(sender_address, sender_private_key, token_amount, idempotency_key)
+        )
+
+    def _withdraw(self, sender_address: str, sender_private_key: str, token_amount: int,
+                  idempotency_key: Optional[str] = None) -> Tuple[str, int]:
         if self.asset_id is None:
             raise ValueError("Token has not been created yet")
         
@@ -220,7 +540,7 @@ class DigitalMarketplace:
         usdt_equivalent = token_amount / (10 ** DECIMALS)
         
         # Calculate fee in USDT (fixed fee per transaction)
-        fee_usdt = FIXED_FEE_USDT
+        fee_usdt = self.config.fixed_fee_usdt
         
         # Calculate net USDT amount after fee
         net_usdt = usdt_equivalent - fee_usdt
@@ -229,7 +549,7 @@ class DigitalMarketplace:
             raise ValueError("Withdrawal amount too small to cover fees")
         
         # Convert USDT to ALGO
-        algo_to_send = usdt_to_algo(net_usdt)
+        algo_to_send = usdt_to_algo(net_usdt, self._algo_price())
         
         # Get suggested parameters from the network
         params = self.algod_client.suggested_params()
@@ -240,7 +560,8 @@ class DigitalMarketplace:
             sp=params,
             receiver=self.creator_address,
             amt=token_amount,
-            index=self.asset_id
+            index=self.asset_id,
+            lease=self._lease(sender_address, idempotency_key, 0)
         )
         
         # Create the payment transaction for the ALGO
@@ -248,42 +569,75 @@ class DigitalMarketplace:
             sender=self.creator_address,
             sp=params,
             receiver=sender_address,
-            amt=algo_to_send
+            amt=algo_to_send,
+            lease=self._lease(sender_address, idempotency_key, 1)
         )
         
         # Group the transactions
         transaction.assign_group_id([asset_txn, payment_txn])
         
+        # Reserve the payout so an underfunded creator is rejected before signing
+        reservation = self._reserve(algo=algo_to_send)
+        
         # Sign the transactions
-        signed_asset_txn = asset_txn.sign(sender_private_key)
-        signed_payment_txn = payment_txn.sign(self.creator_private_key)
+        try:
+            signed_asset_txn = asset_txn.sign(sender_private_key)
+            signed_payment_txn = payment_txn.sign(self.creator_private_key)
+        except Exception:
+            reservation.release()
+            raise
         
         # Submit the transactions to the network
         try:
-            tx_id = self.algod_client.send_transactions([signed_asset_txn, signed_payment_txn])
-            print(f"Transaction ID: {tx_id}")
-            
-            # Wait for confirmation
-            transaction.wait_for_confirmation(self.algod_client, tx_id, 4)
-            
-            # Update token balances
-            self.token_holders[sender_address] = sender_balance - token_amount
-            creator_balance = self.token_holders.get(self.creator_address, 0)
-            self.token_holders[self.creator_address] = creator_balance + token_amount
-            
-            return tx_id, algo_to_send
+            return self._send_request(
+                sender_address, idempotency_key,
+                [signed_asset_txn, signed_payment_txn], LANE_WITHDRAWAL, reservation,
+                lambda tx_id: self._confirm_withdrawal(tx_id, sender_address, token_amount,
+                                                       algo_to_send, reservation, params.last)
+            )
         
         except AlgodHTTPError as e:
-            print(f"Failed to process withdrawal: {e}")
+            self.log(f"Failed to process withdrawal: {e}")
             raise
     
-    def calculate_staking_rewards(self) -> None:
+    def _confirm_withdrawal(self, tx_id: str, sender_address: str, token_amount: int,
+                            algo_to_send: int, reservation: Reservation,
+                            last_valid: int) -> Tuple[str, int]:
+        """Wait for a sent withdrawal group and debit the tokens in the ledger."""
+        # Wait for confirmation
+        confirmed_txn = self._wait_settled(tx_id, reservation, last_valid)
+        confirmed_round = confirmed_txn.get("confirmed-round")
+        
+        # Update token balances
+        with self._ledger_lock:
+            sender_balance = self.token_holders.get(sender_address, 0)
+            self._set_balance("withdraw", sender_address,
+                              sender_balance - token_amount, tx_id, confirmed_round)
+            creator_balance = self.token_holders.get(self.creator_address, 0)
+            self._set_balance("withdraw", self.creator_address,
+                              creator_balance + token_amount, tx_id, confirmed_round)
+        
+        return tx_id, algo_to_send
+    
+    def calculate_staking_rewards(self, workers: int = 1) -> None:
         """
         Calculate staking rewards for eligible token holders.
         
-        Holders with tokens worth 10K+ USDT are eligible for 5% rewards in ALGO.
+        Holders with tokens worth the configured threshold (10K USDT by
+        default) are eligible for the configured annual rate (5%) in ALGO.
+        
+        Args:
+            workers: Number of processes; above 1 the holders are sharded by
+                address hash across a process pool (requires numpy)
         """
-        current_time = get_current_timestamp()
+        if self.staking_sweep is not None:
+            # Finish the interrupted incremental sweep instead of starting over
+            from .sweep import StakingSweep
+            
+            StakingSweep(self).run()
+            return
+        
+        current_time = self._now()
         
         # Calculate time elapsed since last calculation in seconds
         time_elapsed = current_time - self.last_staking_calculation
@@ -295,36 +649,92 @@ class DigitalMarketplace:
         # Update the timestamp for the next calculation
         self.last_staking_calculation = current_time
         
+        if workers > 1:
+            from .sharding import sharded_staking_rewards
+            
+            algo_price = self._algo_price()
+            rewards = sharded_staking_rewards(
+                self.token_holders,
+                get_algo_price_usdt() if algo_price is None else algo_price,
+                workers,
+                threshold_usdt=self.config.staking_threshold_usdt,
+                reward_percentage=self.config.staking_reward_percentage
+            )
+            for address, daily_reward_algo in rewards.items():
+                current_rewards = self.staking_rewards.get(address, 0)
+                self._set_reward("stake", address, current_rewards + daily_reward_algo)
+            self._record_history(current_time, rewards)
+            return
+        
         # Calculate rewards for each eligible holder
+        credited: Dict[str, int] = {}
+        algo_price = self._algo_price()
         for address, token_balance in self.token_holders.items():
-            # Convert token balance to USDT
-            usdt_value = token_balance / (10 ** DECIMALS)
-            
-            # Check if holder is eligible for staking rewards
-            if usdt_value >= STAKING_THRESHOLD_USDT:
-                # Calculate yearly reward in USDT
-                yearly_reward_usdt = usdt_value * (STAKING_REWARD_PERCENTAGE / 100)
-                
-                # Calculate daily reward in USDT
-                daily_reward_usdt = yearly_reward_usdt / 365
-                
-                # Convert USDT reward to ALGO
-                daily_reward_algo = usdt_to_algo(daily_reward_usdt)
-                
+            daily_reward_algo = self._daily_reward(token_balance, algo_price)
+            if daily_reward_algo is not None:
                 # Add to holder's staking rewards
                 current_rewards = self.staking_rewards.get(address, 0)
-                self.staking_rewards[address] = current_rewards + daily_reward_algo
+                self._set_reward("stake", address, current_rewards + daily_reward_algo)
+                credited[address] = daily_reward_algo
+        
+        self._record_history(current_time, credited)
+    
+    def _daily_reward(self, token_balance: int, algo_price: Optional[float] = None) -> Optional[int]:
+        """
+        Calculate one day of staking rewards for a token balance.
+        
+        Args:
+            token_balance: Token balance (with decimals)
+            algo_price: ALGO price in USDT; the cached price when omitted
+            
+        Returns:
+            Optional[int]: Reward in microALGO, or None when not eligible
+        """
+        # Convert token balance to USDT
+        usdt_value = token_balance / (10 ** DECIMALS)
+        
+        # Check if holder is eligible for staking rewards
+        if usdt_value < self.config.staking_threshold_usdt:
+            return None
+        
+        # Calculate yearly reward in USDT
+        yearly_reward_usdt = usdt_value * (self.config.staking_reward_percentage / 100)
+        
+        # Calculate daily reward in USDT
+        daily_reward_usdt = yearly_reward_usdt / 365
+        
+        # Convert USDT reward to ALGO
+        return usdt_to_algo(daily_reward_usdt, algo_price)
+    
+    def _record_history(self, timestamp: int, rewards: Dict[str, int]) -> None:
+        """Append a staking run's credited rewards to the reward history, if any."""
+        if self.reward_history is not None:
+            self.reward_history.record_day(day_of(timestamp), rewards)
     
-    def claim_staking_rewards(self, holder_address: str) -> Tuple[str, int]:
+    def claim_staking_rewards(self, holder_address: str,
+                              on_pending: Optional[Callable[[], None]] = None,
+                              validity_rounds: Optional[int] = None) -> Tuple[str, int]:
         """
         Allow a holder to claim their accumulated staking rewards.
         
+        The payout is recorded in pending_payouts before it is sent and
+        stays there until it is known to have landed or failed, so a payout
+        whose outcome is unknown (e.g. a confirmation timeout) is resolved
+        by resolve_payouts instead of being paid again.
+        
         Args:
             holder_address: The Algorand address of the token holder
+            on_pending: Optional callback run once the payout is recorded
+                and before it is sent, e.g. to persist the state
+            validity_rounds: Optional cap on the payout's validity window;
+                windows shorter than MAX_TXN_LIFE keep it resolvable
             
         Returns:
             Tuple[str, int]: Transaction ID and ALGO claimed
         """
+        if holder_address in self.pending_payouts:
+            raise ValueError(f"A payout to {holder_address} is still in flight")
+        
         # Check if holder has any rewards
         reward_balance = self.staking_rewards.get(holder_address, 0)
         if reward_balance <= 0:
@@ -332,6 +742,8 @@ class DigitalMarketplace:
         
         # Get suggested parameters from the network
         params = self.algod_client.suggested_params()
+        if validity_rounds is not None:
+            params.last = min(params.last, params.first + validity_rounds)
         
         # Create the payment transaction for the ALGO rewards
         payment_txn = transaction.PaymentTxn(
@@ -341,27 +753,98 @@ class DigitalMarketplace:
             amt=reward_balance
         )
         
+        # Reserve the payout so an underfunded creator is rejected before signing
+        reservation = self._reserve(algo=reward_balance)
+        
         # Sign the transaction
-        signed_payment_txn = payment_txn.sign(self.creator_private_key)
+        try:
+            signed_payment_txn = payment_txn.sign(self.creator_private_key)
+        except Exception:
+            reservation.release()
+            raise
+        
+        self.pending_payouts[holder_address] = {
+            "tx_id": signed_payment_txn.get_txid(),
+            "amount": reward_balance,
+            "first_valid": params.first,
+            "last_valid": params.last,
+        }
+        try:
+            if on_pending is not None:
+                on_pending()
+        except Exception:
+            del self.pending_payouts[holder_address]
+            reservation.release()
+            raise
         
         # Submit the transaction to the network
         try:
-            tx_id = self.algod_client.send_transaction(signed_payment_txn)
-            print(f"Transaction ID: {tx_id}")
+            tx_id = self._submit(signed_payment_txn, LANE_REWARD, reservation)
+            self.log(f"Transaction ID: {tx_id}")
             
             # Wait for confirmation
-            transaction.wait_for_confirmation(self.algod_client, tx_id, 4)
+            confirmed_txn = self._wait_settled(tx_id, reservation, params.last)
             
-            # Reset the holder's staking rewards
-            claimed_amount = reward_balance
-            self.staking_rewards[holder_address] = 0
+            # Deduct the claimed rewards
+            self._settle_payout(holder_address, tx_id, confirmed_txn.get("confirmed-round"))
             
-            return tx_id, claimed_amount
-        
-        except AlgodHTTPError as e:
-            print(f"Failed to claim staking rewards: {e}")
+            return tx_id, reward_balance
+        
+        except Exception as e:
+            if is_rejected(e):
+                # Never landed, so the rewards are still owed
+                del self.pending_payouts[holder_address]
+            if isinstance(e, AlgodHTTPError):
+                self.log(f"Failed to claim staking rewards: {e}")
             raise
     
+    def _settle_payout(self, holder_address: str, tx_id: str, round: Optional[int]) -> None:
+        """Deduct a confirmed payout from the holder's rewards."""
+        payout = self.pending_payouts.pop(holder_address)
+        remaining = max(self.staking_rewards.get(holder_address, 0) - payout["amount"], 0)
+        self._set_reward("claim", holder_address, remaining, tx_id, round)
+    
+    def resolve_payouts(self) -> Dict[str, str]:
+        """
+        Check on chain whether the payouts in pending_payouts went through.
+        
+        Confirmed payouts are deducted from the holders' rewards and failed
+        ones are dropped, leaving the rewards owed. A payout missing from
+        the node after its last valid round failed only if its whole
+        validity window is still within the node's MAX_TXN_LIFE lookback;
+        otherwise it stays pending as PAYOUT_UNKNOWN.
+        
+        Returns:
+            Dict[str, str]: The outcome of each pending payout by holder
+        """
+        outcomes = {}
+        for holder_address, payout in list(self.pending_payouts.items()):
+            try:
+                info = self.algod_client.pending_transaction_info(payout["tx_id"])
+                if info.get("confirmed-round"):
+                    self._settle_payout(holder_address, payout["tx_id"], info["confirmed-round"])
+                    outcomes[holder_address] = PAYOUT_PAID
+                elif info.get("pool-error"):
+                    del self.pending_payouts[holder_address]
+                    outcomes[holder_address] = PAYOUT_FAILED
+                else:
+                    outcomes[holder_address] = PAYOUT_IN_FLIGHT
+            except AlgodHTTPError as e:
+                if e.code != 404:
+                    self.log(f"Failed to resolve payout to {holder_address}: {e}")
+                    outcomes[holder_address] = PAYOUT_UNKNOWN
+                    continue
+                # Neither in the pool nor confirmed within the lookback
+                last_round = self.algod_client.status()["last-round"]
+                if last_round <= payout["last_valid"]:
+                    outcomes[holder_address] = PAYOUT_IN_FLIGHT
+                elif last_round - MAX_TXN_LIFE < payout["first_valid"]:
+                    del self.pending_payouts[holder_address]
+                    outcomes[holder_address] = PAYOUT_FAILED
+                else:
+                    outcomes[holder_address] = PAYOUT_UNKNOWN
+        return outcomes
+    
     def get_token_balance(self, address: str) -> int:
         """
         Get the token balance for a specific address.
@@ -401,5 +884,5 @@ class DigitalMarketplace:
             return asset_info
         
         except AlgodHTTPError as e:
-            print(f"Failed to get token info: {e}")
+            self.log(f"Failed to get token info: {e}")
             raise
\ No newline at end of file
@@ -0,0 +1,282 @@
+"""
+Columnar export of Digital Marketplace ledger state.
+
+A snapshot is a directory with one file per column (address, balance,
+reward) and a small JSON manifest. Columns are written in chunks, so the
+ledger is never serialized as a whole. The default format is ``.npy``,
+which LedgerSnapshot memory-maps with no parse step; Parquet is written
+instead when requested and pyarrow is installed.
+
+The manifest is written last, so a snapshot without one is incomplete.
+Re-exporting into an existing snapshot removes its manifest before any
+column changes, and each column is written to a temporary file and
+renamed into place, so readers that already opened the old columns keep
+reading them unchanged.
+
+Requires numpy (install the ``fast`` extra).
+"""
+import json
+import os
+from itertools import islice
+from typing import Dict, Iterator, Sequence, Tuple
+
+from .utils import get_current_timestamp
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+# Algorand addresses are 58 base32 characters
+ADDRESS_WIDTH = 58
+
+COLUMNS = ("address", "balance", "reward")
+MANIFEST_FILE = "manifest.json"
+FORMAT_NPY = "npy"
+FORMAT_PARQUET = "parquet"
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Columnar export requires numpy: pip install digital_marketplace[fast]")
+
+
+def _column_dtypes() -> Dict[str, "np.dtype"]:
+    return {
+        "address": np.dtype(f"S{ADDRESS_WIDTH}"),
+        "balance": np.dtype(np.int64),
+        "reward": np.dtype(np.int64),
+    }
+
+
+def _iter_rows(token_holders: Dict[str, int],
+               staking_rewards: Dict[str, int]) -> Iterator[Tuple[str, int, int]]:
+    """Yield (address, balance, reward) for every address in either dict."""
+    for address, balance in token_holders.items():
+        yield address, balance, staking_rewards.get(address, 0)
+    for address, reward in staking_rewards.items():
+        if address not in token_holders:
+            yield address, 0, reward
+
+
+def _chunks(rows: Iterator[Tuple[str, int, int]], chunk_size: int):
+    """Yield column arrays for successive chunks of rows."""
+    dtypes = _column_dtypes()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        addresses, balances, rewards = zip(*chunk)
+        encoded = np.array([a.encode() for a in addresses])
+        if encoded.dtype.itemsize > ADDRESS_WIDTH:
+            raise ValueError(f"Addresses must be at most {ADDRESS_WIDTH} characters")
+        yield {
+            "address": encoded.astype(dtypes["address"]),
+            "balance": np.fromiter(balances, dtype=dtypes["balance"], count=len(chunk)),
+            "reward": np.fromiter(rewards, dtype=dtypes["reward"], count=len(chunk)),
+        }
+
+
+def export_ledger(token_holders: Dict[str, int], staking_rewards: Dict[str, int],
+                  directory: str, fmt: str = FORMAT_NPY,
+                  chunk_size: int = 1_000_000) -> dict:
+    """
+    Write a columnar snapshot of holder balances and pending rewards.
+
+    Args:
+        token_holders: Address to token balance
+        staking_rewards: Address to pending reward in microALGO
+        directory: Snapshot directory (created if missing)
+        fmt: FORMAT_NPY or FORMAT_PARQUET
+        chunk_size: Rows converted per chunk
+
+    Returns:
+        dict: The snapshot manifest
+    """
+    _require_numpy()
+    if fmt not in (FORMAT_NPY, FORMAT_PARQUET):
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    os.makedirs(directory, exist_ok=True)
+    # Mark an existing snapshot incomplete before touching its columns
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    rows = len(token_holders) + sum(1 for a in staking_rewards if a not in token_holders)
+    chunks = _chunks(_iter_rows(token_holders, staking_rewards), chunk_size)
+
+    if fmt == FORMAT_NPY:
+        # Preallocate each column file and fill it chunk by chunk
+        columns = {
+            name: np.lib.format.open_memmap(
+                os.path.join(directory, f"{name}.npy.tmp"), mode="w+", dtype=dtype, shape=(rows,)
+            )
+            for name, dtype in _column_dtypes().items()
+        }
+        offset = 0
+        for chunk in chunks:
+            end = offset + len(chunk["address"])
+            for name, column in columns.items():
+                column[offset:end] = chunk[name]
+            offset = end
+        for column in columns.values():
+            column.flush()
+        del columns
+        for name in COLUMNS:
+            path = os.path.join(directory, f"{name}.npy")
+            os.replace(f"{path}.tmp", path)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("address", pa.binary()),
+            ("balance", pa.int64()),
+            ("reward", pa.int64()),
+        ])
+        path = os.path.join(directory, "ledger.parquet")
+        with pq.ParquetWriter(f"{path}.tmp", schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.table({
+                    "address": pa.array(chunk["address"].tolist(), pa.binary()),
+                    "balance": chunk["balance"],
+                    "reward": chunk["reward"],
+                }, schema=schema))
+        os.replace(f"{path}.tmp", path)
+
+    manifest = {
+        "format": fmt,
+        "rows": rows,
+        "columns": list(COLUMNS),
+        "created": get_current_timestamp(),
+    }
+    tmp_path = os.path.join(directory, f"{MANIFEST_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    # The manifest is written last so a snapshot without one is incomplete
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+class LedgerSnapshot:
+    def __init__(self, directory: str):
+        """
+        Open a snapshot written by export_ledger.
+
+        Columns are loaded on first access; ``.npy`` columns are memory-mapped.
+
+        Args:
+            directory: Snapshot directory
+        """
+        _require_numpy()
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.directory = directory
+        self._columns: Dict[str, "np.ndarray"] = {}
+
+    def __len__(self) -> int:
+        return self.manifest["rows"]
+
+    def column(self, name: str) -> "np.ndarray":
+        """
+        Get one column.
+
+        Args:
+            name: "address", "balance" or "reward"
+
+        Returns:
+            numpy.ndarray: The column (read-only memory map for ``.npy``)
+        """
+        return self.columns([name])[name]
+
+    def columns(self, names: Sequence[str] = COLUMNS) -> Dict[str, "np.ndarray"]:
+        """
+        Get several columns, reading only those requested.
+
+        Args:
+            names: Column names
+
+        Returns:
+            Dict[str, numpy.ndarray]: Column name to column
+        """
+        missing = [n for n in names if n not in self._columns]
+        if missing:
+            for name in missing:
+                if name not in COLUMNS:
+                    raise KeyError(f"Unknown column: {name}")
+            self._columns.update(self._load(missing))
+        return {name: self._columns[name] for name in names}
+
+    def _load(self, names: Sequence[str]) -> Dict[str, "np.ndarray"]:
+        if self.manifest["format"] == FORMAT_NPY:
+            return {
+                name: np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+                for name in names
+            }
+
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(
+            os.path.join(self.directory, "ledger.parquet"), columns=list(names),
+            memory_map=True
+        )
+        loaded = {}
+        for name in names:
+            if name == "address":
+                loaded[name] = np.array(table.column(name).to_pylist(), dtype=_column_dtypes()[name])
+            else:
+                loaded[name] = table.column(name).to_numpy()
+        return loaded
+
+    @property
+    def address(self) -> "np.ndarray":
+        """Fixed-width ASCII addresses."""
+        return self.column("address")
+
+    @property
+    def balance(self) -> "np.ndarray":
+        """Token balances (with decimals)."""
+        return self.column("balance")
+
+    @property
+    def reward(self) -> "np.ndarray":
+        """Pending staking rewards in microALGO."""
+        return self.column("reward")
+
+    def to_dicts(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """
+        Rebuild token_holders and staking_rewards from the snapshot.
+
+        Addresses with a zero balance and no reward entry cannot be told
+        apart from absent ones, so only non-zero values are restored.
+
+        Returns:
+            Tuple[Dict[str, int], Dict[str, int]]: Balances and rewards
+        """
+        addresses = [a.decode() for a in self.address]
+        balances, rewards = {}, {}
+        for address, balance, reward in zip(addresses, self.balance.tolist(), self.reward.tolist()):
+            if balance:
+                balances[address] = balance
+            if reward:
+                rewards[address] = reward
+        return balances, rewards
+
+
+def export_contract(contract, directory: str, fmt: str = FORMAT_NPY,
+                    chunk_size: int = 1_000_000) -> dict:
+    """
+    Write a columnar snapshot of a DigitalMarketplace's ledger.
+
+    Args:
+        contract: The DigitalMarketplace to export
+        directory: Snapshot directory
+        fmt: FORMAT_NPY or FORMAT_PARQUET
+        chunk_size: Rows converted per chunk
+
+    Returns:
+        dict: The snapshot manifest
+    """
+    return export_ledger(contract.token_holders, contract.staking_rewards,
+                         directory, fmt, chunk_size)
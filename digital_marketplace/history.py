@@ -0,0 +1,247 @@
+"""
+Per-holder staking reward history for the Digital Marketplace.
+
+Rewards are kept as prefix sums, so any date range costs two lookups per
+holder however long it is. Days are grouped into blocks of ``bucket_days``
+days. Each block starts from a dense base column: every holder's
+cumulative rewards before the block. Each day in a block then stores a
+sparse column with the cumulative rewards since the block started, for
+only the holders credited in the block so far. A holder's cumulative
+total through any day is its base entry plus one binary search in that
+day's column, and a range total is the difference of two of them:
+
+- ``holder_total``: O(log k) for k holders credited in the block
+- ``range_totals``: O(n + k) for n holders
+
+Memory is one dense column per block plus, per day, the holders credited
+in its block so far; with the usual daily staking population that is
+about the holders credited each day.
+
+Days older than the daily retention window are compacted into their
+block's latest column, which is already cumulative, so compaction frees
+memory at the cost of range resolution for old dates without changing
+any total. Totals are unaffected by claims resetting the pending balance.
+
+Requires numpy (install the ``fast`` extra).
+"""
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+SECONDS_PER_DAY = 86400
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Reward history requires numpy: pip install digital_marketplace[fast]")
+
+
+def day_of(timestamp: int) -> int:
+    """
+    Get the UNIX day number (days since 1970-01-01 UTC) of a timestamp.
+
+    Args:
+        timestamp: UNIX timestamp in seconds
+
+    Returns:
+        int: Day number
+    """
+    return int(timestamp) // SECONDS_PER_DAY
+
+
+class RewardHistory:
+    def __init__(self, daily_days: int = 90, bucket_days: int = 30):
+        """
+        Initialize an empty reward history.
+
+        Args:
+            daily_days: Most recent days kept at daily resolution
+            bucket_days: Width in days of the buckets older days are
+                compacted into
+        """
+        _require_numpy()
+        if daily_days < 1 or bucket_days < 1:
+            raise ValueError("daily_days and bucket_days must be positive")
+
+        self.daily_days = daily_days
+        self.bucket_days = bucket_days
+        self._slots: Dict[str, int] = {}
+        self.addresses: List[str] = []
+        # Column i covers days _starts[i].._ends[i] inclusive and belongs to
+        # block _ends[i] // bucket_days. It holds the sorted slots credited
+        # in its block up to its last day (_columns[i]) and their cumulative
+        # rewards since the block started (_amounts[i]). _bases maps a block
+        # to every slot's cumulative rewards before it.
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self._columns: List["np.ndarray"] = []
+        self._amounts: List["np.ndarray"] = []
+        self._bases: Dict[int, "np.ndarray"] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of stored columns (days and compacted buckets)."""
+        return len(self._ends)
+
+    @property
+    def last_day(self) -> Optional[int]:
+        """The most recently recorded day, or None when empty."""
+        return self._ends[-1] if self._ends else None
+
+    def _slot(self, address: str) -> int:
+        slot = self._slots.get(address)
+        if slot is None:
+            slot = len(self.addresses)
+            self._slots[address] = slot
+            self.addresses.append(address)
+        return slot
+
+    def _dense(self, index: int, size: int) -> "np.ndarray":
+        """Every slot's cumulative rewards through a column (lock must be held)."""
+        totals = np.zeros(size, dtype=np.int64)
+        if index < 0:
+            return totals
+        base = self._bases[self._ends[index] // self.bucket_days]
+        totals[:len(base)] = base
+        totals[self._columns[index]] += self._amounts[index]
+        return totals
+
+    def _cumulative(self, slot: int, index: int) -> int:
+        """One slot's cumulative rewards through a column (lock must be held)."""
+        if index < 0:
+            return 0
+        base = self._bases[self._ends[index] // self.bucket_days]
+        total = int(base[slot]) if slot < len(base) else 0
+        column = self._columns[index]
+        position = int(np.searchsorted(column, slot))
+        if position < len(column) and column[position] == slot:
+            total += int(self._amounts[index][position])
+        return total
+
+    def record_day(self, day: int, rewards: Dict[str, int]) -> None:
+        """
+        Append one day of credited rewards.
+
+        Args:
+            day: UNIX day number, later than any recorded day
+            rewards: Address to reward credited that day in microALGO
+        """
+        with self._lock:
+            if self._ends and day <= self._ends[-1]:
+                raise ValueError(f"Day {day} is not after the last recorded day {self._ends[-1]}")
+
+            slots = np.fromiter((self._slot(a) for a in rewards), dtype=np.int64, count=len(rewards))
+            amounts = np.fromiter(rewards.values(), dtype=np.int64, count=len(rewards))
+
+            block = day // self.bucket_days
+            if block not in self._bases:
+                # A new block starts from the totals through the previous day
+                self._bases[block] = self._dense(len(self._ends) - 1, len(self.addresses))
+                order = np.argsort(slots, kind="stable")
+                slots, amounts = slots[order], amounts[order]
+            else:
+                slots, inverse = np.unique(
+                    np.concatenate([self._columns[-1], slots]), return_inverse=True
+                )
+                merged = np.zeros(len(slots), dtype=np.int64)
+                np.add.at(merged, inverse, np.concatenate([self._amounts[-1], amounts]))
+                amounts = merged
+
+            self._starts.append(self._ends[-1] + 1 if self._ends else day)
+            self._ends.append(day)
+            self._columns.append(slots)
+            self._amounts.append(amounts)
+            self._compact(day)
+
+    def _compact(self, today: int) -> None:
+        """Drop columns older than the daily window but the last of each block (lock must be held)."""
+        horizon = today - self.daily_days
+        old = bisect.bisect_right(self._ends, horizon)
+        keep = [
+            i for i in range(old)
+            if i + 1 == old or self._ends[i + 1] // self.bucket_days != self._ends[i] // self.bucket_days
+        ]
+        if len(keep) == old:
+            return
+
+        # A kept column covers the days of the dropped ones before it
+        starts, previous = [], 0
+        for i in keep:
+            starts.append(self._starts[previous])
+            previous = i + 1
+        self._starts[:old] = starts
+        self._ends[:old] = [self._ends[i] for i in keep]
+        self._columns[:old] = [self._columns[i] for i in keep]
+        self._amounts[:old] = [self._amounts[i] for i in keep]
+
+    def _bounds(self, start_day: int, end_day: int):
+        """
+        Columns just before and at the end of a range (lock must be held).
+
+        A compacted bucket is in the range when its last day is.
+        """
+        first = bisect.bisect_left(self._ends, start_day)
+        last = bisect.bisect_right(self._ends, end_day)
+        return first - 1, last - 1
+
+    def holder_total(self, address: str, start_day: int, end_day: int) -> int:
+        """
+        Get one holder's rewards earned between two days, inclusive.
+
+        A compacted bucket is counted in a range when its last day is.
+
+        Args:
+            address: The Algorand address
+            start_day: First UNIX day of the range
+            end_day: Last UNIX day of the range
+
+        Returns:
+            int: Rewards in microALGO
+        """
+        with self._lock:
+            slot = self._slots.get(address)
+            if slot is None or end_day < start_day:
+                return 0
+            before, through = self._bounds(start_day, end_day)
+            if through <= before:
+                return 0
+            return self._cumulative(slot, through) - self._cumulative(slot, before)
+
+    def range_totals(self, start_day: int, end_day: int) -> "np.ndarray":
+        """
+        Get every holder's rewards earned between two days, inclusive.
+
+        Args:
+            start_day: First UNIX day of the range
+            end_day: Last UNIX day of the range
+
+        Returns:
+            numpy.ndarray: int64 totals aligned with ``addresses``
+        """
+        with self._lock:
+            size = len(self.addresses)
+            if end_day < start_day:
+                return np.zeros(size, dtype=np.int64)
+            before, through = self._bounds(start_day, end_day)
+            if through <= before:
+                return np.zeros(size, dtype=np.int64)
+            return self._dense(through, size) - self._dense(before, size)
+
+    def statement(self, start_day: int, end_day: int) -> Dict[str, int]:
+        """
+        Get the rewards earned between two days by each holder that earned any.
+
+        Args:
+            start_day: First UNIX day of the range
+            end_day: Last UNIX day of the range
+
+        Returns:
+            Dict[str, int]: Address to rewards in microALGO
+        """
+        totals = self.range_totals(start_day, end_day)
+        return {self.addresses[i]: int(totals[i]) for i in np.flatnonzero(totals)}
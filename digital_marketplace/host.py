@@ -0,0 +1,224 @@
+"""
+Multi-marketplace host for the Digital Marketplace.
+
+MarketplaceHost runs many DigitalMarketplace deployments, keyed by asset
+ID, in one process. They share what is per node or per process rather than
+per token:
+
+- one algod client (a single AlgodClient or an AlgodClientPool), wrapped so
+  suggested params are fetched once per ``params_ttl`` for every deployment
+- one PriceOracle, so the ALGO price is fetched once per cache period
+- one SubmissionScheduler, so the node's rate budget is shared fairly
+- one thread pool that runs operations, including signing and waiting for
+  confirmation, and the daily staking sweeps
+
+Each marketplace keeps its own ledger, change feed, idempotency cache and
+MarketplaceConfig (fee, staking threshold and reward rate).
+"""
+import copy
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Optional
+
+from .config import MarketplaceConfig
+from .contract import DigitalMarketplace
+from .scheduler import SubmissionScheduler
+from .utils import PriceOracle
+
+
+class CachedParamsClient:
+    def __init__(self, algod_client, ttl: float = 2.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Wrap an algod client to cache suggested params.
+
+        Every other call is passed through unchanged.
+
+        Args:
+            algod_client: The client (or pool) to wrap
+            ttl: Seconds suggested params are reused; well under a round,
+                so the first valid round stays current
+            clock: Monotonic clock returning seconds
+        """
+        self._client = algod_client
+        self.ttl = ttl
+        self._clock = clock
+        self._params = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def suggested_params(self, **kwargs):
+        """Get suggested params, fetching them when the cache has expired."""
+        with self._lock:
+            if self._params is None or self._clock() >= self._expires:
+                self._params = self._client.suggested_params(**kwargs)
+                self._expires = self._clock() + self.ttl
+                self.fetches += 1
+            # Callers may adjust their params (e.g. the fee), so each gets a copy
+            return copy.copy(self._params)
+
+    def invalidate(self) -> None:
+        """Drop the cached params."""
+        with self._lock:
+            self._params = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+class MarketplaceHost:
+    def __init__(self, algod_client, workers: int = 8, params_ttl: float = 2.0,
+                 price_oracle: Optional[PriceOracle] = None,
+                 scheduler: Optional[SubmissionScheduler] = None,
+                 submission_rate: float = 20.0,
+                 clock: Optional[Callable[[], int]] = None):
+        """
+        Initialize the host.
+
+        Args:
+            algod_client: Client or AlgodClientPool shared by every marketplace
+            workers: Threads running marketplace operations
+            params_ttl: Seconds suggested params are shared between operations
+            price_oracle: Oracle for the ALGO price; a new PriceOracle when omitted
+            scheduler: Submission scheduler to share; one is created on the
+                shared client when omitted and closed with the host
+            submission_rate: Submissions per second of a created scheduler
+            clock: Optional function returning the current UNIX timestamp,
+                passed to every marketplace
+        """
+        self.algod_client = CachedParamsClient(algod_client, params_ttl)
+        self.price_oracle = price_oracle or PriceOracle()
+        self._owns_scheduler = scheduler is None
+        self.scheduler = scheduler or SubmissionScheduler(
+            self.algod_client, rate=submission_rate, burst=submission_rate * 2
+        )
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dmarket-host")
+        self.clock = clock
+        self._marketplaces: Dict[int, DigitalMarketplace] = {}
+        self._lock = threading.Lock()
+
+    def add(self, creator_address: str, creator_private_key: str, github_handle: str,
+            config: Optional[MarketplaceConfig] = None, asset_id: Optional[int] = None,
+            **kwargs) -> DigitalMarketplace:
+        """
+        Add a marketplace to the host.
+
+        Args:
+            creator_address: The Algorand address of the token creator
+            creator_private_key: The private key of the token creator
+            github_handle: The GitHub username of the deployer
+            config: Fee and staking settings of this marketplace
+            asset_id: ID of an existing token; a new token is created when omitted
+            **kwargs: Further DigitalMarketplace arguments, e.g. liquidity
+
+        Returns:
+            DigitalMarketplace: The added marketplace
+        """
+        if asset_id is not None and asset_id in self:
+            raise ValueError(f"Marketplace for asset {asset_id} already exists")
+
+        marketplace = DigitalMarketplace(
+            self.algod_client, creator_address, creator_private_key, github_handle,
+            scheduler=self.scheduler, clock=self.clock, config=config,
+            price_oracle=self.price_oracle, **kwargs
+        )
+        if asset_id is None:
+            marketplace.create_token()
+        else:
+            marketplace.asset_id = asset_id
+
+        with self._lock:
+            if marketplace.asset_id in self._marketplaces:
+                raise ValueError(f"Marketplace for asset {marketplace.asset_id} already exists")
+            self._marketplaces[marketplace.asset_id] = marketplace
+        return marketplace
+
+    def get(self, asset_id: int) -> DigitalMarketplace:
+        """
+        Get a hosted marketplace.
+
+        Args:
+            asset_id: The marketplace token
+
+        Returns:
+            DigitalMarketplace: The marketplace
+        """
+        with self._lock:
+            try:
+                return self._marketplaces[asset_id]
+            except KeyError:
+                raise KeyError(f"No marketplace for asset {asset_id}") from None
+
+    def remove(self, asset_id: int) -> DigitalMarketplace:
+        """Stop hosting a marketplace and return it."""
+        with self._lock:
+            try:
+                return self._marketplaces.pop(asset_id)
+            except KeyError:
+                raise KeyError(f"No marketplace for asset {asset_id}") from None
+
+    def __contains__(self, asset_id) -> bool:
+        with self._lock:
+            return asset_id in self._marketplaces
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._marketplaces)
+
+    def __iter__(self) -> Iterator[int]:
+        with self._lock:
+            return iter(list(self._marketplaces))
+
+    def submit(self, asset_id: int, method: str, *args, **kwargs) -> Future:
+        """
+        Run a marketplace operation on the shared workers.
+
+        Args:
+            asset_id: The marketplace token
+            method: DigitalMarketplace method name, e.g. "deposit"
+            *args: Positional arguments of the method
+            **kwargs: Keyword arguments of the method
+
+        Returns:
+            Future: Resolves to the method's result
+        """
+        func = getattr(self.get(asset_id), method)
+        return self.executor.submit(func, *args, **kwargs)
+
+    def run_staking(self, workers: int = 1) -> Dict[int, Optional[Exception]]:
+        """
+        Run every marketplace's staking calculation on the shared workers.
+
+        A failing marketplace does not stop the others.
+
+        Args:
+            workers: Processes per marketplace, as for calculate_staking_rewards
+
+        Returns:
+            Dict[int, Optional[Exception]]: Asset ID to the error raised, or None
+        """
+        futures = {
+            asset_id: self.submit(asset_id, "calculate_staking_rewards", workers)
+            for asset_id in self
+        }
+        results: Dict[int, Optional[Exception]] = {}
+        for asset_id, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                print(f"Staking failed for asset {asset_id}: {error}")
+            results[asset_id] = error
+        return results
+
+    def close(self) -> None:
+        """Wait for running operations and stop the shared workers."""
+        self.executor.shutdown()
+        if self._owns_scheduler:
+            self.scheduler.close()
+
+    def __enter__(self) -> "MarketplaceHost":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
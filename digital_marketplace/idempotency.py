@@ -0,0 +1,214 @@
+"""
+Idempotency keys for Digital Marketplace operations.
+
+A client that retries a deposit or withdrawal with the same idempotency key
+gets the original result back from a bounded LRU instead of a second group
+being built and submitted. As a second line of defence, the key is also
+turned into deterministic Algorand leases on the group's transactions. The
+node rejects any other transaction with the same sender and lease until
+the first one expires, so even a retry that misses the cache (for example
+after a restart) cannot be credited twice.
+
+Keys are the client's, so both the cache and the leases are scoped by the
+requesting address: two users picking the same key never collide.
+
+Before a request's group is sent, the request records how to finish it
+from that group's transaction ID. From then on a failure whose outcome is
+unknown (e.g. a send that timed out, or a confirmation timeout) no longer
+releases the key, and a retry runs the recorded finish instead of building
+a new group, which the leases would reject while the first one may still
+land. Only a group that can never land releases the key.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Algorand leases are exactly 32 bytes
+LEASE_SIZE = 32
+
+
+class IdempotencyConflictError(ValueError):
+    """Raised when an idempotency key is reused for a different request."""
+
+
+def derive_lease(address: str, key: str, index: int = 0) -> bytes:
+    """
+    Derive the lease for one transaction of an idempotent request.
+
+    Leases conflict per sender, so each transaction in a group gets its own
+    lease from its position in the group. The creator signs transactions of
+    every user's requests, so the lease is also scoped by the requesting
+    address.
+
+    Args:
+        address: The address making the request
+        key: The idempotency key
+        index: Position of the transaction in its group
+
+    Returns:
+        bytes: A 32-byte lease
+    """
+    return hashlib.sha256(f"dmarket-lease:{address}:{key}:{index}".encode()).digest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "result", "error", "finish")
+
+    def __init__(self, fingerprint: Hashable):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # Finishes the request from its sent transactions, once they are sent
+        self.finish: Optional[Callable[[], Any]] = None
+
+    @property
+    def unresolved(self) -> bool:
+        """Whether the request failed after its transactions were sent."""
+        return self.done.is_set() and self.error is not None and self.finish is not None
+
+
+class IdempotencyCache:
+    def __init__(self, max_entries: int = 10_000):
+        """
+        Initialize the cache of in-flight and completed requests.
+
+        Args:
+            max_entries: Completed requests remembered before the least
+                recently used are evicted; in-flight and unresolved requests
+                are never evicted
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def run(self, key: Hashable, fingerprint: Hashable, func: Callable[[], Any],
+            timeout: Optional[float] = None) -> Any:
+        """
+        Run a request once per idempotency key.
+
+        A retry of a completed request returns the stored result. A retry of
+        a request still in flight waits for it and shares its outcome. If the
+        request fails before calling ``sent``, the key is released so the
+        client may try again; if it fails after, a retry runs the recorded
+        finish function instead of ``func``.
+
+        Args:
+            key: The idempotency key, scoped by the caller (e.g. by address)
+            fingerprint: Identifies the request; a key reused with a different
+                fingerprint is rejected
+            func: Performs the request
+            timeout: Seconds a retry waits for an in-flight request
+
+        Returns:
+            The result of ``func``
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(fingerprint)
+                self._entries[key] = entry
+                owner = True
+            else:
+                if entry.fingerprint != fingerprint:
+                    raise IdempotencyConflictError(
+                        f"Idempotency key {key!r} was used for a different request"
+                    )
+                self._entries.move_to_end(key)
+                self.hits += 1
+                owner = False
+                if entry.unresolved:
+                    # Resolve the sent transactions rather than sending new ones
+                    finish = entry.finish
+                    entry = _Entry(fingerprint)
+                    entry.finish = func = finish
+                    self._entries[key] = entry
+                    owner = True
+
+        if not owner:
+            if not entry.done.wait(timeout):
+                raise TimeoutError(f"Request with idempotency key {key!r} is still in flight")
+            if entry.error is not None:
+                raise entry.error
+            return entry.result
+
+        try:
+            entry.result = func()
+        except BaseException as e:
+            entry.error = e
+            with self._lock:
+                # Release the key so the client can retry a request that
+                # sent nothing
+                if entry.finish is None and self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            entry.done.set()
+
+        with self._lock:
+            self._evict()
+        return entry.result
+
+    def sent(self, key: Hashable, finish: Callable[[], Any]) -> None:
+        """
+        Record that a request's transactions are being sent.
+
+        Called by the request just before submission, since a failed send
+        may still have reached the node; from then on the key is kept even
+        if the request fails, unless it is released.
+
+        Args:
+            key: The idempotency key
+            finish: Completes the request from the sent transactions, e.g.
+                waits for their confirmation and updates the ledger
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.finish = finish
+
+    def release(self, key: Hashable) -> None:
+        """
+        Forget a request so the client can retry it from scratch.
+
+        Used when sent transactions were rejected and can never land.
+
+        Args:
+            key: The idempotency key
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                entry.finish = None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get the stored result of a completed request.
+
+        Args:
+            key: The idempotency key
+
+        Returns:
+            The result, or None if the key is unknown or still in flight
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not entry.done.is_set():
+            return None
+        return entry.result
+
+    def _evict(self) -> None:
+        """Drop least recently used completed entries (lock must be held)."""
+        if len(self._entries) <= self.max_entries:
+            return
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                return
+            entry = self._entries[key]
+            if entry.done.is_set() and not entry.unresolved:
+                del self._entries[key]
@@ -0,0 +1,283 @@
+"""
+Creator liquidity tracking for the Digital Marketplace.
+
+Withdrawals and reward payouts are paid in ALGO from the creator account,
+and deposits pay tokens from it. CreatorLiquidity caches the creator's
+holdings and lets each request reserve what it will spend before a group
+is built and signed. A request that cannot be covered is rejected locally,
+without a node round trip, instead of by the node.
+
+The cached read is refreshed when it is older than a TTL. Between reads,
+the current round is estimated from the clock and the last round the node
+reported; the node's status is polled only once that estimate passes the
+last valid round of the oldest reservation held (see below), and the
+account is read again if the node confirms a new round.
+
+The cache is deliberately conservative: spending is subtracted as soon as
+a request confirms, while incoming deposits only show up on the next
+refresh. A request whose outcome is unknown (e.g. its confirmation timed
+out) stays reserved until the chain passes its last valid round; the first
+refresh after that reads what it actually spent.
+"""
+import threading
+import time
+from typing import Callable, List, Optional
+
+from .scheduler import is_rejected
+
+# Algorand minimum fee per transaction in microALGO
+MIN_TXN_FEE = 1000
+
+# Approximate seconds per Algorand round
+ROUND_TIME = 2.8
+
+
+class InsufficientLiquidityError(ValueError):
+    """Raised when the creator account cannot cover a request."""
+
+
+class Reservation:
+    def __init__(self, tracker: Optional["CreatorLiquidity"], algo: int, tokens: int):
+        """
+        Initialize a reservation; use CreatorLiquidity.reserve instead.
+
+        Args:
+            tracker: The tracker the amounts are reserved from; without one
+                (liquidity not tracked) settling does nothing
+            algo: Reserved microALGO, fees included
+            tokens: Reserved tokens (with decimals)
+        """
+        self.tracker = tracker
+        self.algo = algo
+        self.tokens = tokens
+        self.last_valid: Optional[int] = None
+        self._done = False
+
+    def commit(self) -> None:
+        """Mark the reserved amounts as spent."""
+        if self.tracker is not None:
+            self.tracker._settle(self, spent=True)
+
+    def release(self) -> None:
+        """Return the reserved amounts unspent."""
+        if self.tracker is not None:
+            self.tracker._settle(self, spent=False)
+
+    def hold(self, last_valid: int) -> None:
+        """
+        Keep the amounts reserved while the request's outcome is unknown.
+
+        Args:
+            last_valid: Last round the request's transactions can land in
+        """
+        if self.tracker is not None:
+            self.tracker._hold(self, last_valid)
+
+    def settle(self, error: Optional[BaseException], last_valid: int) -> None:
+        """
+        Settle the reservation from the outcome of sending the request.
+
+        Args:
+            error: The error raised sending or confirming, None if confirmed
+            last_valid: Last round the request's transactions can land in
+        """
+        if error is None:
+            self.commit()
+        elif is_rejected(error):
+            # Rejected by the node or expired: nothing was spent
+            self.release()
+        else:
+            self.hold(last_valid)
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # Spent only if the request went through
+        if exc_type is None:
+            self.commit()
+        else:
+            self.release()
+
+
+class CreatorLiquidity:
+    def __init__(self, algod_client, creator_address: str, asset_id: Optional[int] = None,
+                 fee_per_txn: int = MIN_TXN_FEE, ttl: float = 30.0,
+                 round_time: float = ROUND_TIME,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the tracker; holdings are fetched on first use.
+
+        Args:
+            algod_client: Client used to read the creator account and the
+                node's last round
+            creator_address: The creator's Algorand address
+            asset_id: The marketplace token; set once the token is created
+            fee_per_txn: microALGO reserved for each creator-signed transaction
+            ttl: Seconds a read of the creator account is used
+            round_time: Seconds per round assumed when estimating the round
+            clock: Monotonic clock returning seconds
+        """
+        self.algod_client = algod_client
+        self.creator_address = creator_address
+        self.asset_id = asset_id
+        self.fee_per_txn = fee_per_txn
+        self.ttl = ttl
+        self.round_time = round_time
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._fresh = False
+        self._read_at = 0.0
+        # Last round the node reported and when, for estimating the round
+        self._known_round = 0
+        self._known_at = 0.0
+        # Reservations whose outcome is unknown, until their last valid round
+        self._held: List[Reservation] = []
+        self.round = 0
+        self.algo = 0
+        self.min_balance = 0
+        self.tokens = 0
+        self.reserved_algo = 0
+        self.reserved_tokens = 0
+        self.refreshes = 0
+        self.status_polls = 0
+        self.rejections = 0
+
+    @property
+    def available_algo(self) -> int:
+        """Spendable microALGO above the minimum balance, net of reservations."""
+        return self.algo - self.min_balance - self.reserved_algo
+
+    @property
+    def available_tokens(self) -> int:
+        """Tokens (with decimals) net of reservations."""
+        return self.tokens - self.reserved_tokens
+
+    def refresh(self) -> None:
+        """Read the creator's holdings from the node."""
+        info = self.algod_client.account_info(self.creator_address)
+        tokens = 0
+        for holding in info.get("assets", []):
+            if holding.get("asset-id") == self.asset_id:
+                tokens = holding.get("amount", 0)
+                break
+
+        now = self._clock()
+        with self._lock:
+            self.round = info.get("round", self.round)
+            self.algo = info.get("amount", 0)
+            self.min_balance = info.get("min-balance", 0)
+            self.tokens = tokens
+            self._fresh = True
+            self._read_at = now
+            self._observe(self.round, now)
+            self.refreshes += 1
+
+            # Requests that can no longer land are reflected in this read,
+            # whether or not they went through
+            for reservation in [r for r in self._held if r.last_valid < self.round]:
+                self._held.remove(reservation)
+                self._unreserve(reservation)
+
+    def invalidate(self) -> None:
+        """Force a refresh on the next reservation."""
+        with self._lock:
+            self._fresh = False
+
+    def _observe(self, round_num: int, now: float) -> None:
+        """Anchor the round estimate at a round the node reported (lock must be held)."""
+        if round_num >= self._known_round:
+            self._known_round = round_num
+            self._known_at = now
+
+    def estimated_round(self) -> int:
+        """Current round estimated from the clock and the last round the node reported."""
+        with self._lock:
+            elapsed = self._clock() - self._known_at
+            return self._known_round + int(elapsed / self.round_time)
+
+    def _stale(self) -> Optional[str]:
+        """Why the cached read needs checking, if it does: "read" or "round"."""
+        if not self._fresh or self._clock() - self._read_at >= self.ttl:
+            return "read"
+        with self._lock:
+            oldest = min((r.last_valid for r in self._held), default=None)
+        if oldest is not None and self.estimated_round() > oldest:
+            # A held request can no longer land if the node agrees
+            return "round"
+        return None
+
+    def _ensure_fresh(self) -> None:
+        if self._stale() is None:
+            return
+        # One caller checks, the others use its result
+        with self._refresh_lock:
+            stale = self._stale()
+            if stale == "read":
+                self.refresh()
+            elif stale == "round":
+                node_round = self.algod_client.status()["last-round"]
+                with self._lock:
+                    self.status_polls += 1
+                    self._observe(node_round, self._clock())
+                if node_round > self.round:
+                    self.refresh()
+
+    def reserve(self, algo: int = 0, tokens: int = 0, txns: int = 1) -> Reservation:
+        """
+        Reserve creator holdings for one request.
+
+        Args:
+            algo: microALGO the creator will pay out
+            tokens: Tokens (with decimals) the creator will transfer
+            txns: Creator-signed transactions, each reserving one fee
+
+        Returns:
+            Reservation: Commit once the request confirms, release if it is
+            rejected, hold while its outcome is unknown; used as a context
+            manager it commits or releases automatically
+        """
+        self._ensure_fresh()
+        algo += txns * self.fee_per_txn
+
+        with self._lock:
+            if algo > self.available_algo:
+                self.rejections += 1
+                raise InsufficientLiquidityError(
+                    f"Creator account cannot cover {algo} microALGO "
+                    f"({self.available_algo} available)"
+                )
+            if tokens > self.available_tokens:
+                self.rejections += 1
+                raise InsufficientLiquidityError(
+                    f"Creator account cannot cover {tokens} tokens "
+                    f"({self.available_tokens} available)"
+                )
+            self.reserved_algo += algo
+            self.reserved_tokens += tokens
+        return Reservation(self, algo, tokens)
+
+    def _unreserve(self, reservation: Reservation) -> None:
+        """Drop a reservation's amounts (lock must be held)."""
+        reservation._done = True
+        self.reserved_algo -= reservation.algo
+        self.reserved_tokens -= reservation.tokens
+
+    def _settle(self, reservation: Reservation, spent: bool) -> None:
+        with self._lock:
+            if reservation._done:
+                return
+            if reservation in self._held:
+                self._held.remove(reservation)
+            self._unreserve(reservation)
+            if spent:
+                self.algo -= reservation.algo
+                self.tokens -= reservation.tokens
+
+    def _hold(self, reservation: Reservation, last_valid: int) -> None:
+        with self._lock:
+            if reservation._done or reservation in self._held:
+                return
+            reservation.last_valid = last_valid
+            self._held.append(reservation)
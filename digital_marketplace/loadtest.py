@@ -0,0 +1,349 @@
+"""
+Concurrent load-test harness for the Digital Marketplace.
+
+LoadTest drives one DigitalMarketplace with a mix of deposits, withdrawals
+and reward claims from many simulated users, against any algod client
+(LocalAlgodClient with a realistic round time by default). Two drivers are
+available:
+
+- ``thread``: one thread per user, each issuing operations at its share
+  of the arrival rate (closed loop: a user waits for its last operation)
+- ``asyncio``: one event loop generating arrivals at the full rate and
+  dispatching them to a pool of ``users`` worker threads (open loop:
+  arrivals do not wait, so queueing shows up as latency); a user's
+  operations still run one at a time, as a wallet would send them
+
+Every operation's latency is recorded in total and by phase: ``params``,
+``submit`` and ``confirm`` are time spent in the corresponding node calls,
+``sign`` is the remaining time spent building and signing in the process,
+and ``queue`` (asyncio only) is time between arrival and start.
+
+The ledger is seeded, the way a state file is loaded, so every operation
+is valid on its own; errors come from the node or from the contract
+rejecting a request. At the end the token ledger must still sum to the
+total supply: any drift means concurrent updates were lost or duplicated,
+and fails the run even when no operation reported an error.
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .config import DECIMALS, TOTAL_SUPPLY
+from .contract import DigitalMarketplace
+from .metrics import LatencyRecorder
+from .replay import ReplayAccounts
+from .simulator import LocalAlgodClient
+from .utils import set_algo_price_usdt
+
+MODE_THREAD = "thread"
+MODE_ASYNCIO = "asyncio"
+
+DEFAULT_MIX = {"deposit": 0.5, "withdraw": 0.3, "claim": 0.2}
+
+# Node calls and the phase they are accounted to
+NODE_PHASES = {
+    "suggested_params": "params",
+    "send_transaction": "submit",
+    "send_transactions": "submit",
+    "status": "confirm",
+    "status_after_block": "confirm",
+    "pending_transaction_info": "confirm",
+}
+
+# Per-operation amounts: 10 ALGO deposits, 1 token withdrawals, and the
+# reward a claim is topped up to when empty
+DEPOSIT_AMOUNT = 10_000_000
+WITHDRAW_AMOUNT = 1 * (10 ** DECIMALS)
+SEED_TOKENS = 1_000 * (10 ** DECIMALS)
+SEED_REWARD = 100_000
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    Parse an operation mix such as ``deposit=5,withdraw=3,claim=2``.
+
+    Args:
+        text: Comma-separated operation=weight pairs
+
+    Returns:
+        Dict[str, float]: Operation to weight
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation in mix: {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+class PhaseTimingClient:
+    def __init__(self, algod_client):
+        """
+        Wrap an algod client to time node calls by phase, per thread.
+
+        Args:
+            algod_client: The client to wrap
+        """
+        self._client = algod_client
+        self._local = threading.local()
+
+    def begin(self) -> None:
+        """Start accounting node time for the calling thread's operation."""
+        self._local.phases = {}
+
+    def end(self) -> Dict[str, float]:
+        """Stop accounting and get seconds spent per phase."""
+        phases = getattr(self._local, "phases", None) or {}
+        self._local.phases = None
+        return phases
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        phase = NODE_PHASES.get(name)
+        if phase is None or not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                phases = getattr(self._local, "phases", None)
+                if phases is not None:
+                    phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start
+        return timed
+
+
+class LoadReport:
+    def __init__(self, mode: str, users: int, elapsed: float, latency: LatencyRecorder,
+                 drift: int = 0):
+        """
+        Initialize a load-test report.
+
+        Args:
+            mode: MODE_THREAD or MODE_ASYNCIO
+            users: Concurrent users (threads)
+            elapsed: Wall-clock seconds of the measured run
+            latency: Samples by operation and by ``operation.phase``
+            drift: Sum of the token ledger minus the total supply at the
+                end of the run (with decimals)
+        """
+        self.mode = mode
+        self.users = users
+        self.elapsed = elapsed
+        self.latency = latency
+        self.drift = drift
+
+    @property
+    def conserved(self) -> bool:
+        """Whether the token ledger still sums to the total supply."""
+        return self.drift == 0
+
+    @property
+    def completed(self) -> int:
+        """Operations that succeeded."""
+        return sum(self.latency.count(op) for op in DEFAULT_MIX)
+
+    @property
+    def throughput(self) -> float:
+        """Sustained successful operations per second."""
+        return self.completed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Counts, error rates and latency percentiles by operation and phase."""
+        return self.latency.summary()
+
+
+class LoadTest:
+    def __init__(self, algod_client=None, users: int = 100, rate: float = 50.0,
+                 duration: float = 10.0, mix: Optional[Dict[str, float]] = None,
+                 mode: str = MODE_THREAD, algo_price: float = 0.1945,
+                 rng: Optional[random.Random] = None,
+                 contract_factory: Optional[Callable[..., DigitalMarketplace]] = None):
+        """
+        Initialize a load test.
+
+        Args:
+            algod_client: Client the contract submits to; defaults to a
+                LocalAlgodClient with a 2.8 second round time
+            users: Concurrent users (threads)
+            rate: Target arrivals per second across all users
+            duration: Seconds operations are generated for
+            mix: Operation to relative weight, e.g. DEFAULT_MIX
+            mode: MODE_THREAD or MODE_ASYNCIO
+            algo_price: ALGO price in USDT pinned for the run
+            rng: Random generator for arrivals and the operation mix
+            contract_factory: Builds the contract from (algod_client,
+                creator_address, creator_private_key); defaults to
+                DigitalMarketplace
+        """
+        if mode not in (MODE_THREAD, MODE_ASYNCIO):
+            raise ValueError(f"Unknown mode: {mode}")
+        if users < 1 or rate <= 0:
+            raise ValueError("users and rate must be positive")
+
+        mix = mix or DEFAULT_MIX
+        self.client = PhaseTimingClient(algod_client or LocalAlgodClient(round_time=2.8))
+        self.users = users
+        self.rate = rate
+        self.duration = duration
+        self.operations = [op for op, weight in mix.items() if weight > 0]
+        self.weights = [mix[op] for op in self.operations]
+        self.mode = mode
+        self.algo_price = algo_price
+        self._rng = rng or random.Random()
+        self._rng_lock = threading.Lock()
+        self._contract_factory = contract_factory
+        self.accounts = ReplayAccounts("dmarket-loadtest")
+        self.contract: Optional[DigitalMarketplace] = None
+        self._price_pinned_at = 0.0
+        # Identical operations by one user in the same round would be the
+        # same transaction, so each user has one operation in flight
+        self._user_locks = [threading.Lock() for _ in range(users)]
+
+    def _pin_price(self) -> None:
+        # Re-pin before the utils cache would expire and fetch a live price
+        now = time.monotonic()
+        if now - self._price_pinned_at > 30:
+            self._price_pinned_at = now
+            set_algo_price_usdt(self.algo_price)
+
+    def _setup(self) -> DigitalMarketplace:
+        self._pin_price()
+        creator_address, creator_key = self.accounts.get("__creator__")
+        if self._contract_factory is not None:
+            contract = self._contract_factory(self.client, creator_address, creator_key)
+        else:
+            contract = DigitalMarketplace(self.client, creator_address, creator_key, "loadtest")
+        contract.create_token()
+
+        # Seed every user so withdrawals and claims are valid from the start,
+        # loading the ledger as a state file would
+        holders = {creator_address: TOTAL_SUPPLY * (10 ** DECIMALS) - self.users * SEED_TOKENS}
+        rewards = {}
+        for user in range(self.users):
+            address, _ = self.accounts.get(f"user-{user}")
+            holders[address] = SEED_TOKENS
+            rewards[address] = SEED_REWARD
+        contract.token_holders = holders
+        contract.staking_rewards = rewards
+        return contract
+
+    def _pick(self) -> str:
+        with self._rng_lock:
+            return self._rng.choices(self.operations, self.weights)[0]
+
+    def _interval(self, rate: float) -> float:
+        with self._rng_lock:
+            return self._rng.expovariate(rate)
+
+    def _execute(self, user: int, op: str, latency: LatencyRecorder,
+                 queued: float = 0.0) -> None:
+        contract = self.contract
+        address, private_key = self.accounts.get(f"user-{user}")
+        self._pin_price()
+
+        self.client.begin()
+        start = time.perf_counter()
+        try:
+            if op == "deposit":
+                contract.deposit(address, private_key, DEPOSIT_AMOUNT)
+            elif op == "withdraw":
+                contract.withdraw(address, private_key, WITHDRAW_AMOUNT)
+            else:
+                if contract.get_staking_rewards(address) <= 0:
+                    # Top up outside the ledger under test, as another day of staking would
+                    contract.staking_rewards[address] = SEED_REWARD
+                contract.claim_staking_rewards(address)
+        except Exception:
+            self.client.end()
+            latency.record_error(op)
+            return
+
+        total = time.perf_counter() - start
+        phases = self.client.end()
+        latency.record(op, total + queued)
+        if self.mode == MODE_ASYNCIO:
+            latency.record(f"{op}.queue", queued)
+        for phase, seconds in phases.items():
+            latency.record(f"{op}.{phase}", seconds)
+        latency.record(f"{op}.sign", max(total - sum(phases.values()), 0.0))
+
+    def _run_threads(self, latency: LatencyRecorder, deadline: float) -> None:
+        per_user_rate = self.rate / self.users
+
+        def user_loop(user: int) -> None:
+            # Stagger users so arrivals do not start in lockstep
+            next_arrival = time.perf_counter() + self._interval(per_user_rate)
+            while next_arrival < deadline:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self._execute(user, self._pick(), latency)
+                next_arrival = max(next_arrival, time.perf_counter()) + self._interval(per_user_rate)
+
+        threads = [
+            threading.Thread(target=user_loop, args=(user,), name=f"dmarket-load-{user}", daemon=True)
+            for user in range(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    async def _run_asyncio(self, latency: LatencyRecorder, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+        pending: List[asyncio.Future] = []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.users,
+                                                   thread_name_prefix="dmarket-load") as executor:
+            def dispatch(user: int, op: str, arrived: float) -> None:
+                with self._user_locks[user]:
+                    self._execute(user, op, latency, time.perf_counter() - arrived)
+
+            arrival = time.perf_counter()
+            sequence = 0
+            while True:
+                arrival += self._interval(self.rate)
+                if arrival >= deadline:
+                    break
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                user = sequence % self.users
+                sequence += 1
+                pending.append(loop.run_in_executor(executor, dispatch, user, self._pick(), arrival))
+
+            if pending:
+                await asyncio.gather(*pending)
+
+    def run(self) -> LoadReport:
+        """
+        Run the load test.
+
+        Returns:
+            LoadReport: Throughput, error rates, latency percentiles and the
+            token ledger's drift from the total supply
+        """
+        latency = LatencyRecorder()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            if self.contract is None:
+                self.contract = self._setup()
+
+            start = time.perf_counter()
+            deadline = start + self.duration
+            if self.mode == MODE_THREAD:
+                self._run_threads(latency, deadline)
+            else:
+                asyncio.run(self._run_asyncio(latency, deadline))
+            elapsed = time.perf_counter() - start
+
+        drift = sum(self.contract.token_holders.values()) - TOTAL_SUPPLY * (10 ** DECIMALS)
+        return LoadReport(self.mode, self.users, elapsed, latency, drift)
@@ -0,0 +1,100 @@
+"""
+Latency and throughput metrics for Digital Marketplace tooling.
+"""
+import math
+import threading
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], q: float) -> float:
+    """
+    Get a percentile of pre-sorted samples (nearest-rank).
+
+    Args:
+        sorted_samples: Samples in ascending order
+        q: Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or 0.0 when there are no samples
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        """Initialize an empty, thread-safe recorder of latency samples."""
+        self._samples: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Record one latency sample.
+
+        Args:
+            name: Operation or phase name
+            seconds: Latency in seconds
+        """
+        with self._lock:
+            self._samples.setdefault(name, []).append(seconds)
+
+    def record_error(self, name: str) -> None:
+        """Count one failed operation."""
+        with self._lock:
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    def count(self, name: str) -> int:
+        """Number of successful samples recorded under a name."""
+        with self._lock:
+            return len(self._samples.get(name, ()))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize the recorded samples.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Name to count, errors, error_rate and
+            p50/p95/p99/max latency in milliseconds
+        """
+        with self._lock:
+            names = set(self._samples) | set(self._errors)
+            samples = {name: sorted(self._samples.get(name, ())) for name in names}
+            errors = dict(self._errors)
+
+        summary = {}
+        for name in sorted(names):
+            values = samples[name]
+            failed = errors.get(name, 0)
+            total = len(values) + failed
+            summary[name] = {
+                "count": len(values),
+                "errors": failed,
+                "error_rate": failed / total if total else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": (values[-1] if values else 0.0) * 1000,
+            }
+        return summary
+
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    """
+    Format a LatencyRecorder summary as an aligned table.
+
+    Args:
+        summary: Output of LatencyRecorder.summary
+
+    Returns:
+        str: One line per operation
+    """
+    lines = [f"{'operation':<20}{'count':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for name, stats in summary.items():
+        lines.append(
+            f"{name:<20}{stats['count']:>9}{stats['errors']:>8}"
+            f"{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+        )
+    return "\n".join(lines)
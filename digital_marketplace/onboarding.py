@@ -0,0 +1,444 @@
+"""
+Bulk account onboarding for the Digital Marketplace.
+
+Each account is funded by the creator and opted in to the token. Funding
+and opt-in transactions are packed into maximal atomic groups, with the
+creator's funding transaction paying the opt-in fee (fee pooling), so the
+new accounts need no ALGO of their own. Groups are signed in parallel and
+submitted through a bounded pipeline, and every account's outcome is
+appended to a checkpoint file so an interrupted run can be resumed.
+Each group's funding is reserved from the creator's tracked liquidity
+before it is sent, like any other creator payment.
+
+A group that was sent but not seen confirmed (a crash mid-submit, a
+confirmation timeout, a lost response) is recorded with its transaction ID
+and last valid round. Resuming checks such groups on chain and retries them
+only once they can no longer land, so no account is funded twice.
+"""
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from algosdk.error import AlgodHTTPError, TransactionRejectedError
+from algosdk.future import transaction
+
+from .liquidity import MIN_TXN_FEE
+from .scheduler import LANE_DEPOSIT, is_retryable, last_valid_round
+
+# Algorand limit on transactions per atomic group
+MAX_GROUP_SIZE = 16
+
+# Transactions per account: funding payment and asset opt-in
+TXNS_PER_ACCOUNT = 2
+
+# Minimum balance for an account holding one asset, in microALGO
+DEFAULT_FUNDING_AMOUNT = 200_000
+
+# Per-account status values
+STATUS_PENDING = "pending"
+STATUS_SUBMITTED = "submitted"
+STATUS_CONFIRMED = "confirmed"
+STATUS_FAILED = "failed"
+# Sent, but the outcome is unknown until the group's last valid round passes
+STATUS_UNCONFIRMED = "unconfirmed"
+
+
+class OnboardingReport:
+    def __init__(self):
+        """Initialize an empty onboarding report."""
+        self.status: Dict[str, str] = {}
+        self.tx_ids: Dict[str, str] = {}
+        self.errors: Dict[str, str] = {}
+
+    def record(self, address: str, status: str, tx_id: Optional[str] = None,
+               error: Optional[str] = None) -> None:
+        """Record the latest status of an account."""
+        self.status[address] = status
+        if tx_id is not None:
+            self.tx_ids[address] = tx_id
+        if error is not None:
+            self.errors[address] = error
+
+    def count(self, status: str) -> int:
+        """
+        Count accounts with a given status.
+
+        Args:
+            status: One of the STATUS_* values
+
+        Returns:
+            int: Number of accounts
+        """
+        return sum(1 for s in self.status.values() if s == status)
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Get the number of accounts per status.
+
+        Returns:
+            Dict[str, int]: Status to account count
+        """
+        counts: Dict[str, int] = {}
+        for status in self.status.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+
+class Checkpoint:
+    def __init__(self, path: Optional[str]):
+        """
+        Initialize an append-only JSON lines checkpoint.
+
+        Args:
+            path: Checkpoint file path, or None to keep no checkpoint
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, dict]:
+        """
+        Read the last recorded entry for each account.
+
+        Returns:
+            Dict[str, dict]: Address to its latest checkpoint entry
+        """
+        entries: Dict[str, dict] = {}
+        if not self.path or not os.path.exists(self.path):
+            return entries
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                entries[entry["address"]] = entry
+        return entries
+
+    def append(self, entries: Iterable[dict]) -> None:
+        """Append entries and flush them to disk."""
+        if not self.path:
+            return
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class BulkOnboarder:
+    def __init__(self, contract, funding_amount: int = DEFAULT_FUNDING_AMOUNT,
+                 checkpoint_path: Optional[str] = None, max_in_flight: int = 8,
+                 signing_workers: int = 4, wait_rounds: int = 4,
+                 signing_executor: Optional[Executor] = None):
+        """
+        Initialize the bulk onboarder.
+
+        Args:
+            contract: The DigitalMarketplace whose token accounts opt in to
+            funding_amount: microALGO sent to each account (0 to skip funding)
+            checkpoint_path: File recording per-account progress for resuming
+            max_in_flight: Maximum groups submitted but not yet confirmed
+            signing_workers: Threads used to sign groups
+            wait_rounds: Rounds to wait for each group's confirmation
+            signing_executor: Optional executor to sign groups on instead
+        """
+        if contract.asset_id is None:
+            raise ValueError("Token has not been created yet")
+
+        self.contract = contract
+        self.funding_amount = funding_amount
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.max_in_flight = max_in_flight
+        self.signing_workers = signing_workers
+        self.wait_rounds = wait_rounds
+        self.signing_executor = signing_executor
+
+    @property
+    def accounts_per_group(self) -> int:
+        """Accounts packed into each atomic group."""
+        per_account = TXNS_PER_ACCOUNT if self.funding_amount > 0 else 1
+        return MAX_GROUP_SIZE // per_account
+
+    def build_group(self, accounts: Sequence[Tuple[str, str]], params) -> List:
+        """
+        Build the unsigned transactions onboarding a batch of accounts.
+
+        The creator's funding payment covers the fee of the opt-in that
+        follows it, so new accounts only need the minimum balance.
+
+        Args:
+            accounts: (address, private_key) pairs
+            params: Suggested parameters from the network
+
+        Returns:
+            List: Unsigned transactions with a group ID assigned
+        """
+        min_fee = getattr(params, "min_fee", None) or 1000
+        txns = []
+        for address, _ in accounts:
+            if self.funding_amount > 0:
+                funding_params = transaction.SuggestedParams(
+                    fee=min_fee * 2, first=params.first, last=params.last,
+                    gh=params.gh, gen=params.gen, flat_fee=True
+                )
+                txns.append(transaction.PaymentTxn(
+                    sender=self.contract.creator_address,
+                    sp=funding_params,
+                    receiver=address,
+                    amt=self.funding_amount
+                ))
+                opt_in_params = transaction.SuggestedParams(
+                    fee=0, first=params.first, last=params.last,
+                    gh=params.gh, gen=params.gen, flat_fee=True
+                )
+            else:
+                opt_in_params = params
+
+            txns.append(transaction.AssetTransferTxn(
+                sender=address,
+                sp=opt_in_params,
+                receiver=address,
+                amt=0,
+                index=self.contract.asset_id
+            ))
+
+        transaction.assign_group_id(txns)
+        return txns
+
+    def reserve_group(self, accounts: Sequence[Tuple[str, str]]):
+        """
+        Reserve the creator holdings a batch's group spends.
+
+        Args:
+            accounts: The (address, private_key) pairs of the batch
+
+        Returns:
+            Reservation: The funding and the creator's pooled fees reserved
+
+        Raises:
+            InsufficientLiquidityError: If the creator cannot cover the group
+        """
+        if self.funding_amount <= 0:
+            return self.contract._reserve(txns=0)
+        # Each funding payment also pays the opt-in's fee
+        return self.contract._reserve(
+            algo=len(accounts) * (self.funding_amount + MIN_TXN_FEE), txns=len(accounts)
+        )
+
+    def sign_group(self, accounts: Sequence[Tuple[str, str]], txns: List) -> List:
+        """
+        Sign a group built by build_group.
+
+        Args:
+            accounts: The (address, private_key) pairs the group was built for
+            txns: The unsigned group
+
+        Returns:
+            List: Signed transactions in group order
+        """
+        keys = {address: key for address, key in accounts}
+        signed = []
+        for txn in txns:
+            if txn.sender == self.contract.creator_address:
+                signed.append(txn.sign(self.contract.creator_private_key))
+            else:
+                signed.append(txn.sign(keys[txn.sender]))
+        return signed
+
+    def _resume(self, accounts: Sequence[Tuple[str, str]],
+                report: OnboardingReport) -> List[Tuple[str, str]]:
+        """Drop accounts already onboarded, or possibly onboarded, in a previous run."""
+        previous = self.checkpoint.load()
+        # Outcome of each previously sent group; groups are atomic, so one
+        # on-chain check covers all of a group's accounts
+        verified: Dict[str, str] = {}
+        remaining = []
+        for address, key in accounts:
+            entry = previous.get(address) or {}
+            status = entry.get("status", STATUS_PENDING)
+            tx_id = entry.get("tx_id")
+            if status != STATUS_CONFIRMED and tx_id is not None:
+                if tx_id not in verified:
+                    verified[tx_id] = self._verify(address, entry)
+                status = verified[tx_id]
+
+            if status in (STATUS_CONFIRMED, STATUS_UNCONFIRMED):
+                report.record(address, status, tx_id)
+            else:
+                report.record(address, STATUS_PENDING)
+                remaining.append((address, key))
+        return remaining
+
+    def _verify(self, address: str, entry: dict) -> str:
+        """
+        Check on chain whether a group sent by a previous run went through.
+
+        Args:
+            address: An account of the group
+            entry: The account's last checkpoint entry
+
+        Returns:
+            str: STATUS_CONFIRMED if it landed, STATUS_UNCONFIRMED if it may
+                still land, or STATUS_PENDING if it is safe to send again
+        """
+        client = self.contract.algod_client
+        try:
+            info = client.account_info(address)
+            if any(a.get("asset-id") == self.contract.asset_id
+                   for a in info.get("assets", [])):
+                return STATUS_CONFIRMED
+
+            last_valid = entry.get("last_valid")
+            if last_valid is None:
+                # Entry without a validity window: ask the node's pool
+                pending = client.pending_transaction_info(entry["tx_id"])
+                if pending.get("confirmed-round"):
+                    return STATUS_CONFIRMED
+                return STATUS_PENDING if pending.get("pool-error") else STATUS_UNCONFIRMED
+            if entry["status"] == STATUS_FAILED:
+                # Rejected by the node, so it can never be confirmed
+                return STATUS_PENDING
+            if client.status()["last-round"] <= last_valid:
+                return STATUS_UNCONFIRMED
+            return STATUS_PENDING
+        except AlgodHTTPError as e:
+            if e.code == 404:
+                # Not in the pool and not confirmed
+                return STATUS_PENDING
+            print(f"Failed to verify onboarding of {address}: {e}")
+            return STATUS_UNCONFIRMED
+        except Exception as e:
+            # Unknown is not safe to retry
+            print(f"Failed to verify onboarding of {address}: {e}")
+            return STATUS_UNCONFIRMED
+
+    def _record(self, report: OnboardingReport, batch: Sequence[Tuple[str, str]],
+                status: str, tx_id: Optional[str] = None,
+                error: Optional[str] = None, last_valid: Optional[int] = None) -> None:
+        entries = []
+        for address, _ in batch:
+            report.record(address, status, tx_id, error)
+            entry = {"address": address, "status": status}
+            if tx_id is not None:
+                entry["tx_id"] = tx_id
+            if last_valid is not None:
+                entry["last_valid"] = last_valid
+            if error is not None:
+                entry["error"] = error
+            entries.append(entry)
+        self.checkpoint.append(entries)
+
+    def run(self, accounts: Sequence[Tuple[str, str]]) -> OnboardingReport:
+        """
+        Fund and opt in a list of accounts.
+
+        Accounts whose group may still land from a previous run are reported
+        as STATUS_UNCONFIRMED and not sent again; a run after the group's
+        last valid round confirms or retries them.
+
+        Args:
+            accounts: (address, private_key) pairs to onboard
+
+        Returns:
+            OnboardingReport: Final status of every account
+        """
+        report = OnboardingReport()
+        remaining = self._resume(accounts, report)
+        if not remaining:
+            return report
+
+        size = self.accounts_per_group
+        batches = iter([remaining[i:i + size] for i in range(0, len(remaining), size)])
+
+        own_executor = self.signing_executor is None
+        signer = self.signing_executor or ThreadPoolExecutor(max_workers=self.signing_workers)
+        confirmer = ThreadPoolExecutor(max_workers=self.max_in_flight)
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+
+        def sign(batch):
+            # Fresh params per group, so a long run never sends groups whose
+            # validity window has passed
+            params = self.contract.algod_client.suggested_params()
+            return self.sign_group(batch, self.build_group(batch, params))
+
+        def confirm(batch, tx_id, last_valid, reservation):
+            try:
+                transaction.wait_for_confirmation(
+                    self.contract.algod_client, tx_id, self.wait_rounds
+                )
+                reservation.commit()
+                self._record(report, batch, STATUS_CONFIRMED, tx_id)
+            except TransactionRejectedError as e:
+                reservation.release()
+                self._record(report, batch, STATUS_FAILED, tx_id, str(e), last_valid)
+            except Exception as e:
+                # A timeout does not mean the group failed; it may still land
+                reservation.hold(last_valid)
+                self._record(report, batch, STATUS_UNCONFIRMED, tx_id, str(e), last_valid)
+            finally:
+                in_flight.release()
+
+        def submit_next(signing):
+            batch = next(batches, None)
+            if batch is not None:
+                signing.append((batch, signer.submit(sign, batch)))
+
+        try:
+            # Signing runs a bounded distance ahead of submission, so signed
+            # groups wait at most a few confirmations before being sent
+            signing = deque()
+            for _ in range(self.max_in_flight + self.signing_workers):
+                submit_next(signing)
+
+            while signing:
+                batch, future = signing.popleft()
+                submit_next(signing)
+                try:
+                    signed = future.result()
+                except Exception as e:
+                    # Never sent, so safe to retry
+                    self._record(report, batch, STATUS_FAILED, error=str(e))
+                    continue
+
+                try:
+                    reservation = self.reserve_group(batch)
+                except Exception as e:
+                    # Rejected before sending, so safe to retry
+                    self._record(report, batch, STATUS_FAILED, error=str(e))
+                    continue
+
+                in_flight.acquire()
+
+                # Checkpoint before sending so a crash mid-submit is verified
+                # on chain when resuming rather than funded twice
+                tx_id = signed[0].transaction.get_txid()
+                last_valid = last_valid_round(signed)
+                self._record(report, batch, STATUS_SUBMITTED, tx_id, last_valid=last_valid)
+                try:
+                    # Settles the reservation if sending fails
+                    self.contract._submit(signed, LANE_DEPOSIT, reservation)
+                except Exception as e:
+                    in_flight.release()
+                    if isinstance(e, AlgodHTTPError) and not is_retryable(e):
+                        status = STATUS_FAILED
+                    else:
+                        # The group may have reached the node before the error
+                        status = STATUS_UNCONFIRMED
+                    self._record(report, batch, status, tx_id, str(e), last_valid)
+                    continue
+
+                confirmer.submit(confirm, batch, tx_id, last_valid, reservation)
+        finally:
+            confirmer.shutdown(wait=True)
+            if own_executor:
+                signer.shutdown(wait=True)
+
+        return report
@@ -0,0 +1,230 @@
+"""
+Pool of algod endpoints for the Digital Marketplace.
+
+Reads are routed to the healthy node with the lowest observed latency and
+submissions go to a primary node with failover. The pool exposes the same
+methods as an AlgodClient, so it can be passed to DigitalMarketplace (or a
+SubmissionScheduler) in place of a single client.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from algosdk.error import AlgodHTTPError
+from algosdk.v2client import algod
+
+from .scheduler import is_retryable
+
+# Methods that submit transactions and must go to the primary node
+WRITE_METHODS = {"send_transaction", "send_transactions", "send_raw_transaction"}
+
+# Reads about pending transactions only make sense on the node they were sent to
+PRIMARY_READ_METHODS = {"pending_transaction_info", "pending_transactions",
+                        "pending_transactions_by_address"}
+
+
+class NoHealthyNodeError(Exception):
+    """Raised when no algod endpoint in the pool can serve a request."""
+
+
+class NodeState:
+    def __init__(self, name: str, client):
+        """
+        Initialize the tracked state of one algod endpoint.
+
+        Args:
+            name: Label used in logs (usually the endpoint address)
+            client: The AlgodClient for this endpoint
+        """
+        self.name = name
+        self.client = client
+        self.healthy = True
+        self.last_round = 0
+        self.latency: Optional[float] = None  # EWMA of request latency in seconds
+        self.failures = 0
+
+    def observe(self, latency: float, alpha: float) -> None:
+        """Fold a latency sample into the moving average."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = alpha * latency + (1 - alpha) * self.latency
+
+
+class AlgodClientPool:
+    def __init__(self, clients: Sequence, names: Optional[Sequence[str]] = None,
+                 max_lag: int = 2, health_interval: float = 5.0,
+                 latency_alpha: float = 0.3,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the client pool.
+
+        Args:
+            clients: AlgodClients for each endpoint; the first is the primary
+            names: Optional labels for the endpoints
+            max_lag: Rounds a node may trail the most advanced node and stay healthy
+            health_interval: Seconds between background health checks
+            latency_alpha: Weight of new samples in the latency moving average
+            clock: Monotonic clock returning seconds
+        """
+        if not clients:
+            raise ValueError("At least one algod client is required")
+
+        names = names or [getattr(c, "algod_address", f"node-{i}")
+                          for i, c in enumerate(clients)]
+        self.nodes: List[NodeState] = [NodeState(n, c) for n, c in zip(names, clients)]
+        self.max_lag = max_lag
+        self.health_interval = health_interval
+        self.latency_alpha = latency_alpha
+        self._clock = clock
+        self._primary = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_addresses(cls, addresses: Sequence[str], token: str = "",
+                       **kwargs) -> "AlgodClientPool":
+        """
+        Build a pool from algod endpoint addresses.
+
+        Args:
+            addresses: Endpoint URLs; the first is the primary
+            token: API token shared by the endpoints
+
+        Returns:
+            AlgodClientPool: The pool
+        """
+        clients = [algod.AlgodClient(token, address) for address in addresses]
+        return cls(clients, names=list(addresses), **kwargs)
+
+    @property
+    def primary(self) -> NodeState:
+        """The node currently receiving submissions."""
+        return self.nodes[self._primary]
+
+    def start(self) -> None:
+        """Start background health checks."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="dmarket-algod-health", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop background health checks."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check_health()
+            self._stop.wait(self.health_interval)
+
+    def check_health(self) -> Dict[str, bool]:
+        """
+        Poll every node's status and mark lagging or failing nodes unhealthy.
+
+        Returns:
+            Dict[str, bool]: Node name to health
+        """
+        for node in self.nodes:
+            start = self._clock()
+            try:
+                status = node.client.status()
+            except Exception as e:
+                print(f"Health check failed for {node.name}: {e}")
+                with self._lock:
+                    node.healthy = False
+                    node.failures += 1
+                continue
+
+            with self._lock:
+                node.observe(self._clock() - start, self.latency_alpha)
+                node.last_round = status.get("last-round", 0)
+                node.failures = 0
+                node.healthy = True
+
+        with self._lock:
+            best_round = max((n.last_round for n in self.nodes if n.failures == 0),
+                             default=0)
+            for node in self.nodes:
+                if node.failures == 0 and best_round - node.last_round > self.max_lag:
+                    node.healthy = False
+
+            if not self.primary.healthy:
+                self._fail_over()
+
+            return {node.name: node.healthy for node in self.nodes}
+
+    def _fail_over(self) -> None:
+        """Promote the next healthy node to primary (lock must be held)."""
+        count = len(self.nodes)
+        for offset in range(1, count):
+            index = (self._primary + offset) % count
+            if self.nodes[index].healthy:
+                print(f"Algod primary failed over to {self.nodes[index].name}")
+                self._primary = index
+                return
+
+    def _read_order(self) -> List[NodeState]:
+        """Healthy nodes by ascending latency, then the rest as a last resort."""
+        with self._lock:
+            healthy = sorted(
+                (n for n in self.nodes if n.healthy),
+                key=lambda n: float("inf") if n.latency is None else n.latency
+            )
+            unhealthy = [n for n in self.nodes if not n.healthy]
+        return healthy + unhealthy
+
+    def _write_order(self) -> List[NodeState]:
+        """The primary followed by the other healthy nodes."""
+        with self._lock:
+            primary = self.primary
+            others = [n for n in self.nodes if n is not primary and n.healthy]
+        return [primary] + others
+
+    def _call(self, method: str, nodes: List[NodeState], *args, **kwargs):
+        last_error: Optional[Exception] = None
+        for node in nodes:
+            start = self._clock()
+            try:
+                result = getattr(node.client, method)(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                with self._lock:
+                    node.healthy = False
+                    node.failures += 1
+                    if node is self.primary:
+                        self._fail_over()
+                continue
+
+            with self._lock:
+                node.observe(self._clock() - start, self.latency_alpha)
+            return result
+
+        if isinstance(last_error, AlgodHTTPError):
+            raise last_error
+        raise NoHealthyNodeError(f"No algod node could serve {method}") from last_error
+
+    def __getattr__(self, method: str):
+        # Only forward AlgodClient methods, not private or missing attributes
+        nodes = self.__dict__.get("nodes")
+        if method.startswith("_") or not nodes or not callable(getattr(nodes[0].client, method, None)):
+            raise AttributeError(method)
+
+        def call(*args, **kwargs):
+            if method in WRITE_METHODS:
+                return self._call(method, self._write_order(), *args, **kwargs)
+            if method in PRIMARY_READ_METHODS:
+                return self._call(method, [self.primary], *args, **kwargs)
+            return self._call(method, self._read_order(), *args, **kwargs)
+
+        call.__name__ = method
+        return call
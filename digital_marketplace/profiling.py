@@ -0,0 +1,240 @@
+"""
+Opt-in sampling profiler for Digital Marketplace operations.
+
+SamplingProfiler wraps DigitalMarketplace methods (on one instance or on
+the class) only while it is attached, so a detached profiler costs
+nothing. While attached, a fraction of calls is profiled: a background
+thread samples the calling thread's stack at a fixed interval, and
+tracemalloc optionally records what the call allocated: the growth between
+snapshots taken when the call starts and ends, so memory that was already
+live is not charged to it. tracemalloc is process-wide, so allocations
+other threads make during the call are still included. Both are written
+as collapsed stacks (``frame;frame;frame count``), the input format of
+flamegraph.pl, speedscope and similar tools.
+"""
+import functools
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Methods profiled when attach() is not given a list
+DEFAULT_METHODS = (
+    "create_token",
+    "opt_in",
+    "deposit",
+    "withdraw",
+    "calculate_staking_rewards",
+    "claim_staking_rewards",
+    "get_token_info",
+)
+
+# Stack key that samples beyond max_stacks distinct stacks are counted under
+OTHER_STACK = "[other]"
+
+_MISSING = object()
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse_frame(frame, root: str) -> str:
+    """
+    Format a frame and its callers as a collapsed stack.
+
+    Args:
+        frame: Innermost frame
+        root: Label placed at the root of the stack, e.g. the method name
+
+    Returns:
+        str: Semicolon-separated frames, outermost first
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    def __init__(self, sample_rate: float = 0.01, interval: float = 0.005,
+                 trace_allocations: bool = False, allocation_frames: int = 16,
+                 max_stacks: int = 10_000, rng: Optional[random.Random] = None):
+        """
+        Initialize the profiler; nothing is wrapped until attach().
+
+        Args:
+            sample_rate: Fraction of calls profiled
+            interval: Seconds between stack samples of a profiled call
+            trace_allocations: Also record allocations with tracemalloc
+            allocation_frames: Frames kept per allocation traceback
+            max_stacks: Distinct stacks kept per output before the rest are
+                counted under OTHER_STACK
+            rng: Random generator used to pick profiled calls
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+        self.allocation_frames = allocation_frames
+        self.max_stacks = max_stacks
+        self._rng = rng or random.Random()
+        self.stacks: Counter = Counter()
+        self.allocations: Counter = Counter()
+        self.calls: Counter = Counter()
+        self.profiled: Counter = Counter()
+        self._attached: List[Tuple[object, str, object]] = []
+        self._active: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._tracing_calls = 0
+        self._owns_tracing = False
+
+    @property
+    def attached(self) -> bool:
+        """Whether any methods are currently wrapped."""
+        return bool(self._attached)
+
+    def attach(self, target, methods: Sequence[str] = DEFAULT_METHODS) -> None:
+        """
+        Start profiling methods of a contract instance or class.
+
+        Args:
+            target: A DigitalMarketplace instance, or the class itself to
+                profile every instance
+            methods: Names of the methods to wrap
+        """
+        for name in methods:
+            original = getattr(target, name)
+            own = vars(target).get(name, _MISSING)
+            setattr(target, name, self._wrap(name, original))
+            self._attached.append((target, name, own))
+
+        self._stopped.clear()
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, name="dmarket-profiler",
+                                             daemon=True)
+            self._sampler.start()
+
+    def detach(self) -> None:
+        """Restore every wrapped method and stop sampling."""
+        while self._attached:
+            target, name, own = self._attached.pop()
+            if own is _MISSING:
+                delattr(target, name)
+            else:
+                setattr(target, name, own)
+
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.detach()
+
+    def _wrap(self, name: str, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._lock:
+                self.calls[name] += 1
+            if self._rng.random() >= self.sample_rate:
+                return func(*args, **kwargs)
+            return self._profile_call(name, func, args, kwargs)
+        return wrapper
+
+    def _profile_call(self, name: str, func, args, kwargs):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = name
+            self.profiled[name] += 1
+        start = self._start_tracing() if self.trace_allocations else None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active.pop(thread_id, None)
+            if start is not None:
+                self._stop_tracing(name, start)
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+
+    def _start_tracing(self) -> tracemalloc.Snapshot:
+        """Start tracing if needed and snapshot the memory live before the call."""
+        with self._lock:
+            if self._tracing_calls == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(self.allocation_frames)
+                self._owns_tracing = True
+            self._tracing_calls += 1
+        return self._snapshot()
+
+    def _stop_tracing(self, name: str, start: tracemalloc.Snapshot) -> None:
+        """Charge the memory that grew since ``start`` to a call."""
+        end = self._snapshot()
+        with self._lock:
+            self._tracing_calls -= 1
+            if self._tracing_calls == 0 and self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+
+        for stat in end.compare_to(start, "traceback"):
+            if stat.size_diff <= 0:
+                continue
+            # Tracebacks are ordered oldest frame first
+            labels = [f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+            self._count(self.allocations, ";".join([name] + labels), stat.size_diff)
+
+    def _count(self, counter: Counter, stack: str, amount: int) -> None:
+        with self._lock:
+            if stack not in counter and len(counter) >= self.max_stacks:
+                stack = OTHER_STACK
+            counter[stack] += amount
+
+    def _sample_loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                if not self._active:
+                    continue
+                active = dict(self._active)
+            frames = sys._current_frames()
+            for thread_id, name in active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._count(self.stacks, collapse_frame(frame, name), 1)
+            del frames
+
+    def write_collapsed(self, path: str, allocations: bool = False) -> int:
+        """
+        Write collected samples as collapsed stacks.
+
+        Args:
+            path: Output file
+            allocations: Write allocated bytes instead of time samples
+
+        Returns:
+            int: Number of stacks written
+        """
+        counter = self.allocations if allocations else self.stacks
+        with self._lock:
+            rows = sorted(counter.items())
+        with open(path, "w") as f:
+            for stack, count in rows:
+                f.write(f"{stack} {count}\n")
+        return len(rows)
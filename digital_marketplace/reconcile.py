@@ -0,0 +1,325 @@
+"""
+Hash-bucket reconciliation of token balances against chain state.
+
+Addresses are partitioned into buckets by a stable hash. Each bucket has an
+order-independent digest: the sum, modulo 2**128, of a hash of every
+(address, balance) pair with a non-zero balance. Because the digest is a
+sum, a balance change updates it in O(1) by subtracting the old pair and
+adding the new one. The Reconciler installs a BucketIndex on the contract,
+which _set_balance updates on every change together with the bucket's
+member addresses, so the local side never rescans the ledger after the
+initial build.
+
+Reconciling compares the local digests with digests computed from chain
+data for the same buckets, and only buckets whose digests differ are
+fetched and diffed address by address. Chain digests come from any source
+with ``bucket_digests()`` and ``bucket_balances(bucket)``.
+
+Limitation: algod has no per-bucket or digest query and the indexer can
+only list balances, so ChainSnapshot is built from a full indexer scan of
+every holder (see indexer_balances, about N / page_size requests). Build it
+once and keep it current with ChainSnapshot.update from the asset transfers
+of each new round, or supply a source that maintains digests from the
+block stream, rather than rescanning for every reconciliation.
+"""
+import hashlib
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .sharding import shard_of
+
+DEFAULT_BUCKETS = 4096
+
+_MODULUS = 1 << 128
+
+
+def entry_hash(address: str, balance: int) -> int:
+    """
+    Hash one (address, balance) pair for a bucket digest.
+
+    Args:
+        address: The Algorand address
+        balance: Token balance (with decimals)
+
+    Returns:
+        int: 128-bit hash; 0 for a zero balance, so absent and zero match
+    """
+    if not balance:
+        return 0
+    digest = hashlib.blake2b(f"{address}:{balance}".encode(), digest_size=16).digest()
+    return int.from_bytes(digest, "big")
+
+
+class BucketDigests:
+    def __init__(self, buckets: int = DEFAULT_BUCKETS):
+        """
+        Initialize empty digests.
+
+        Args:
+            buckets: Number of hash buckets
+        """
+        self.buckets = buckets
+        self.digests: List[int] = [0] * buckets
+
+    @classmethod
+    def from_balances(cls, balances: Iterable[Tuple[str, int]],
+                      buckets: int = DEFAULT_BUCKETS) -> "BucketDigests":
+        """
+        Compute digests of a full set of balances.
+
+        Args:
+            balances: (address, balance) pairs
+            buckets: Number of hash buckets
+
+        Returns:
+            BucketDigests: The digests
+        """
+        digests = cls(buckets)
+        for address, balance in balances:
+            digests.update(address, 0, balance)
+        return digests
+
+    def update(self, address: str, old: int, new: int) -> None:
+        """
+        Apply one balance change.
+
+        Args:
+            address: The Algorand address
+            old: Balance before the change
+            new: Balance after the change
+        """
+        if old == new:
+            return
+        bucket = shard_of(address, self.buckets)
+        self.digests[bucket] = (
+            self.digests[bucket] - entry_hash(address, old) + entry_hash(address, new)
+        ) % _MODULUS
+
+    def set_bucket(self, bucket: int, balances: Dict[str, int]) -> None:
+        """Replace one bucket's digest with that of its full contents."""
+        self.digests[bucket] = sum(entry_hash(a, b) for a, b in balances.items()) % _MODULUS
+
+    def mismatched(self, other: Sequence[int]) -> List[int]:
+        """
+        Get the buckets whose digests differ from another set of digests.
+
+        Args:
+            other: Digests for the same number of buckets
+
+        Returns:
+            List[int]: Differing bucket indexes
+        """
+        if len(other) != self.buckets:
+            raise ValueError(f"Expected {self.buckets} digests, got {len(other)}")
+        return [b for b, (mine, theirs) in enumerate(zip(self.digests, other)) if mine != theirs]
+
+
+class BucketIndex(BucketDigests):
+    def __init__(self, buckets: int = DEFAULT_BUCKETS):
+        """
+        Initialize empty digests that also track each bucket's addresses.
+
+        Args:
+            buckets: Number of hash buckets
+        """
+        super().__init__(buckets)
+        self.members: List[Set[str]] = [set() for _ in range(buckets)]
+        self._lock = threading.Lock()
+
+    def update(self, address: str, old: int, new: int) -> None:
+        """
+        Apply one balance change.
+
+        Args:
+            address: The Algorand address
+            old: Balance before the change
+            new: Balance after the change
+        """
+        if old == new:
+            return
+        bucket = shard_of(address, self.buckets)
+        with self._lock:
+            self.digests[bucket] = (
+                self.digests[bucket] - entry_hash(address, old) + entry_hash(address, new)
+            ) % _MODULUS
+            if new:
+                self.members[bucket].add(address)
+            else:
+                self.members[bucket].discard(address)
+
+    def set_bucket(self, bucket: int, balances: Dict[str, int]) -> None:
+        """Replace one bucket's digest and addresses with its full contents."""
+        with self._lock:
+            super().set_bucket(bucket, balances)
+            self.members[bucket] = {a for a, b in balances.items() if b}
+
+    def bucket_addresses(self, bucket: int) -> List[str]:
+        """Addresses with a non-zero balance in one bucket."""
+        with self._lock:
+            return list(self.members[bucket])
+
+
+class ChainSnapshot:
+    def __init__(self, balances: Iterable[Tuple[str, int]], buckets: int = DEFAULT_BUCKETS):
+        """
+        Bucket a snapshot of on-chain balances.
+
+        Reading every balance is the expensive part (see the module
+        docstring); keep one snapshot current with update() rather than
+        building a new one per reconciliation.
+
+        Args:
+            balances: (address, amount) pairs, e.g. from indexer_balances
+            buckets: Number of hash buckets
+        """
+        self.buckets = buckets
+        self._balances: List[Dict[str, int]] = [{} for _ in range(buckets)]
+        self._digests = BucketDigests(buckets)
+        for address, amount in balances:
+            self.update(address, amount)
+
+    def update(self, address: str, amount: int) -> None:
+        """
+        Set one address's on-chain balance, e.g. after a transfer.
+
+        Args:
+            address: The Algorand address
+            amount: Its balance now
+        """
+        contents = self._balances[shard_of(address, self.buckets)]
+        self._digests.update(address, contents.get(address, 0), amount)
+        if amount:
+            contents[address] = amount
+        else:
+            contents.pop(address, None)
+
+    def bucket_digests(self) -> List[int]:
+        """Digest of every bucket."""
+        return list(self._digests.digests)
+
+    def bucket_balances(self, bucket: int) -> Dict[str, int]:
+        """Non-zero balances of one bucket."""
+        return dict(self._balances[bucket])
+
+
+def indexer_balances(indexer_client, asset_id: int,
+                     page_size: int = 1000) -> Iterator[Tuple[str, int]]:
+    """
+    Stream every holder's balance of an asset from an indexer.
+
+    This is a full scan, one request per ``page_size`` holders.
+
+    Args:
+        indexer_client: An algosdk IndexerClient
+        asset_id: The marketplace token
+        page_size: Holders requested per page
+
+    Yields:
+        Tuple[str, int]: Address and amount
+    """
+    next_page = None
+    while True:
+        response = indexer_client.asset_balances(asset_id, limit=page_size, next_page=next_page)
+        for holding in response.get("balances", []):
+            yield holding["address"], holding.get("amount", 0)
+        next_page = response.get("next-token")
+        if not next_page or not response.get("balances"):
+            return
+
+
+class ReconciliationReport:
+    def __init__(self, buckets: int, mismatched: List[int],
+                 differences: Dict[str, Tuple[int, int]]):
+        """
+        Initialize a reconciliation report.
+
+        Args:
+            buckets: Buckets compared
+            mismatched: Buckets whose digests differed
+            differences: Address to (local balance, chain balance)
+        """
+        self.buckets = buckets
+        self.mismatched = mismatched
+        self.differences = differences
+
+    @property
+    def consistent(self) -> bool:
+        """Whether local and chain balances agree."""
+        return not self.differences
+
+
+class Reconciler:
+    def __init__(self, contract, buckets: int = DEFAULT_BUCKETS):
+        """
+        Start tracking a contract's balances in bucket digests.
+
+        Digests the current ledger once and installs the resulting
+        BucketIndex as the contract's ``bucket_index``, which every balance
+        change then updates. Create it while the ledger is quiescent (e.g.
+        at startup) and call rebuild() if the ledger is replaced wholesale
+        (e.g. by loading a state file). Any drift is repaired bucket by
+        bucket when reconcile() diffs a mismatching bucket.
+
+        Args:
+            contract: The DigitalMarketplace
+            buckets: Number of hash buckets
+        """
+        self.contract = contract
+        self.buckets = buckets
+        self.rebuilds = 0
+        self.local = self._build()
+
+    def _build(self) -> BucketIndex:
+        index = BucketIndex.from_balances(self.contract.token_holders.items(), self.buckets)
+        self.contract.bucket_index = index
+        return index
+
+    def rebuild(self) -> None:
+        """Digest the whole ledger again, after it was replaced."""
+        self.local = self._build()
+        self.rebuilds += 1
+
+    def _local_buckets(self, buckets: Sequence[int]) -> Dict[int, Dict[str, int]]:
+        """Collect the local non-zero balances of some buckets from their addresses."""
+        holders = self.contract.token_holders
+        wanted = {}
+        for bucket in buckets:
+            contents = {}
+            for address in self.local.bucket_addresses(bucket):
+                balance = holders.get(address, 0)
+                if balance:
+                    contents[address] = balance
+            wanted[bucket] = contents
+        return wanted
+
+    def reconcile(self, source, digests: Optional[Sequence[int]] = None) -> ReconciliationReport:
+        """
+        Compare local balances with chain balances.
+
+        Args:
+            source: Chain data with bucket_digests() and bucket_balances(bucket)
+            digests: Chain digests, if already fetched from the source
+
+        Returns:
+            ReconciliationReport: Mismatching buckets and per-address differences
+        """
+        chain_digests = digests if digests is not None else source.bucket_digests()
+        mismatched = self.local.mismatched(chain_digests)
+
+        differences: Dict[str, Tuple[int, int]] = {}
+        for bucket, local in self._local_buckets(mismatched).items():
+            chain = source.bucket_balances(bucket)
+            for address in local.keys() | chain.keys():
+                local_balance = local.get(address, 0)
+                chain_balance = chain.get(address, 0)
+                if local_balance != chain_balance:
+                    differences[address] = (local_balance, chain_balance)
+            # Repair any drift in the tracked digest of a bucket just read
+            self.local.set_bucket(bucket, local)
+
+        return ReconciliationReport(self.buckets, mismatched, differences)
+
+    def close(self) -> None:
+        """Stop tracking changes."""
+        if self.contract.bucket_index is self.local:
+            self.contract.bucket_index = None
@@ -0,0 +1,256 @@
+"""
+Replay engine for recorded Digital Marketplace operation logs.
+
+A log is a JSON lines file with one operation per line, for example::
+
+    {"ts": 1700000000.0, "op": "deposit", "address": "ALICE", "amount": 5000000}
+    {"ts": 1700000012.5, "op": "withdraw", "address": "ALICE", "amount": 100000000}
+    {"ts": 1700086400.0, "op": "stake-run"}
+    {"ts": 1700086460.0, "op": "claim", "address": "ALICE"}
+
+Amounts are microALGO for deposits and tokens (with decimals) for
+withdrawals. The log is streamed through a DigitalMarketplace backed by a
+pluggable algod client, at real time, scaled or maximum speed. The contract
+reads time from a replay clock that follows the log's timestamps and the
+ALGO price from its own oracle, so a replay changes no process-wide state.
+"""
+import base64
+import hashlib
+import json
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from algosdk import encoding
+from nacl.signing import SigningKey
+
+from .contract import DigitalMarketplace
+from .metrics import LatencyRecorder
+from .utils import PriceOracle
+
+OPERATIONS = ("deposit", "withdraw", "stake-run", "claim")
+
+
+def iter_log(path: str) -> Iterator[dict]:
+    """
+    Stream operations from a JSON lines log.
+
+    Args:
+        path: Path of the log
+
+    Yields:
+        dict: One operation record
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("op") not in OPERATIONS:
+                raise ValueError(f"Unknown operation on line {line_number}: {record.get('op')!r}")
+            yield record
+
+
+def ledger_digest(token_holders: Dict[str, int], staking_rewards: Dict[str, int],
+                  addresses: Optional[Dict[str, str]] = None) -> str:
+    """
+    Get an order-independent SHA-256 digest of ledger state.
+
+    Zero entries are skipped, so a holder that was never touched and one
+    whose balance went back to zero produce the same digest.
+
+    Args:
+        token_holders: Address to token balance
+        staking_rewards: Address to pending reward
+        addresses: Optional mapping from ledger address to the name to digest
+
+    Returns:
+        str: Hex digest
+    """
+    addresses = addresses or {}
+    rows = []
+    for address in set(token_holders) | set(staking_rewards):
+        balance = token_holders.get(address, 0)
+        reward = staking_rewards.get(address, 0)
+        if balance or reward:
+            rows.append(f"{addresses.get(address, address)}:{balance}:{reward}\n")
+
+    digest = hashlib.sha256()
+    for row in sorted(rows):
+        digest.update(row.encode())
+    return digest.hexdigest()
+
+
+class ReplayClock:
+    def __init__(self, start: float = 0.0):
+        """
+        Initialize a clock set by the replay engine.
+
+        Args:
+            start: Initial UNIX timestamp
+        """
+        self.now = start
+
+    def __call__(self) -> int:
+        return int(self.now)
+
+
+class ReplayAccounts:
+    def __init__(self, seed: str = "dmarket-replay"):
+        """
+        Initialize deterministic throwaway accounts for logged addresses.
+
+        Logged addresses may be placeholders and their keys are not in the
+        log, so each one is mapped to an account derived from the seed.
+
+        Args:
+            seed: Seed for key derivation
+        """
+        self.seed = seed
+        self._accounts: Dict[str, Tuple[str, str]] = {}
+        self.names: Dict[str, str] = {}
+
+    def get(self, name: str) -> Tuple[str, str]:
+        """
+        Get the (address, private_key) pair for a logged address.
+
+        Args:
+            name: Address as it appears in the log
+
+        Returns:
+            Tuple[str, str]: Replay address and private key
+        """
+        account = self._accounts.get(name)
+        if account is None:
+            signing_key = SigningKey(hashlib.sha256(f"{self.seed}:{name}".encode()).digest())
+            public_key = signing_key.verify_key.encode()
+            private_key = base64.b64encode(signing_key.encode() + public_key).decode()
+            account = (encoding.encode_address(public_key), private_key)
+            self._accounts[name] = account
+            self.names[account[0]] = name
+        return account
+
+
+class ReplayReport:
+    def __init__(self, operations: int, elapsed: float, latency: LatencyRecorder,
+                 digest: str):
+        """
+        Initialize a replay report.
+
+        Args:
+            operations: Operations replayed (including failed ones)
+            elapsed: Wall-clock seconds the replay took
+            latency: Per-operation latency samples
+            digest: ledger_digest of the final state, by logged address
+        """
+        self.operations = operations
+        self.elapsed = elapsed
+        self.latency = latency
+        self.digest = digest
+
+    @property
+    def throughput(self) -> float:
+        """Operations per wall-clock second."""
+        return self.operations / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-operation counts, errors and latency percentiles."""
+        return self.latency.summary()
+
+
+class ReplayEngine:
+    def __init__(self, algod_client, speed: Optional[float] = None,
+                 algo_price: float = 0.1945, accounts: Optional[ReplayAccounts] = None,
+                 quiet: bool = True, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the replay engine.
+
+        Args:
+            algod_client: Client the contract submits to (e.g. LocalAlgodClient)
+            speed: 1.0 for real time, >1 to replay faster, None for maximum speed
+            algo_price: ALGO price in USDT used for the whole replay
+            accounts: Mapping of logged addresses to signing accounts
+            quiet: Suppress the contract's per-transaction messages
+            sleep: Function used to wait between operations
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError("Speed must be positive, or None for maximum speed")
+
+        self.algod_client = algod_client
+        self.speed = speed
+        self.algo_price = algo_price
+        self.accounts = accounts or ReplayAccounts()
+        self.quiet = quiet
+        self._sleep = sleep
+        self.clock = ReplayClock()
+        self.contract: Optional[DigitalMarketplace] = None
+
+    def _setup(self, start: float) -> DigitalMarketplace:
+        creator_address, creator_key = self.accounts.get("__creator__")
+        self.clock.now = start
+        contract = DigitalMarketplace(
+            self.algod_client, creator_address, creator_key, "replay", clock=self.clock,
+            price_oracle=PriceOracle(fetch=lambda: self.algo_price),
+            log=(lambda message: None) if self.quiet else None
+        )
+        contract.create_token()
+        return contract
+
+    def _apply(self, contract: DigitalMarketplace, record: dict) -> None:
+        op = record["op"]
+        if op == "stake-run":
+            contract.calculate_staking_rewards(workers=record.get("workers", 1))
+            return
+
+        address, private_key = self.accounts.get(record["address"])
+        if op == "deposit":
+            contract.deposit(address, private_key, record["amount"], record.get("key"))
+        elif op == "withdraw":
+            contract.withdraw(address, private_key, record["amount"], record.get("key"))
+        else:
+            contract.claim_staking_rewards(address)
+
+    def run(self, records) -> ReplayReport:
+        """
+        Replay operations.
+
+        Args:
+            records: Iterable of operation records, e.g. from iter_log
+
+        Returns:
+            ReplayReport: Throughput, latency percentiles and final ledger digest
+        """
+        latency = LatencyRecorder()
+        operations = 0
+        wall_start = time.perf_counter()
+        first_ts = None
+
+        for record in records:
+            ts = float(record["ts"])
+            if self.contract is None:
+                self.contract = self._setup(ts)
+                first_ts = ts
+
+            # Wait until the operation's (scaled) offset from the first one
+            if self.speed is not None:
+                due = wall_start + (ts - first_ts) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    self._sleep(delay)
+
+            self.clock.now = ts
+            start = time.perf_counter()
+            try:
+                self._apply(self.contract, record)
+            except Exception:
+                latency.record_error(record["op"])
+            else:
+                latency.record(record["op"], time.perf_counter() - start)
+            operations += 1
+
+        elapsed = time.perf_counter() - wall_start
+        digest = ""
+        if self.contract is not None:
+            digest = ledger_digest(self.contract.token_holders, self.contract.staking_rewards,
+                                   self.accounts.names)
+        return ReplayReport(operations, elapsed, latency, digest)
@@ -0,0 +1,364 @@
+"""
+Transaction submission scheduler for the Digital Marketplace.
+
+Submissions are rate limited with a token bucket, retried with exponential
+backoff and jitter when the node reports a transient failure, and served
+from separate priority lanes so user withdrawals are never stuck behind a
+bulk reward payout.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+import urllib.error
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional
+
+from algosdk.error import AlgodHTTPError, TransactionRejectedError
+
+# Priority lanes (lower value is served first)
+LANE_WITHDRAWAL = 0
+LANE_DEPOSIT = 1
+LANE_REWARD = 2
+LANES = (LANE_WITHDRAWAL, LANE_DEPOSIT, LANE_REWARD)
+
+# HTTP status codes that indicate a transient node-side failure
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TransactionExpiredError(Exception):
+    """Raised when a transaction is past its last valid round."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether a submission error is worth retrying.
+
+    Args:
+        error: The exception raised by the algod client
+
+    Returns:
+        bool: True for rate limiting, 5xx responses and connection failures
+    """
+    if isinstance(error, (AlgodHTTPError, urllib.error.HTTPError)):
+        return error.code in RETRYABLE_STATUS_CODES
+    # algosdk only wraps HTTP errors; an unreachable node raises URLError,
+    # and resets and socket timeouts surface as other OSErrors
+    return isinstance(error, OSError)
+
+
+def is_rejected(error: Exception) -> bool:
+    """
+    Check whether a submission error means the transactions can never land.
+
+    Args:
+        error: The exception raised sending or confirming
+
+    Returns:
+        bool: True for rejected or expired transactions and for non-retryable
+        node responses; False when the outcome is unknown (e.g. a 5xx, a
+        connection failure or a timeout)
+    """
+    if isinstance(error, (TransactionRejectedError, TransactionExpiredError)):
+        return True
+    return isinstance(error, AlgodHTTPError) and not is_retryable(error)
+
+
+def last_valid_round(signed_txns) -> Optional[int]:
+    """
+    Get the round after which a signed transaction (or group) is dead.
+
+    Args:
+        signed_txns: A signed transaction or a list of signed transactions
+
+    Returns:
+        Optional[int]: The smallest last valid round in the group, if known
+    """
+    if not isinstance(signed_txns, (list, tuple)):
+        signed_txns = [signed_txns]
+
+    rounds = []
+    for stxn in signed_txns:
+        txn = getattr(stxn, "transaction", None)
+        last_valid = getattr(txn, "last_valid_round", None)
+        if isinstance(last_valid, int):
+            rounds.append(last_valid)
+
+    return min(rounds) if rounds else None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a token bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+            clock: Monotonic clock returning seconds
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("Rate and capacity must be positive")
+
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket if they are available.
+
+        Args:
+            tokens: Number of tokens to take
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1,
+                sleep: Callable[[float], None] = time.sleep) -> None:
+        """
+        Block until tokens are available and take them.
+
+        Args:
+            tokens: Number of tokens to take
+            sleep: Function used to wait
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            sleep(wait)
+
+
+class _Job:
+    __slots__ = ("signed_txns", "lane", "last_valid", "attempts", "future")
+
+    def __init__(self, signed_txns, lane: int, last_valid: Optional[int]):
+        self.signed_txns = signed_txns
+        self.lane = lane
+        self.last_valid = last_valid
+        self.attempts = 0
+        self.future: Future = Future()
+
+
+class SubmissionScheduler:
+    def __init__(self, algod_client, rate: float = 20.0, burst: float = 40.0,
+                 max_retries: int = 5, base_delay: float = 0.25,
+                 max_delay: float = 8.0, rng: Optional[random.Random] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the submission scheduler.
+
+        Args:
+            algod_client: The algod client submissions are sent to; with an
+                AlgodClientPool, the rate applies to each node separately
+            rate: Sustained submissions per second allowed on the node
+            burst: Maximum number of submissions sent back to back
+            max_retries: Retries allowed for a retryable error before giving up
+            base_delay: Backoff delay in seconds for the first retry
+            max_delay: Upper bound for a single backoff delay in seconds
+            rng: Random generator used for backoff jitter
+            clock: Monotonic clock returning seconds
+        """
+        self.algod_client = algod_client
+        self.rate = rate
+        self.burst = burst
+        self.bucket = TokenBucket(rate, burst, clock)
+        # Buckets of the other nodes of a pool, by node name
+        self._node_buckets: Dict[str, TokenBucket] = {}
+        self._bucket_node: Optional[str] = None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+        self._clock = clock
+
+        self._lanes: Dict[int, Deque[_Job]] = {lane: deque() for lane in LANES}
+        self._delayed: List = []  # heap of (ready_at, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, signed_txns, lane: int = LANE_DEPOSIT,
+               last_valid: Optional[int] = None) -> Future:
+        """
+        Queue a signed transaction or group for submission.
+
+        Args:
+            signed_txns: A signed transaction or a list forming an atomic group
+            lane: Priority lane (LANE_WITHDRAWAL, LANE_DEPOSIT or LANE_REWARD)
+            last_valid: Last valid round; read from the transactions if omitted
+
+        Returns:
+            Future: Resolves to the transaction ID returned by the node
+        """
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown submission lane: {lane}")
+        if last_valid is None:
+            last_valid = last_valid_round(signed_txns)
+
+        job = _Job(signed_txns, lane, last_valid)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler has been closed")
+            self._lanes[lane].append(job)
+            self._ensure_worker()
+            self._cond.notify()
+        return job.future
+
+    def send(self, signed_txns, lane: int = LANE_DEPOSIT,
+             last_valid: Optional[int] = None,
+             timeout: Optional[float] = None) -> str:
+        """
+        Submit a signed transaction or group and wait for the node to accept it.
+
+        Returns:
+            str: The transaction ID
+        """
+        return self.submit(signed_txns, lane, last_valid).result(timeout)
+
+    def close(self) -> None:
+        """Stop the dispatcher once all queued submissions are finished."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def pending(self) -> Dict[int, int]:
+        """
+        Get the number of queued submissions per lane.
+
+        Returns:
+            Dict[int, int]: Lane to queue length, including delayed retries
+        """
+        with self._cond:
+            counts = {lane: len(jobs) for lane, jobs in self._lanes.items()}
+            for _, _, job in self._delayed:
+                counts[job.lane] += 1
+        return counts
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="dmarket-submitter", daemon=True
+            )
+            self._thread.start()
+
+    def _next_job(self) -> Optional[_Job]:
+        """Wait for the highest priority job that is ready to be sent."""
+        with self._cond:
+            while True:
+                now = self._clock()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, job = heapq.heappop(self._delayed)
+                    self._lanes[job.lane].append(job)
+
+                for lane in LANES:
+                    if self._lanes[lane]:
+                        return self._lanes[lane].popleft()
+
+                if self._delayed:
+                    self._cond.wait(self._delayed[0][0] - now)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._dispatch(job)
+
+    def _dispatch(self, job: _Job) -> None:
+        if job.attempts and self._is_expired(job):
+            job.future.set_exception(TransactionExpiredError(
+                f"Transaction expired after round {job.last_valid}"
+            ))
+            return
+
+        self._bucket().acquire()
+        job.attempts += 1
+
+        try:
+            if isinstance(job.signed_txns, (list, tuple)):
+                tx_id = self.algod_client.send_transactions(job.signed_txns)
+            else:
+                tx_id = self.algod_client.send_transaction(job.signed_txns)
+        except Exception as e:
+            if not is_retryable(e) or job.attempts > self.max_retries:
+                job.future.set_exception(e)
+                return
+
+            delay = self.backoff_delay(job.attempts)
+            print(f"Submission failed ({e}), retrying in {delay:.2f}s")
+            with self._cond:
+                heapq.heappush(
+                    self._delayed, (self._clock() + delay, next(self._seq), job)
+                )
+            return
+
+        job.future.set_result(tx_id)
+
+    def _bucket(self) -> TokenBucket:
+        """Get the token bucket of the node the next submission goes to."""
+        primary = getattr(self.algod_client, "primary", None)
+        name = getattr(primary, "name", None)
+        if name is None:
+            return self.bucket
+        if self._bucket_node is None:
+            # The first node seen uses the original bucket
+            self._bucket_node = name
+        if name == self._bucket_node:
+            return self.bucket
+        bucket = self._node_buckets.get(name)
+        if bucket is None:
+            bucket = self._node_buckets[name] = TokenBucket(self.rate, self.burst, self._clock)
+        return bucket
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Get the jittered backoff delay before a retry.
+
+        Args:
+            attempt: Number of attempts made so far (1 for the first retry)
+
+        Returns:
+            float: Delay in seconds, uniformly drawn up to the capped exponential
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self._rng.uniform(0, ceiling)
+
+    def _is_expired(self, job: _Job) -> bool:
+        if job.last_valid is None:
+            return False
+        try:
+            last_round = self.algod_client.status()["last-round"]
+        except Exception as e:
+            print(f"Failed to get node status: {e}")
+            return False
+        return last_round > job.last_valid
+
@@ -0,0 +1,340 @@
+"""
+Read-only HTTP/JSON service over a DigitalMarketplace.
+
+Serves the balances, pending rewards, token info and quotes the dashboard
+needs from a single asyncio event loop, with no web framework:
+
+- ``GET /health``
+- ``GET /balances/<address>``
+- ``GET /balances?addresses=A,B,C`` or ``POST /balances`` with
+  ``{"addresses": [...]}`` for many addresses in one request
+- ``GET /token``
+- ``GET /quote/deposit?amount=<microALGO>``
+- ``GET /quote/withdrawal?amount=<tokens>``
+
+Ledger responses carry an ETag of the contract's ledger version and the
+request's cache key, so different resources at one URL (e.g. POST /balances
+with different bodies) never share one, and are cached until the version
+changes, so repeated reads are served from
+pre-encoded bytes and conditional requests get ``304 Not Modified``.
+Token info and quotes need the node or the price feed; they run in a
+thread pool, are cached for ``cache_ttl`` seconds, and concurrent
+identical requests share a single upstream call.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .utils import quote_deposit, quote_withdrawal
+
+# Largest request head and body accepted, in bytes
+MAX_HEAD_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+# Responses kept per cache before it is emptied
+MAX_CACHED_RESPONSES = 10_000
+
+_REASONS = {
+    200: "OK",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    502: "Bad Gateway",
+}
+
+_CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match",
+    "Access-Control-Expose-Headers": "ETag",
+}
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_response(payload, etag: str) -> Tuple[str, bytes]:
+    return etag, json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+
+
+class ReadService:
+    def __init__(self, contract, cache_ttl: float = 1.0, max_batch: int = 1000,
+                 executor: Optional[Executor] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the service.
+
+        Args:
+            contract: The DigitalMarketplace to read from
+            cache_ttl: Seconds token info and quotes are cached
+            max_batch: Most addresses accepted by a batch request
+            executor: Thread pool for node and price lookups; the event
+                loop's default executor when omitted
+            clock: Monotonic clock returning seconds
+        """
+        self.contract = contract
+        self.cache_ttl = cache_ttl
+        self.max_batch = max_batch
+        self.executor = executor
+        self._clock = clock
+        # Ledger responses: key -> (ledger version, etag, body)
+        self._ledger_cache: Dict[str, Tuple[int, str, bytes]] = {}
+        # Upstream responses: key -> (expires at, etag, body)
+        self._upstream_cache: Dict[str, Tuple[float, str, bytes]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+        self.cache_hits = 0
+        self.upstream_calls = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def ledger_version(self) -> int:
+        """The contract's ledger version."""
+        return getattr(self.contract, "ledger_version", 0)
+
+    def _holder(self, address: str) -> dict:
+        return {
+            "balance": self.contract.token_holders.get(address, 0),
+            "pending_rewards": self.contract.staking_rewards.get(address, 0),
+        }
+
+    def _ledger(self, key: str, build: Callable[[], dict]) -> Tuple[str, bytes]:
+        """Get a ledger response, cached until the ledger version changes."""
+        version = self.ledger_version
+        cached = self._ledger_cache.get(key)
+        if cached is not None and cached[0] == version:
+            self.cache_hits += 1
+            return cached[1], cached[2]
+
+        payload = build()
+        payload["version"] = version
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        etag, body = _json_response(payload, f'W/"{version}-{digest}"')
+        if len(self._ledger_cache) >= MAX_CACHED_RESPONSES:
+            self._ledger_cache.clear()
+        self._ledger_cache[key] = (version, etag, body)
+        return etag, body
+
+    async def _upstream(self, key: str, func: Callable[[], dict]) -> Tuple[str, bytes]:
+        """Get a node or price backed response, cached and coalesced."""
+        cached = self._upstream_cache.get(key)
+        if cached is not None and cached[0] > self._clock():
+            self.cache_hits += 1
+            return cached[1], cached[2]
+
+        # Join an identical request already waiting on the upstream
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            self.upstream_calls += 1
+            payload = await loop.run_in_executor(self.executor, func)
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            result = (_body_etag(body), body)
+            if len(self._upstream_cache) >= MAX_CACHED_RESPONSES:
+                self._upstream_cache.clear()
+            self._upstream_cache[key] = (self._clock() + self.cache_ttl,) + result
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody joined
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _addresses(self, values: List[str]) -> List[str]:
+        addresses = [a for value in values for a in value.split(",") if a]
+        if not addresses:
+            raise HTTPError(400, "No addresses given")
+        if len(addresses) > self.max_batch:
+            raise HTTPError(413, f"At most {self.max_batch} addresses per request")
+        return addresses
+
+    @staticmethod
+    def _amount(query: Dict[str, List[str]]) -> int:
+        try:
+            amount = int(query["amount"][0])
+        except (KeyError, ValueError):
+            raise HTTPError(400, "amount must be an integer")
+        if amount < 0:
+            raise HTTPError(400, "amount must not be negative")
+        return amount
+
+    def _token_info(self) -> dict:
+        if self.contract.asset_id is None:
+            return {"asset_id": None}
+        return {"asset_id": self.contract.asset_id, "info": self.contract.get_token_info()}
+
+    async def _route(self, method: str, path: str, query: Dict[str, List[str]],
+                     body: bytes) -> Tuple[str, bytes]:
+        if path == "/balances" and method == "POST":
+            try:
+                addresses = self._addresses(json.loads(body or b"{}").get("addresses", []))
+            except (ValueError, AttributeError, TypeError):
+                raise HTTPError(400, "Body must be JSON with an addresses list")
+            key = "batch:" + ",".join(addresses)
+            return self._ledger(key, lambda: {"balances": {a: self._holder(a) for a in addresses}})
+
+        if method != "GET":
+            raise HTTPError(405, f"{method} is not allowed")
+
+        if path == "/health":
+            return _json_response({"status": "ok", "version": self.ledger_version}, "")
+        if path == "/balances":
+            addresses = self._addresses(query.get("addresses", []) + query.get("address", []))
+            key = "batch:" + ",".join(addresses)
+            return self._ledger(key, lambda: {"balances": {a: self._holder(a) for a in addresses}})
+        if path.startswith("/balances/"):
+            address = unquote(path[len("/balances/"):])
+            return self._ledger(address, lambda: dict(address=address, **self._holder(address)))
+        if path == "/token":
+            return await self._upstream("token", self._token_info)
+        if path == "/quote/deposit":
+            amount = self._amount(query)
+            return await self._upstream(
+                f"deposit:{amount}", lambda: {"amount": amount, "tokens": quote_deposit(
+                    amount, self.contract.config, self.contract._algo_price())}
+            )
+        if path == "/quote/withdrawal":
+            amount = self._amount(query)
+            return await self._upstream(
+                f"withdrawal:{amount}", lambda: {"amount": amount, "algo": quote_withdrawal(
+                    amount, self.contract.config, self.contract._algo_price())}
+            )
+        raise HTTPError(404, f"No route for {path}")
+
+    async def handle(self, method: str, target: str, headers: Dict[str, str],
+                     body: bytes = b"") -> Response:
+        """
+        Handle one request.
+
+        Args:
+            method: HTTP method
+            target: Request target (path and query string)
+            headers: Request headers with lower-case names
+            body: Request body
+
+        Returns:
+            Response: Status, response headers and body
+        """
+        self.requests += 1
+        if method == "OPTIONS":
+            return 204, dict(_CORS_HEADERS), b""
+
+        url = urlsplit(target)
+        try:
+            etag, payload = await self._route(method, url.path, parse_qs(url.query), body)
+        except HTTPError as e:
+            error = json.dumps({"error": str(e)}).encode()
+            return e.status, {"Content-Type": "application/json", **_CORS_HEADERS}, error
+        except Exception as e:
+            print(f"Upstream request failed: {e}")
+            error = json.dumps({"error": "Upstream request failed"}).encode()
+            return 502, {"Content-Type": "application/json", **_CORS_HEADERS}, error
+
+        response_headers = {"Content-Type": "application/json", **_CORS_HEADERS}
+        if etag:
+            response_headers["ETag"] = etag
+            if headers.get("if-none-match") == etag:
+                return 304, response_headers, b""
+        return 200, response_headers, payload
+
+    async def _serve_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                raw_length = headers.get("content-length", "0") or "0"
+                length = int(raw_length) if raw_length.isascii() and raw_length.isdigit() else -1
+                if length < 0:
+                    # The body cannot be framed, so the connection is closed
+                    error = json.dumps({"error": "Invalid Content-Length"}).encode()
+                    status, response_headers, payload = 400, {
+                        "Content-Type": "application/json", **_CORS_HEADERS
+                    }, error
+                    keep_alive = False
+                elif length > MAX_BODY_SIZE:
+                    status, response_headers, payload = 413, {}, b""
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, response_headers, payload = await self.handle(
+                        method, target, headers, body
+                    )
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" and (
+                        version == "HTTP/1.1" or connection == "keep-alive"
+                    )
+
+                out = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+                out.extend(f"{name}: {value}" for name, value in response_headers.items())
+                out.append(f"Content-Length: {len(payload)}")
+                if not keep_alive:
+                    out.append("Connection: close")
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        """
+        Start listening.
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+
+        Returns:
+            asyncio.AbstractServer: The listening server
+        """
+        self._server = await asyncio.start_server(
+            self._serve_connection, host, port, limit=MAX_HEAD_SIZE
+        )
+        return self._server
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        """Start listening and serve until cancelled."""
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,231 @@
+"""
+Sharded staking reward computation for the Digital Marketplace.
+
+Balances are laid out in one shared-memory array, and a process pool
+computes each shard's rewards in place over its slice without copying.
+Rewards depend only on each holder's own balance, so staking shards are
+plain contiguous slices in ledger order. shard_of gives callers that need
+the same holder in the same bucket every time (see reconcile.py) a stable
+hash of the address.
+
+Workers are started with forkserver (spawn where it is unavailable), never
+fork, since forking a host process with other threads running (e.g. a
+scheduler or pool health checker) can deadlock the child. Workers
+re-import the main module, so scripts that compute rewards with more
+than one worker must guard their entry point with
+``if __name__ == "__main__"``.
+
+Requires numpy (install the ``fast`` extra).
+"""
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+from .config import DECIMALS, STAKING_THRESHOLD_USDT, STAKING_REWARD_PERCENTAGE
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+# Fallback ALGO price, matching usdt_to_algo
+_DEFAULT_ALGO_PRICE = 0.1945
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Sharded staking requires numpy: pip install digital_marketplace[fast]")
+
+
+def shard_of(address: str, shards: int) -> int:
+    """
+    Get the shard an address belongs to.
+
+    Uses CRC32 rather than hash() so the partition is stable across processes.
+
+    Args:
+        address: The Algorand address
+        shards: Number of shards
+
+    Returns:
+        int: Shard index in [0, shards)
+    """
+    return zlib.crc32(address.encode()) % shards
+
+
+def compute_rewards(balances, algo_price: float,
+                    threshold_usdt: float = STAKING_THRESHOLD_USDT,
+                    reward_percentage: float = STAKING_REWARD_PERCENTAGE):
+    """
+    Compute one day of staking rewards for an array of token balances.
+
+    Performs the same float operations, in the same order, as
+    DigitalMarketplace.calculate_staking_rewards.
+
+    Args:
+        balances: int64 array of token balances (with decimals)
+        algo_price: ALGO price in USDT
+        threshold_usdt: Minimum USDT value for staking rewards
+        reward_percentage: Annual reward percentage
+
+    Returns:
+        numpy.ndarray: int64 array of rewards in microALGO (0 when ineligible)
+    """
+    _require_numpy()
+    if algo_price <= 0:
+        algo_price = _DEFAULT_ALGO_PRICE
+
+    usdt_value = balances / (10 ** DECIMALS)
+    daily_reward_usdt = usdt_value * (reward_percentage / 100) / 365
+    rewards = (daily_reward_usdt / algo_price * 1_000_000).astype(np.int64)
+    rewards[usdt_value < threshold_usdt] = 0
+    return rewards
+
+
+def layout_holders(token_holders: Dict[str, int],
+                   shards: int) -> Tuple[List[str], "np.ndarray", List[Tuple[int, int]]]:
+    """
+    Lay out holders in ledger order and split them into even shards.
+
+    No address is hashed, so the layout costs one pass over the ledger.
+
+    Args:
+        token_holders: Address to token balance
+        shards: Number of shards
+
+    Returns:
+        Tuple of the addresses, their balances as an int64 array, and the
+        (start, end) slice of each shard
+    """
+    _require_numpy()
+    if isinstance(token_holders, dict):
+        addresses = list(token_holders)
+        balances = np.fromiter(token_holders.values(), dtype=np.int64, count=len(addresses))
+    else:
+        # One pass over items(), so tiered stores are scanned rather than paged in
+        addresses = []
+
+        def scan():
+            for address, balance in token_holders.items():
+                addresses.append(address)
+                yield balance
+
+        balances = np.fromiter(scan(), dtype=np.int64)
+
+    length = len(addresses)
+    step = max(1, -(-length // max(shards, 1)))
+    bounds = [(start, min(start + step, length)) for start in range(0, length, step)]
+    return addresses, balances, bounds
+
+
+def _reward_shard(balances_name: str, rewards_name: str, length: int,
+                  start: int, end: int, algo_price: float,
+                  threshold_usdt: float, reward_percentage: float) -> int:
+    """Worker: compute rewards for one shard directly in shared memory."""
+    balances_shm = shared_memory.SharedMemory(name=balances_name)
+    rewards_shm = shared_memory.SharedMemory(name=rewards_name)
+    try:
+        balances = np.ndarray((length,), dtype=np.int64, buffer=balances_shm.buf)
+        rewards = np.ndarray((length,), dtype=np.int64, buffer=rewards_shm.buf)
+        rewards[start:end] = compute_rewards(balances[start:end], algo_price,
+                                             threshold_usdt, reward_percentage)
+        eligible = int(np.count_nonzero(rewards[start:end]))
+        del balances, rewards
+        return eligible
+    finally:
+        balances_shm.close()
+        rewards_shm.close()
+
+
+def _pool_context():
+    # Never fork: a forked child of a threaded host can inherit held locks.
+    # Starting the resource tracker first makes workers share it instead of
+    # each cleaning up segments they only attached to
+    resource_tracker.ensure_running()
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def compute_rewards_sharded(balances, bounds: List[Tuple[int, int]],
+                            algo_price: float, workers: int,
+                            executor: Optional[ProcessPoolExecutor] = None,
+                            threshold_usdt: float = STAKING_THRESHOLD_USDT,
+                            reward_percentage: float = STAKING_REWARD_PERCENTAGE):
+    """
+    Compute rewards for shard-ordered balances across a process pool.
+
+    Args:
+        balances: int64 array of balances laid out by shard
+        bounds: (start, end) slice of each shard
+        algo_price: ALGO price in USDT
+        workers: Number of worker processes (1 computes inline)
+        executor: Optional existing process pool to reuse
+        threshold_usdt: Minimum USDT value for staking rewards
+        reward_percentage: Annual reward percentage
+
+    Returns:
+        numpy.ndarray: int64 array of rewards aligned with ``balances``
+    """
+    _require_numpy()
+    length = len(balances)
+    if workers <= 1 or length == 0:
+        return compute_rewards(balances, algo_price, threshold_usdt, reward_percentage)
+
+    nbytes = max(length * 8, 1)
+    balances_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    rewards_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    own_executor = executor is None
+    try:
+        shared = np.ndarray((length,), dtype=np.int64, buffer=balances_shm.buf)
+        shared[:] = balances
+        del shared
+
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+        futures = [
+            executor.submit(_reward_shard, balances_shm.name, rewards_shm.name,
+                            length, start, end, algo_price, threshold_usdt, reward_percentage)
+            for start, end in bounds if end > start
+        ]
+        for future in futures:
+            future.result()
+
+        return np.ndarray((length,), dtype=np.int64, buffer=rewards_shm.buf).copy()
+    finally:
+        if own_executor and executor is not None:
+            executor.shutdown()
+        balances_shm.close()
+        balances_shm.unlink()
+        rewards_shm.close()
+        rewards_shm.unlink()
+
+
+def sharded_staking_rewards(token_holders: Dict[str, int], algo_price: float,
+                            workers: int, shards: Optional[int] = None,
+                            threshold_usdt: float = STAKING_THRESHOLD_USDT,
+                            reward_percentage: float = STAKING_REWARD_PERCENTAGE) -> Dict[str, int]:
+    """
+    Compute one day of staking rewards for all holders using a process pool.
+
+    Args:
+        token_holders: Address to token balance
+        algo_price: ALGO price in USDT
+        workers: Number of worker processes
+        shards: Number of shards (defaults to 4 per worker)
+        threshold_usdt: Minimum USDT value for staking rewards
+        reward_percentage: Annual reward percentage
+
+    Returns:
+        Dict[str, int]: Address to reward in microALGO, eligible holders only
+    """
+    shards = shards or max(1, workers * 4)
+    addresses, balances, bounds = layout_holders(token_holders, shards)
+    rewards = compute_rewards_sharded(balances, bounds, algo_price, workers,
+                                      threshold_usdt=threshold_usdt,
+                                      reward_percentage=reward_percentage)
+
+    eligible = np.flatnonzero(rewards)
+    return dict(zip([addresses[i] for i in eligible.tolist()], rewards[eligible].tolist()))
@@ -0,0 +1,131 @@
+"""
+Local stand-in for an algod node.
+
+LocalAlgodClient implements the AlgodClient methods the Digital Marketplace
+uses, without a network. Every submission is accepted and confirmed, rounds
+advance on a configurable round time, and optional per-call latency and
+transient errors mimic a real node. It is meant for replays, load tests
+and examples, not for validating transactions.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from algosdk.error import AlgodHTTPError
+from algosdk.future import transaction
+
+# Genesis values of the Algorand testnet
+TESTNET_GENESIS_HASH = "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI="
+TESTNET_GENESIS_ID = "testnet-v1.0"
+
+
+class LocalAlgodClient:
+    def __init__(self, round_time: float = 0.0, latency: float = 0.0,
+                 error_rate: float = 0.0, first_round: int = 1000,
+                 rng: Optional[random.Random] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the stand-in node.
+
+        Args:
+            round_time: Seconds per round; 0 confirms transactions immediately
+            latency: Seconds each call takes
+            error_rate: Fraction of submissions failing with a transient 503
+            first_round: Round the node starts at
+            rng: Random generator used for error injection
+            clock: Monotonic clock returning seconds
+            sleep: Function used to wait
+        """
+        self.round_time = round_time
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = rng or random.Random()
+        self._clock = clock
+        self._sleep = sleep
+        self._start = clock()
+        self._first_round = first_round
+        self._instant_round = first_round
+        self._next_asset_id = 1
+        self._lock = threading.Lock()
+        self.pending: Dict[str, dict] = {}
+        self.submitted = 0
+
+    def _call(self) -> None:
+        if self.latency > 0:
+            self._sleep(self.latency)
+
+    def _current_round(self) -> int:
+        if self.round_time <= 0:
+            return self._instant_round
+        return self._first_round + int((self._clock() - self._start) / self.round_time)
+
+    def status(self, **kwargs) -> dict:
+        self._call()
+        return {"last-round": self._current_round(), "time-since-last-round": 0}
+
+    def status_after_block(self, block_num: Optional[int] = None,
+                           round_num: Optional[int] = None, **kwargs) -> dict:
+        self._call()
+        target = block_num if block_num is not None else round_num
+        if self.round_time <= 0:
+            with self._lock:
+                self._instant_round = max(self._instant_round, target + 1)
+        else:
+            wait = self._start + (target + 1 - self._first_round) * self.round_time - self._clock()
+            if wait > 0:
+                self._sleep(wait)
+        return self.status()
+
+    def suggested_params(self, **kwargs) -> transaction.SuggestedParams:
+        self._call()
+        first = self._current_round()
+        return transaction.SuggestedParams(
+            fee=1000, first=first, last=first + 1000, gh=TESTNET_GENESIS_HASH,
+            gen=TESTNET_GENESIS_ID, flat_fee=True, min_fee=1000
+        )
+
+    def send_transaction(self, txn, **kwargs) -> str:
+        return self.send_transactions([txn])
+
+    def send_transactions(self, txns: List, **kwargs) -> str:
+        self._call()
+        if self.error_rate > 0 and self._rng.random() < self.error_rate:
+            raise AlgodHTTPError("Service unavailable", 503)
+
+        with self._lock:
+            submit_round = self._current_round()
+            confirmed_round = submit_round if self.round_time <= 0 else submit_round + 1
+            info = {"confirmed-round": confirmed_round, "pool-error": ""}
+            for stxn in txns:
+                txn = getattr(stxn, "transaction", stxn)
+                if getattr(txn, "type", None) == "acfg" and not getattr(txn, "index", 0):
+                    info["asset-index"] = self._next_asset_id
+                    self._next_asset_id += 1
+
+            # Only the first transaction's ID is returned, so only it is tracked
+            tx_id = getattr(txns[0], "transaction", txns[0]).get_txid()
+            self.pending[tx_id] = info
+            self.submitted += 1
+        return tx_id
+
+    def pending_transaction_info(self, transaction_id: str, **kwargs) -> dict:
+        self._call()
+        with self._lock:
+            info = self.pending.get(transaction_id)
+            if info is None:
+                raise AlgodHTTPError("Transaction not found", 404)
+            if info["confirmed-round"] > self._current_round():
+                return {"confirmed-round": 0, "pool-error": ""}
+            # Confirmed transactions are only looked up once
+            del self.pending[transaction_id]
+        return info
+
+    def asset_info(self, asset_id: int, **kwargs) -> dict:
+        self._call()
+        return {"index": asset_id, "params": {}}
+
+    def account_info(self, address: str, **kwargs) -> dict:
+        self._call()
+        return {"address": address, "amount": 0, "assets": []}
@@ -0,0 +1,292 @@
+"""
+Incremental, resumable staking sweep for the Digital Marketplace.
+
+DigitalMarketplace.calculate_staking_rewards credits every holder in one
+loop. StakingSweep does the same work in ticks: each call to step()
+credits holders a chunk at a time until its time budget is spent, so a
+server can interleave the sweep with requests.
+
+The sweep's position lives in ``contract.staking_sweep``, a plain dict
+saved with the rest of the ledger state (see cli.save_state):
+
+- ``epoch``: timestamp the daily run started at, which identifies it
+- ``price``: ALGO price pinned for the whole run
+- ``holders``: addresses holding tokens when the run started, copied once
+  without sorting; holders who arrive later wait for the next run
+- ``position``: index in ``holders`` of the next address to credit, and
+  ``cursor``, the last address credited
+- ``processed``, ``total`` and ``credited`` for progress and the reward
+  history
+
+Rewards and the position change together in memory between ticks, so any
+saved state has credited exactly the holders before the position. After a
+crash, the sweep resumes from the saved position with the same epoch,
+price and holders, and no holder is credited twice.
+``last_staking_calculation`` only advances when the sweep completes.
+
+Saving the whole ledger after every tick would make each tick O(holders).
+SweepJournal instead appends only the rewards a tick changed, and replays
+them over the state saved before the sweep began.
+"""
+import json
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from .metrics import LatencyRecorder
+from .utils import get_algo_price_usdt
+
+SECONDS_PER_DAY = 86400
+
+
+class StakingSweep:
+    def __init__(self, contract, chunk_size: int = 1000,
+                 timer: Callable[[], float] = time.perf_counter):
+        """
+        Initialize a sweep over a contract's holders.
+
+        Args:
+            contract: The DigitalMarketplace to credit
+            chunk_size: Holders credited between checks of the time budget
+            timer: Monotonic clock returning seconds
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+
+        self.contract = contract
+        self.chunk_size = chunk_size
+        self._timer = timer
+        self.latency = LatencyRecorder()
+        self.ticks = 0
+        # Rewards credited by the latest tick, for SweepJournal
+        self.last_tick: Dict[str, int] = {}
+        self._completed: Optional[Dict[str, float]] = None
+
+    @property
+    def active(self) -> bool:
+        """Whether a sweep is in progress."""
+        return self.contract.staking_sweep is not None
+
+    def progress(self) -> Dict[str, float]:
+        """
+        Get progress of the sweep in progress, or of the last one completed.
+
+        Returns:
+            Dict[str, float]: Epoch, holders processed, total holders,
+            holders credited, fraction done, and ticks run by this instance
+        """
+        state = self.contract.staking_sweep
+        if state is None:
+            if self._completed is not None:
+                return dict(self._completed, ticks=self.ticks)
+            return {"epoch": 0, "processed": 0, "total": 0, "credited": 0,
+                    "fraction": 1.0, "ticks": self.ticks}
+        total = state["total"]
+        return {
+            "epoch": state["epoch"],
+            "processed": state["processed"],
+            "total": total,
+            "credited": len(state["credited"]),
+            "fraction": min(state["processed"] / total, 1.0) if total else 1.0,
+            "ticks": self.ticks,
+        }
+
+    def begin(self) -> bool:
+        """
+        Start a new sweep if a day has passed.
+
+        Copies the current holders' addresses, so a caller can start the
+        sweep outside its ticks; step() starts one when needed.
+
+        Returns:
+            bool: Whether a sweep started
+        """
+        contract = self.contract
+        now = contract._now()
+        if now - contract.last_staking_calculation < SECONDS_PER_DAY:
+            return False
+
+        algo_price = contract._algo_price()
+        # A plain copy of the keys (a non-promoting scan of a TieredStore),
+        # deduplicated in order in case the ledger changes tiers mid-scan
+        holders = list(dict.fromkeys(contract.token_holders))
+        contract.staking_sweep = {
+            "epoch": now,
+            "price": get_algo_price_usdt() if algo_price is None else algo_price,
+            "holders": holders,
+            "position": 0,
+            "cursor": None,
+            "processed": 0,
+            "total": len(holders),
+            "credited": {},
+        }
+        return True
+
+    def step(self, budget: float = 0.05) -> bool:
+        """
+        Run one tick of the sweep, starting one if a day has passed.
+
+        Args:
+            budget: Seconds the tick may spend crediting; at least one
+                chunk is credited per tick
+
+        Returns:
+            bool: True when no sweep is left in progress
+        """
+        contract = self.contract
+        start = self._timer()
+        deadline = start + budget
+        if contract.staking_sweep is None and not self.begin():
+            return True
+
+        state = contract.staking_sweep
+        order = state["holders"]
+        position = state["position"]
+        credited = state["credited"]
+        algo_price = state["price"]
+        # Read balances without promoting cold TieredStore entries
+        holders = contract.token_holders
+        balance_of = getattr(holders, "peek", holders.get)
+        self.last_tick = {}
+
+        while position < len(order):
+            chunk = order[position:position + self.chunk_size]
+            for address in chunk:
+                daily_reward_algo = contract._daily_reward(balance_of(address, 0), algo_price)
+                if daily_reward_algo is not None:
+                    current_rewards = contract.staking_rewards.get(address, 0)
+                    contract._set_reward("stake", address, current_rewards + daily_reward_algo)
+                    credited[address] = daily_reward_algo
+                    self.last_tick[address] = daily_reward_algo
+            position += len(chunk)
+            state["position"] = position
+            state["cursor"] = chunk[-1]
+            state["processed"] += len(chunk)
+            if self._timer() >= deadline:
+                break
+
+        self.ticks += 1
+        self.latency.record("tick", self._timer() - start)
+        if position < len(order):
+            return False
+
+        # Complete: only now is the day's run recorded as done
+        contract.last_staking_calculation = state["epoch"]
+        contract._record_history(state["epoch"], credited)
+        self._completed = self.progress()
+        self._completed["fraction"] = 1.0
+        contract.staking_sweep = None
+        return True
+
+    def run(self, budget: Optional[float] = None, pause: float = 0.0,
+            on_tick: Optional[Callable[["StakingSweep"], None]] = None,
+            sleep: Callable[[float], None] = time.sleep) -> Dict[str, float]:
+        """
+        Run ticks until the sweep completes.
+
+        Args:
+            budget: Seconds per tick; the whole sweep in one tick when omitted
+            pause: Seconds slept between ticks
+            on_tick: Called after every tick, e.g. to save the ledger state
+            sleep: Function used to pause
+
+        Returns:
+            Dict[str, float]: Progress of the completed sweep
+        """
+        while True:
+            done = self.step(float("inf") if budget is None else budget)
+            if on_tick is not None:
+                on_tick(self)
+            if done:
+                return self.progress()
+            if pause > 0:
+                sleep(pause)
+
+
+class SweepJournal:
+    def __init__(self, path: str):
+        """
+        Initialize an append-only journal of a sweep's ticks.
+
+        start() writes the sweep's state once; every tick then appends the
+        rewards it changed and its new position. A tick torn by a crash is
+        ignored on replay, and its rewards are lost together with its
+        position, so no holder is credited twice.
+
+        Args:
+            path: Path of the journal file
+        """
+        self.path = path
+
+    def replay(self, contract) -> bool:
+        """
+        Restore a sweep in progress over the state saved before the journal started.
+
+        Journals of sweeps the contract has already completed are ignored.
+
+        Args:
+            contract: The DigitalMarketplace, loaded from its state file
+
+        Returns:
+            bool: Whether a sweep was restored
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if "holders" in record:
+                    if record["epoch"] <= contract.last_staking_calculation:
+                        return False
+                    contract.staking_sweep = record
+                    continue
+                state = contract.staking_sweep
+                for address, (total, daily) in record.pop("rewards").items():
+                    contract.staking_rewards[address] = total
+                    state["credited"][address] = daily
+                state.update(record)
+        return contract.staking_sweep is not None
+
+    def start(self, state: Dict) -> None:
+        """
+        Begin the journal of a sweep with its current state.
+
+        Args:
+            state: The contract's ``staking_sweep``
+        """
+        with open(self.path, "w") as f:
+            f.write(json.dumps(state) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, sweep: StakingSweep) -> None:
+        """
+        Append the latest tick of a sweep; usable as its on_tick callback.
+
+        The tick that completes a sweep is not recorded: the caller saves
+        the full state then, and clear() discards the journal.
+
+        Args:
+            sweep: The StakingSweep that just ran a tick
+        """
+        state = sweep.contract.staking_sweep
+        if state is None:
+            return
+        rewards = {
+            address: [sweep.contract.staking_rewards.get(address, 0), daily]
+            for address, daily in sweep.last_tick.items()
+        }
+        record = {"position": state["position"], "cursor": state["cursor"],
+                  "processed": state["processed"], "rewards": rewards}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self) -> None:
+        """Discard the journal once the full state has been saved."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
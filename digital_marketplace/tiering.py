@@ -0,0 +1,248 @@
+"""
+Hot/cold tiered storage for Digital Marketplace holder state.
+
+TieredStore is a drop-in mapping for ``token_holders`` and
+``staking_rewards``. Every value is written through to a cold tier in
+SQLite, which holds the whole mapping; recently used addresses are also
+cached in a bounded in-memory hot tier, and the least recently used ones
+are dropped from it in batches and paged back in when they are read.
+Setting an address to zero removes it from both tiers, so dormant and
+emptied accounts stop costing memory and the resident size tracks active
+users.
+
+Because the cold tier is complete, it survives a crash without flush():
+the SQLite file runs in WAL mode with ``synchronous = NORMAL``, so every
+change is durable once the call returns unless the machine itself loses
+power, in which case the most recent changes may be lost but the file
+stays consistent.
+
+Scans (iteration, ``items()``, ``values()``) and ``peek()`` read the cold
+tier without promoting it, so a staking sweep over every holder does not
+churn the hot tier.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import ItemsView, MutableMapping, ValuesView
+from typing import Iterator, Optional, Tuple
+
+DEFAULT_MAX_HOT = 100_000
+
+
+class _ScanItems(ItemsView):
+    def __iter__(self):
+        return self._mapping._scan()
+
+
+class _ScanValues(ValuesView):
+    def __iter__(self):
+        return (value for _, value in self._mapping._scan())
+
+
+class TieredStore(MutableMapping):
+    def __init__(self, path: str, table: str = "holders", max_hot: int = DEFAULT_MAX_HOT,
+                 evict_batch: Optional[int] = None):
+        """
+        Open a tiered store, creating its cold tier if needed.
+
+        Args:
+            path: SQLite file of the cold tier (":memory:" for tests)
+            table: Table name, so several stores can share one file
+            max_hot: Addresses cached in memory
+            evict_batch: Addresses dropped from the hot tier per eviction;
+                defaults to 1% of max_hot
+        """
+        if max_hot < 1:
+            raise ValueError("max_hot must be positive")
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+
+        self.path = path
+        self.table = table
+        self.max_hot = max_hot
+        self.evict_batch = evict_batch or max(1, max_hot // 100)
+        self._hot: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.RLock()
+        # Autocommit, so stores sharing a file never hold a write lock; WAL
+        # makes each write-through commit cheap without giving up durability
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(address TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self._count = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        self.promotions = 0
+        self.evictions = 0
+
+    @property
+    def hot_size(self) -> int:
+        """Addresses resident in memory."""
+        return len(self._hot)
+
+    @property
+    def cold_size(self) -> int:
+        """Addresses only in the cold tier."""
+        return self._count - len(self._hot)
+
+    def _cold_get(self, address: str) -> Optional[int]:
+        """Read an address from the cold tier (lock must be held)."""
+        row = self._db.execute(
+            f"SELECT value FROM {self.table} WHERE address = ?", (address,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _evict(self) -> None:
+        """Drop the least recently used addresses from the hot tier (lock must be held)."""
+        if len(self._hot) <= self.max_hot:
+            return
+        count = len(self._hot) - self.max_hot + self.evict_batch - 1
+        for _ in range(min(count, len(self._hot))):
+            self._hot.popitem(last=False)
+            self.evictions += 1
+
+    def __getitem__(self, address: str) -> int:
+        with self._lock:
+            value = self._hot.get(address)
+            if value is not None:
+                self._hot.move_to_end(address)
+                return value
+
+            value = self._cold_get(address)
+            if value is None:
+                raise KeyError(address)
+            # Page the address back in as the most recently used
+            self._hot[address] = value
+            self.promotions += 1
+            self._evict()
+            return value
+
+    def peek(self, address: str, default: int = 0) -> int:
+        """
+        Read an address without promoting it or refreshing its recency.
+
+        Args:
+            address: The Algorand address
+            default: Value returned when the address is absent
+
+        Returns:
+            int: The stored value, or the default
+        """
+        with self._lock:
+            value = self._hot.get(address)
+            if value is None:
+                value = self._cold_get(address)
+            return default if value is None else value
+
+    def __setitem__(self, address: str, value: int) -> None:
+        with self._lock:
+            if not value:
+                self._discard(address)
+                return
+            # Write through before caching, so the cold tier is never behind
+            updated = self._db.execute(
+                f"UPDATE {self.table} SET value = ? WHERE address = ?", (value, address)
+            ).rowcount
+            if not updated:
+                self._db.execute(
+                    f"INSERT INTO {self.table} (address, value) VALUES (?, ?)", (address, value)
+                )
+                self._count += 1
+            elif address not in self._hot:
+                self.promotions += 1
+            self._hot[address] = value
+            self._hot.move_to_end(address)
+            self._evict()
+
+    def __delitem__(self, address: str) -> None:
+        with self._lock:
+            if not self._discard(address):
+                raise KeyError(address)
+
+    def _discard(self, address: str) -> bool:
+        self._hot.pop(address, None)
+        deleted = self._db.execute(
+            f"DELETE FROM {self.table} WHERE address = ?", (address,)
+        ).rowcount
+        self._count -= deleted
+        return bool(deleted)
+
+    def __contains__(self, address) -> bool:
+        with self._lock:
+            return address in self._hot or self._cold_get(address) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _scan(self, page_size: int = 10_000) -> Iterator[Tuple[str, int]]:
+        """
+        Yield every (address, value) in address order, without promoting.
+
+        Only the cold tier is read, since it holds every value; it is read
+        a page at a time, so a scan never holds it all in memory. Each
+        address is yielded at most once, however the hot tier changes
+        meanwhile. As with any paged read, a scan is not a snapshot when
+        the store is modified while it runs: changes to addresses already
+        passed are not seen.
+        """
+        last = ""
+        while True:
+            with self._lock:
+                page = self._db.execute(
+                    f"SELECT address, value FROM {self.table} WHERE address > ? "
+                    "ORDER BY address LIMIT ?", (last, page_size)
+                ).fetchall()
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1][0]
+
+    def __iter__(self) -> Iterator[str]:
+        return (address for address, _ in self._scan())
+
+    def items(self) -> ItemsView:
+        return _ScanItems(self)
+
+    def values(self) -> ValuesView:
+        return _ScanValues(self)
+
+    def flush(self) -> None:
+        """Release the hot tier; every value is already in the cold tier."""
+        with self._lock:
+            self._hot.clear()
+
+    def close(self) -> None:
+        """Release the hot tier and close the cold tier."""
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+
+def enable_tiering(contract, directory: str,
+                   max_hot: int = DEFAULT_MAX_HOT) -> Tuple[TieredStore, TieredStore]:
+    """
+    Move a DigitalMarketplace's holder state into tiered stores.
+
+    Existing entries are copied over (zero entries are dropped) and the
+    contract's ``token_holders`` and ``staking_rewards`` are replaced.
+
+    Args:
+        contract: The DigitalMarketplace
+        directory: Directory for the cold tier file (created if missing)
+        max_hot: Addresses kept in memory per store
+
+    Returns:
+        Tuple[TieredStore, TieredStore]: The balance and reward stores
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "holders.sqlite")
+    balances = TieredStore(path, "balances", max_hot)
+    rewards = TieredStore(path, "rewards", max_hot)
+    for store, current in ((balances, contract.token_holders), (rewards, contract.staking_rewards)):
+        for address, value in current.items():
+            store[address] = value
+    contract.token_holders = balances
+    contract.staking_rewards = rewards
+    return balances, rewards
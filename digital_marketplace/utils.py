@@ -1,15 +1,24 @@
 """
 Utility functions for the Digital Marketplace contract.
 """
+import threading
 import time
-from typing import Union, Dict
-import requests
+from typing import Callable, Optional, Union, Dict
+
+from .config import DECIMALS, MarketplaceConfig
 
 # Cache for ALGO price
 _algo_price_cache: Dict[int, float] = {}
 _algo_price_last_update = 0
 _CACHE_DURATION = 300  # 5 minutes in seconds
 
+def __getattr__(name: str):
+    # requests is imported on first use so that loading the package stays fast
+    if name == "requests":
+        import requests
+        return requests
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def get_current_timestamp() -> int:
     """
     Get the current UNIX timestamp.
@@ -35,6 +44,8 @@ def get_algo_price_usdt() -> float:
     # Check if we need to update the cache
     if current_time - _algo_price_last_update > _CACHE_DURATION:
         try:
+            import requests
+            
             # In a real implementation, you'd use a reliable price oracle or API
             # This is a simplified example using a public API
             response = requests.get(
@@ -66,31 +77,124 @@ def get_algo_price_usdt() -> float:
     
     return 0.1945  # Default ALGO price in USDT
 
-def algo_to_usdt(algo_amount: int) -> float:
+def fetch_algo_price_usdt() -> float:
+    """
+    Fetch the current price of ALGO in USDT, without caching.
+    
+    Returns:
+        float: Current ALGO price in USDT
+    """
+    import requests
+    
+    response = requests.get(
+        "https://api.coingecko.com/api/v3/simple/price",
+        params={"ids": "algorand", "vs_currencies": "usd"},
+        timeout=10
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to get ALGO price: {response.status_code}")
+    return response.json().get("algorand", {}).get("usd", 0.1945)
+
+class PriceOracle:
+    def __init__(self, cache_duration: int = _CACHE_DURATION, default_price: float = 0.1945,
+                 fetch: Callable[[], float] = fetch_algo_price_usdt,
+                 clock: Callable[[], int] = get_current_timestamp):
+        """
+        Initialize a price oracle with its own cache.
+        
+        Unlike get_algo_price_usdt, which shares one module-level cache,
+        each oracle caches independently, so the marketplaces given the same
+        oracle share a price and others are unaffected.
+        
+        Args:
+            cache_duration: Seconds a fetched price is used
+            default_price: Price used before any fetch succeeds
+            fetch: Function returning the live price
+            clock: Function returning the current UNIX timestamp
+        """
+        self.cache_duration = cache_duration
+        self._price = default_price
+        self._fetch = fetch
+        self._clock = clock
+        self._last_update: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def price(self) -> float:
+        """
+        Get the ALGO price in USDT, fetching it when the cache has expired.
+        
+        Concurrent callers wait for a single fetch. On failure the last known
+        price is used.
+        
+        Returns:
+            float: ALGO price in USDT
+        """
+        with self._lock:
+            now = self._clock()
+            if self._last_update is None or now - self._last_update > self.cache_duration:
+                try:
+                    self._price = self._fetch()
+                except Exception as e:
+                    print(f"Error getting ALGO price: {e}")
+                # Retry after a full period either way
+                self._last_update = now
+            return self._price
+    
+    def set_price(self, price: float) -> None:
+        """
+        Pin the price until the cache expires.
+        
+        Args:
+            price: ALGO price in USDT
+        """
+        with self._lock:
+            self._price = price
+            self._last_update = self._clock()
+
+def set_algo_price_usdt(price: float) -> None:
+    """
+    Pin the cached ALGO price, e.g. from a price given on the command line.
+    
+    The price is used until the cache expires.
+    
+    Args:
+        price: ALGO price in USDT
+    """
+    global _algo_price_last_update
+    
+    current_time = get_current_timestamp()
+    _algo_price_cache[current_time] = price
+    _algo_price_last_update = current_time
+
+def algo_to_usdt(algo_amount: int, algo_price: Optional[float] = None) -> float:
     """
     Convert ALGO amount (in microALGO) to USDT.
     
     Args:
         algo_amount: Amount in microALGO (1 ALGO = 1,000,000 microALGO)
+        algo_price: ALGO price in USDT; the cached price when omitted
         
     Returns:
         float: Equivalent amount in USDT
     """
-    algo_price = get_algo_price_usdt()
+    if algo_price is None:
+        algo_price = get_algo_price_usdt()
     algo_value = algo_amount / 1_000_000  # Convert microALGO to ALGO
     return algo_value * algo_price
 
-def usdt_to_algo(usdt_amount: float) -> int:
+def usdt_to_algo(usdt_amount: float, algo_price: Optional[float] = None) -> int:
     """
     Convert USDT amount to ALGO (in microALGO).
     
     Args:
         usdt_amount: Amount in USDT
+        algo_price: ALGO price in USDT; the cached price when omitted
         
     Returns:
         int: Equivalent amount in microALGO
     """
-    algo_price = get_algo_price_usdt()
+    if algo_price is None:
+        algo_price = get_algo_price_usdt()
     
     # Prevent division by zero
     if algo_price <= 0:
@@ -99,6 +203,42 @@ def usdt_to_algo(usdt_amount: float) -> int:
     algo_value = usdt_amount / algo_price
     return int(algo_value * 1_000_000)  # Convert ALGO to microALGO and return as integer
 
+def quote_deposit(algo_amount: int, config: Optional[MarketplaceConfig] = None,
+                  algo_price: Optional[float] = None) -> int:
+    """
+    Get the tokens a deposit would receive, after the fixed fee.
+    
+    Args:
+        algo_amount: Amount to deposit in microALGO
+        config: Settings of the marketplace quoted; the module defaults when omitted
+        algo_price: ALGO price in USDT; the cached price when omitted
+        
+    Returns:
+        int: Tokens to receive (with decimals); 0 or less if the fee is not covered
+    """
+    config = config or MarketplaceConfig()
+    net_usdt = algo_to_usdt(algo_amount, algo_price) - config.fixed_fee_usdt
+    return int(net_usdt * (10 ** DECIMALS))
+
+def quote_withdrawal(token_amount: int, config: Optional[MarketplaceConfig] = None,
+                     algo_price: Optional[float] = None) -> int:
+    """
+    Get the ALGO a withdrawal would receive, after the fixed fee.
+    
+    Args:
+        token_amount: Tokens to withdraw (with decimals)
+        config: Settings of the marketplace quoted; the module defaults when omitted
+        algo_price: ALGO price in USDT; the cached price when omitted
+        
+    Returns:
+        int: ALGO to receive in microALGO; 0 if the fee is not covered
+    """
+    config = config or MarketplaceConfig()
+    net_usdt = token_amount / (10 ** DECIMALS) - config.fixed_fee_usdt
+    if net_usdt <= 0:
+        return 0
+    return usdt_to_algo(net_usdt, algo_price)
+
 def format_amount(amount: Union[int, float], decimals: int = 8) -> str:
     """
     Format an amount with the specified number of decimals.
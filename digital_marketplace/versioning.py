@@ -0,0 +1,236 @@
+"""
+Multiversion token ledger for the Digital Marketplace.
+
+VersionedLedger keeps every balance change of every address with the round
+it was confirmed in, so audits and reward disputes can ask what an address
+held at any past round or time rather than only what it holds now.
+
+Each address has two parallel, compact arrays: the rounds it changed in
+and its balance after each change, both in ascending round order. A
+point-in-time query is a binary search over the rounds, and a snapshot of
+all holders is one search per address. Several changes in one round keep
+only the last balance.
+
+Versions older than a retention horizon can be pruned. For each address
+the newest version at or before the horizon is kept as its base, so
+queries at or after the horizon stay exact and only older rounds are
+rejected.
+"""
+import bisect
+import threading
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+
+class PrunedRoundError(ValueError):
+    """Raised when a query is older than the retention horizon."""
+
+
+class VersionedLedger:
+    def __init__(self, retention_rounds: Optional[int] = None):
+        """
+        Initialize an empty versioned ledger.
+
+        Args:
+            retention_rounds: Rounds of history kept; older versions are
+                pruned automatically as new rounds are recorded. Everything
+                is kept when omitted.
+        """
+        if retention_rounds is not None and retention_rounds < 1:
+            raise ValueError("retention_rounds must be positive")
+
+        self.retention_rounds = retention_rounds
+        self._rounds: Dict[str, array] = {}
+        self._balances: Dict[str, array] = {}
+        # Rounds and the timestamps they were first seen at, for time queries
+        self._clock_rounds = array("q")
+        self._clock_times = array("q")
+        self.horizon = 0
+        self.latest_round = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of stored versions across all addresses."""
+        with self._lock:
+            return sum(len(rounds) for rounds in self._rounds.values())
+
+    def addresses(self) -> Iterator[str]:
+        """Addresses with stored versions."""
+        with self._lock:
+            return iter(list(self._rounds))
+
+    def record(self, address: str, balance: int, confirmed_round: Optional[int] = None,
+               timestamp: Optional[int] = None) -> int:
+        """
+        Record an address's balance after a change.
+
+        Changes without a confirmed round (e.g. seeded balances) and changes
+        confirmed out of order are recorded at the latest round seen, so
+        each address's versions stay in round order.
+
+        Args:
+            address: The Algorand address
+            balance: Balance after the change
+            confirmed_round: Round the change was confirmed in
+            timestamp: UNIX timestamp of the change, for time queries
+
+        Returns:
+            int: Round the version was recorded at
+        """
+        with self._lock:
+            round_num = max(confirmed_round or 0, self.latest_round)
+            if round_num > self.latest_round or not self._clock_rounds:
+                self.latest_round = round_num
+                if timestamp is not None:
+                    self._clock_rounds.append(round_num)
+                    self._clock_times.append(int(timestamp))
+
+            rounds = self._rounds.get(address)
+            if rounds is None:
+                rounds = self._rounds[address] = array("q")
+                self._balances[address] = array("q")
+            balances = self._balances[address]
+
+            if rounds and rounds[-1] >= round_num:
+                balances[-1] = balance
+            else:
+                rounds.append(round_num)
+                balances.append(balance)
+
+            if (self.retention_rounds is not None
+                    and round_num - self.horizon >= 2 * self.retention_rounds):
+                # Pruning in steps of the retention keeps its cost amortized
+                self._prune(round_num - self.retention_rounds)
+            return round_num
+
+    def _check_round(self, round_num: int) -> None:
+        if round_num < self.horizon:
+            raise PrunedRoundError(
+                f"Round {round_num} is before the retention horizon {self.horizon}"
+            )
+
+    def _balance_at(self, address: str, round_num: int) -> int:
+        """Balance of an address as of a round (lock must be held)."""
+        rounds = self._rounds.get(address)
+        if not rounds:
+            return 0
+        index = bisect.bisect_right(rounds, round_num) - 1
+        return self._balances[address][index] if index >= 0 else 0
+
+    def balance_as_of(self, address: str, round_num: int) -> int:
+        """
+        Get an address's balance as of the end of a round.
+
+        Args:
+            address: The Algorand address
+            round_num: The round
+
+        Returns:
+            int: Balance (with decimals); 0 before the address's first change
+        """
+        with self._lock:
+            self._check_round(round_num)
+            return self._balance_at(address, round_num)
+
+    def snapshot(self, round_num: int) -> Dict[str, int]:
+        """
+        Get every non-zero balance as of the end of a round.
+
+        Args:
+            round_num: The round
+
+        Returns:
+            Dict[str, int]: Address to balance
+        """
+        with self._lock:
+            self._check_round(round_num)
+            balances = {}
+            for address in self._rounds:
+                balance = self._balance_at(address, round_num)
+                if balance:
+                    balances[address] = balance
+            return balances
+
+    def history(self, address: str) -> Iterator[Tuple[int, int]]:
+        """Stored (round, balance) versions of an address, oldest first."""
+        with self._lock:
+            rounds = self._rounds.get(address, ())
+            return iter(list(zip(rounds, self._balances.get(address, ()))))
+
+    def round_at(self, timestamp: int) -> int:
+        """
+        Get the latest round recorded at or before a timestamp.
+
+        Args:
+            timestamp: UNIX timestamp in seconds
+
+        Returns:
+            int: The round
+        """
+        with self._lock:
+            index = bisect.bisect_right(self._clock_times, int(timestamp)) - 1
+            if index < 0:
+                if self.horizon > 0:
+                    raise PrunedRoundError(f"No rounds retained at or before {timestamp}")
+                return 0
+            return self._clock_rounds[index]
+
+    def balance_at_time(self, address: str, timestamp: int) -> int:
+        """
+        Get an address's balance as of a timestamp.
+
+        Args:
+            address: The Algorand address
+            timestamp: UNIX timestamp in seconds
+
+        Returns:
+            int: Balance (with decimals)
+        """
+        return self.balance_as_of(address, self.round_at(timestamp))
+
+    def prune(self, horizon: Optional[int] = None) -> int:
+        """
+        Drop versions that are not needed for queries at or after a round.
+
+        Args:
+            horizon: Oldest round kept queryable; the latest round minus the
+                retention when omitted
+
+        Returns:
+            int: Number of versions dropped
+        """
+        with self._lock:
+            if horizon is None:
+                if self.retention_rounds is None:
+                    raise ValueError("A horizon is required without retention_rounds")
+                horizon = self.latest_round - self.retention_rounds
+            return self._prune(horizon)
+
+    def _prune(self, horizon: int) -> int:
+        """Prune up to a horizon (lock must be held)."""
+        if horizon <= self.horizon:
+            return 0
+
+        dropped = 0
+        for address in list(self._rounds):
+            rounds = self._rounds[address]
+            balances = self._balances[address]
+            # Keep the newest version at or before the horizon as the base
+            base = bisect.bisect_right(rounds, horizon) - 1
+            if base == len(rounds) - 1 and balances[base] == 0:
+                # Empty since before the horizon: absent means zero
+                dropped += len(rounds)
+                del self._rounds[address]
+                del self._balances[address]
+            elif base > 0:
+                del rounds[:base]
+                del balances[:base]
+                dropped += base
+
+        # Keep the newest clock entry at or before the horizon for time queries
+        index = bisect.bisect_right(self._clock_rounds, horizon) - 1
+        if index > 0:
+            del self._clock_rounds[:index]
+            del self._clock_times[:index]
+        self.horizon = horizon
+        return dropped
@@ -23,4 +23,12 @@ setup(
         "py-algorand-sdk>=1.13.0",
         "requests>=2.25.1",
     ],
+    entry_points={
+        "console_scripts": [
+            "dmarket=digital_marketplace.cli:main",
+        ],
+    },
+    extras_require={
+        "fast": ["numpy>=1.20"],
+    },
 )
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Tests for the ledger change feed.
+"""
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from digital_marketplace.changefeed import (
+    ChangeFeed,
+    FIELD_BALANCE,
+    FIELD_REWARD,
+    OPERATION_GAP
+)
+from digital_marketplace.contract import DigitalMarketplace
+
+class TestChangeFeed(unittest.TestCase):
+    """Test cases for the change feed."""
+    
+    def setUp(self):
+        """Set up a feed for each test."""
+        self.feed = ChangeFeed()
+    
+    def test_events_in_order(self):
+        """Test that a subscriber receives published events in order."""
+        subscription = self.feed.subscribe()
+        self.feed.publish("deposit", "A", FIELD_BALANCE, 0, 10, "TX_1", 5)
+        self.feed.publish("deposit", "B", FIELD_BALANCE, 0, 20, "TX_2", 6)
+        self.feed.close()
+        
+        events = list(subscription)
+        
+        self.assertEqual([(e.address, e.new, e.txid, e.round) for e in events],
+                         [("A", 10, "TX_1", 5), ("B", 20, "TX_2", 6)])
+        self.assertLess(events[0].sequence, events[1].sequence)
+    
+    def test_coalescing(self):
+        """Test that a coalescing subscriber merges changes to the same key."""
+        subscription = self.feed.subscribe(coalesce=True)
+        self.feed.publish("deposit", "A", FIELD_BALANCE, 0, 10)
+        self.feed.publish("deposit", "A", FIELD_BALANCE, 10, 25)
+        self.feed.publish("stake", "A", FIELD_REWARD, 0, 3)
+        
+        first = subscription.get(timeout=1)
+        second = subscription.get(timeout=1)
+        
+        self.assertEqual((first.field, first.old, first.new), (FIELD_BALANCE, 0, 25))
+        self.assertEqual((second.field, second.new), (FIELD_REWARD, 3))
+        self.assertIsNone(subscription.get(timeout=0.01))
+    
+    def test_overflow_reports_gap(self):
+        """Test that a full buffer drops events and reports a gap."""
+        subscription = self.feed.subscribe(max_buffer=2)
+        for i in range(5):
+            self.feed.publish("deposit", f"A{i}", FIELD_BALANCE, 0, i)
+        
+        events = [subscription.get(timeout=1) for _ in range(3)]
+        
+        self.assertEqual([e.address for e in events[:2]], ["A0", "A1"])
+        self.assertEqual(events[2].operation, OPERATION_GAP)
+        self.assertEqual(events[2].new, 3)
+        
+        self.feed.publish("deposit", "A5", FIELD_BALANCE, 0, 5)
+        self.assertEqual(subscription.get(timeout=1).address, "A5")
+    
+    def test_async_iteration(self):
+        """Test receiving events through an async iterator."""
+        subscription = self.feed.subscribe()
+        
+        async def consume():
+            received = []
+            async for event in subscription:
+                received.append(event.address)
+                if len(received) == 2:
+                    break
+            return received
+        
+        async def main():
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, self.feed.publish, "claim", "A", FIELD_REWARD, 5, 0
+            )
+            self.feed.publish("claim", "B", FIELD_REWARD, 7, 0)
+            return await asyncio.wait_for(task, 5)
+        
+        self.assertEqual(asyncio.run(main()), ["A", "B"])
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_contract_publishes_claim(self, mock_wait_for_confirmation):
+        """Test that claiming rewards publishes the reward reset."""
+        mock_wait_for_confirmation.return_value = {"confirmed-round": 42}
+        mock_client = MagicMock()
+        mock_client.send_transaction.return_value = "TX_ID"
+        contract = DigitalMarketplace(mock_client, "CREATOR", "KEY", "handle")
+        contract.staking_rewards = {"USER": 100}
+        subscription = contract.change_feed.subscribe()
+        
+        with patch("algosdk.future.transaction.PaymentTxn"):
+            contract.claim_staking_rewards("USER")
+        
+        event = subscription.get(timeout=1)
+        self.assertEqual(
+            (event.operation, event.address, event.field, event.old, event.new, event.txid, event.round),
+            ("claim", "USER", FIELD_REWARD, 100, 0, "TX_ID", 42)
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+"""
+Tests for the dmarket command line interface.
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import MagicMock, patch
+
+from algosdk import account, mnemonic
+from algosdk.error import AlgodHTTPError, ConfirmationTimeoutError
+from algosdk.future import transaction
+
+from digital_marketplace import utils
+from digital_marketplace.cli import main
+from digital_marketplace.config import DECIMALS, STAKING_THRESHOLD_USDT
+
+class TestCli(unittest.TestCase):
+    """Test cases for the command line interface."""
+    
+    def setUp(self):
+        """Save the price cache, which --price overrides."""
+        self.price_cache = dict(utils._algo_price_cache)
+        self.price_last_update = utils._algo_price_last_update
+    
+    def tearDown(self):
+        """Restore the price cache."""
+        utils._algo_price_cache.clear()
+        utils._algo_price_cache.update(self.price_cache)
+        utils._algo_price_last_update = self.price_last_update
+    
+    def run_cli(self, argv):
+        """Run the CLI and return its exit code and output."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = main(argv)
+        return code, output.getvalue()
+    
+    def test_quote_deposit(self):
+        """Test quoting a deposit at a fixed price."""
+        code, output = self.run_cli(["quote", "deposit", "1000000", "--price", "0.2"])
+        
+        self.assertEqual(code, 0)
+        self.assertIn("1.000000 ALGO -> 0.19980550 DMARKET", output)
+    
+    def test_quote_too_small(self):
+        """Test that a quote below the fee is rejected."""
+        code, output = self.run_cli(["quote", "withdraw", "1", "--price", "0.2"])
+        
+        self.assertEqual(code, 1)
+        self.assertIn("too small", output)
+    
+    def test_quote_with_fee(self):
+        """Test quoting with a marketplace's own fee."""
+        code, output = self.run_cli(["quote", "deposit", "10000000", "--price", "0.5",
+                                     "--fee", "1"])
+        
+        self.assertEqual(code, 0)
+        self.assertIn("10.000000 ALGO -> 4.00000000 DMARKET", output)
+    
+    def test_quote_does_not_import_heavy_dependencies(self):
+        """Test that quoting loads neither algosdk nor requests."""
+        script = (
+            "import sys\n"
+            "from digital_marketplace.cli import main\n"
+            "main(['quote', 'deposit', '1000000', '--price', '0.2'])\n"
+            "print(sorted(m for m in ('algosdk', 'requests', 'numpy') if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "[]")
+    
+    def test_stake_run_updates_state_file(self):
+        """Test that stake-run credits rewards and saves the state file."""
+        eligible = STAKING_THRESHOLD_USDT * (10 ** DECIMALS)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            with open(path, "w") as f:
+                json.dump({
+                    "asset_id": 1,
+                    "token_holders": {"RICH": eligible, "SMALL": 1},
+                    "staking_rewards": {},
+                    "last_staking_calculation": 0
+                }, f)
+            
+            with patch("digital_marketplace.utils.get_algo_price_usdt", return_value=0.2):
+                code, output = self.run_cli(["stake-run", "--state", path])
+            
+            with open(path) as f:
+                state = json.load(f)
+        
+        self.assertEqual(code, 0)
+        self.assertIn("Credited staking rewards to 1 holders", output)
+        self.assertGreater(state["staking_rewards"]["RICH"], 0)
+        self.assertNotIn("SMALL", state["staking_rewards"])
+        self.assertGreater(state["last_staking_calculation"], 0)
+    
+    def test_stake_run_with_budget_sweeps_incrementally(self):
+        """Test that stake-run --budget completes and clears the sweep cursor."""
+        eligible = STAKING_THRESHOLD_USDT * (10 ** DECIMALS)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            with open(path, "w") as f:
+                json.dump({
+                    "asset_id": 1,
+                    "token_holders": {f"RICH{i}": eligible for i in range(5)},
+                    "staking_rewards": {},
+                    "last_staking_calculation": 0
+                }, f)
+            
+            with patch("digital_marketplace.utils.get_algo_price_usdt", return_value=0.2):
+                code, output = self.run_cli(["stake-run", "--state", path, "--budget", "0",
+                                             "--chunk-size", "2"])
+            
+            with open(path) as f:
+                state = json.load(f)
+        
+        self.assertEqual(code, 0)
+        self.assertIn("Swept 5 holders in 3 ticks", output)
+        self.assertIn("Credited staking rewards to 5 holders", output)
+        self.assertIsNone(state["staking_sweep"])
+        self.assertGreater(state["last_staking_calculation"], 0)
+
+    def run_distribute(self, path, algod_client):
+        """Run distribute against a mocked node with a scheduler that sends inline."""
+        creator_key, _ = account.generate_account()
+        scheduler = MagicMock()
+        scheduler.return_value.send.side_effect = lambda signed, lane: signed.get_txid()
+        with patch.dict(os.environ, {"CREATOR_MNEMONIC": mnemonic.from_private_key(creator_key)}), \
+                patch("digital_marketplace.cli._algod_client", return_value=algod_client), \
+                patch("digital_marketplace.scheduler.SubmissionScheduler", scheduler):
+            code, output = self.run_cli(["distribute", "--state", path])
+        with open(path) as f:
+            return code, output, json.load(f), scheduler.return_value.send
+    
+    def distribute_client(self):
+        """Build a mocked node for distribute payouts."""
+        algod_client = MagicMock()
+        algod_client.suggested_params.return_value = transaction.SuggestedParams(
+            fee=1000, first=100, last=1100, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+            gen="testnet-v1.0", flat_fee=True
+        )
+        return algod_client
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_distribute_resolves_timed_out_payout(self, mock_wait_for_confirmation):
+        """Test that a payout whose confirmation timed out is never paid twice."""
+        _, holder_address = account.generate_account()
+        algod_client = self.distribute_client()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            with open(path, "w") as f:
+                json.dump({"asset_id": 1, "token_holders": {},
+                           "staking_rewards": {holder_address: 300_000}}, f)
+            
+            mock_wait_for_confirmation.side_effect = ConfirmationTimeoutError("timed out")
+            code, output, state, send = self.run_distribute(path, algod_client)
+            
+            self.assertEqual(code, 1)
+            self.assertIn("0 failed, 1 in flight", output)
+            payout = state["pending_payouts"][holder_address]
+            self.assertEqual(payout["amount"], 300_000)
+            self.assertEqual(payout["last_valid"], 200)
+            self.assertEqual(state["staking_rewards"][holder_address], 300_000)
+            
+            # The payout landed after the timeout
+            algod_client.pending_transaction_info.return_value = {"confirmed-round": 105}
+            code, output, state, send = self.run_distribute(path, algod_client)
+        
+        self.assertEqual(code, 0)
+        self.assertIn(f"Payout to {holder_address} from a previous run: paid", output)
+        send.assert_not_called()
+        algod_client.pending_transaction_info.assert_called_with(payout["tx_id"])
+        self.assertEqual(state["pending_payouts"], {})
+        self.assertEqual(state["staking_rewards"][holder_address], 0)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_distribute_pays_again_after_expired_payout(self, mock_wait_for_confirmation):
+        """Test that a payout that expired without landing is paid again."""
+        _, holder_address = account.generate_account()
+        algod_client = self.distribute_client()
+        algod_client.pending_transaction_info.side_effect = AlgodHTTPError("not found", 404)
+        mock_wait_for_confirmation.return_value = {"confirmed-round": 310}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            with open(path, "w") as f:
+                json.dump({"asset_id": 1, "token_holders": {},
+                           "staking_rewards": {holder_address: 300_000},
+                           "pending_payouts": {holder_address: {
+                               "tx_id": "OLD_TX", "amount": 300_000,
+                               "first_valid": 100, "last_valid": 200}}}, f)
+            
+            # Still within its validity window: left alone
+            algod_client.status.return_value = {"last-round": 150}
+            code, output, state, send = self.run_distribute(path, algod_client)
+            
+            self.assertIn("from a previous run: in-flight", output)
+            send.assert_not_called()
+            self.assertIn(holder_address, state["pending_payouts"])
+            
+            algod_client.status.return_value = {"last-round": 300}
+            code, output, state, send = self.run_distribute(path, algod_client)
+        
+        self.assertEqual(code, 0)
+        self.assertIn("from a previous run: failed", output)
+        send.assert_called_once()
+        self.assertEqual(state["pending_payouts"], {})
+        self.assertEqual(state["staking_rewards"][holder_address], 0)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_distribute_keeps_payout_beyond_lookback(self, mock_wait_for_confirmation):
+        """Test that a payout too old to look up on chain is not paid again."""
+        _, holder_address = account.generate_account()
+        algod_client = self.distribute_client()
+        algod_client.pending_transaction_info.side_effect = AlgodHTTPError("not found", 404)
+        algod_client.status.return_value = {"last-round": 1200}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            with open(path, "w") as f:
+                json.dump({"asset_id": 1, "token_holders": {},
+                           "staking_rewards": {holder_address: 300_000},
+                           "pending_payouts": {holder_address: {
+                               "tx_id": "OLD_TX", "amount": 300_000,
+                               "first_valid": 100, "last_valid": 200}}}, f)
+            
+            code, output, state, send = self.run_distribute(path, algod_client)
+        
+        self.assertIn("from a previous run: unknown", output)
+        send.assert_not_called()
+        self.assertIn(holder_address, state["pending_payouts"])
+        self.assertEqual(state["staking_rewards"][holder_address], 300_000)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for the columnar ledger export.
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from digital_marketplace.export import LedgerSnapshot, export_ledger
+
+class TestExport(unittest.TestCase):
+    """Test cases for columnar export and memory-mapped reading."""
+    
+    def setUp(self):
+        """Set up a ledger and a snapshot directory."""
+        self.token_holders = {f"HOLDER_{i}": i * 1000 for i in range(1, 26)}
+        self.staking_rewards = {"HOLDER_3": 7, "CLAIMED_ONLY": 99}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "snapshot")
+    
+    def tearDown(self):
+        """Remove the snapshot directory."""
+        self.tmp.cleanup()
+    
+    def test_round_trip_in_chunks(self):
+        """Test that a chunked export reads back the same ledger."""
+        manifest = export_ledger(self.token_holders, self.staking_rewards,
+                                 self.directory, chunk_size=4)
+        
+        snapshot = LedgerSnapshot(self.directory)
+        balances, rewards = snapshot.to_dicts()
+        
+        self.assertEqual(manifest["rows"], 26)
+        self.assertEqual(len(snapshot), 26)
+        self.assertEqual(balances, self.token_holders)
+        self.assertEqual(rewards, self.staking_rewards)
+    
+    def test_columns_are_memory_mapped(self):
+        """Test that columns are opened lazily as read-only memory maps."""
+        export_ledger(self.token_holders, self.staking_rewards, self.directory)
+        snapshot = LedgerSnapshot(self.directory)
+        
+        balance = snapshot.balance
+        
+        self.assertIsInstance(balance, np.memmap)
+        self.assertFalse(balance.flags.writeable)
+        self.assertEqual(list(snapshot._columns), ["balance"])
+        self.assertEqual(int(balance.sum()), sum(self.token_holders.values()))
+    
+    def test_reexport_hides_manifest_until_complete(self):
+        """Test that an interrupted re-export leaves no manifest over changed columns."""
+        export_ledger(self.token_holders, self.staking_rewards, self.directory, chunk_size=4)
+        reader = LedgerSnapshot(self.directory)
+        balance = reader.balance
+        
+        # The second chunk fails after the first was written
+        holders = dict(self.token_holders, **{"A" * 59: 1})
+        with self.assertRaises(ValueError):
+            export_ledger(holders, {}, self.directory, chunk_size=25)
+        
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "manifest.json")))
+        with self.assertRaises(FileNotFoundError):
+            LedgerSnapshot(self.directory)
+        # A reader of the previous snapshot still sees its columns unchanged
+        self.assertEqual(int(balance.sum()), sum(self.token_holders.values()))
+        
+        export_ledger({"B": 2}, {}, self.directory)
+        self.assertEqual(LedgerSnapshot(self.directory).to_dicts(), ({"B": 2}, {}))
+    
+    def test_long_address_rejected(self):
+        """Test that addresses wider than the column are not truncated."""
+        with self.assertRaises(ValueError):
+            export_ledger({"A" * 59: 1}, {}, self.directory)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for the per-holder reward history.
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.history import RewardHistory, day_of
+
+class TestRewardHistory(unittest.TestCase):
+    """Test cases for prefix-sum reward history."""
+    
+    def setUp(self):
+        """Set up ten days of rewards."""
+        self.history = RewardHistory(daily_days=5, bucket_days=4)
+        for day in range(100, 110):
+            rewards = {"ALICE": day}
+            if day >= 105:
+                rewards["BOB"] = 1
+            self.history.record_day(day, rewards)
+    
+    def test_holder_range_total(self):
+        """Test a range total for one holder within the daily window."""
+        self.assertEqual(self.history.holder_total("ALICE", 106, 108), 106 + 107 + 108)
+        self.assertEqual(self.history.holder_total("BOB", 100, 109), 5)
+        self.assertEqual(self.history.holder_total("BOB", 100, 104), 0)
+        self.assertEqual(self.history.holder_total("CAROL", 100, 109), 0)
+    
+    def test_all_holders_statement(self):
+        """Test range totals for every holder at once."""
+        statement = self.history.statement(105, 109)
+        
+        self.assertEqual(statement, {"ALICE": sum(range(105, 110)), "BOB": 5})
+        self.assertEqual(list(self.history.range_totals(109, 108)), [0, 0])
+    
+    def test_old_days_are_compacted(self):
+        """Test that days past the daily window collapse into buckets."""
+        # Days 100-103 and 104 fall in buckets 25 and 26 (bucket_days=4)
+        self.assertEqual(len(self.history), 2 + 5)
+        self.assertEqual(self.history.holder_total("ALICE", 100, 109), sum(range(100, 110)))
+        # Bucket 100-103 is counted only when the range includes its last day
+        self.assertEqual(self.history.holder_total("ALICE", 100, 102), 0)
+    
+    def test_prefix_columns_per_block(self):
+        """Test that a block stores one dense base and sparse cumulative days."""
+        history = RewardHistory(daily_days=90, bucket_days=30)
+        history.record_day(1, {f"HOLDER{i}": 1 for i in range(1000)})
+        for day in range(2, 91):
+            history.record_day(day, {"WHALE": day})
+        
+        # Blocks of days 0-29, 30-59, 60-89 and 90
+        self.assertEqual(sorted(history._bases), [0, 1, 2, 3])
+        # Outside the first block, days only hold the one holder credited
+        self.assertTrue(all(len(column) == 1 for column in history._columns[29:]))
+        self.assertEqual(history.holder_total("HOLDER7", 1, 90), 1)
+        self.assertEqual(history.holder_total("WHALE", 50, 52), 50 + 51 + 52)
+        self.assertEqual(history.holder_total("WHALE", 29, 31), 29 + 30 + 31)
+        self.assertEqual(history.statement(2, 90), {"WHALE": sum(range(2, 91))})
+    
+    def test_ranges_match_daily_sums(self):
+        """Test short and long ranges against summing each day."""
+        history = RewardHistory(daily_days=10, bucket_days=3)
+        daily = {}
+        for day in range(1, 31):
+            daily[day] = {f"H{i}": day * i for i in range(day % 5, 8, 2)}
+            history.record_day(day, daily[day])
+        
+        # Ranges in the daily window, plus everything (compacted buckets included)
+        for start, end in ((21, 21), (21, 30), (22, 29), (25, 26), (1, 30)):
+            expected = {}
+            for day in range(start, end + 1):
+                for address, reward in daily[day].items():
+                    expected[address] = expected.get(address, 0) + reward
+            expected = {a: r for a, r in expected.items() if r}
+            self.assertEqual(history.statement(start, end), expected)
+            self.assertEqual(history.holder_total("H3", start, end), expected.get("H3", 0))
+    
+    def test_days_must_increase(self):
+        """Test that the history is append-only."""
+        with self.assertRaises(ValueError):
+            self.history.record_day(109, {"ALICE": 1})
+    
+    @patch('digital_marketplace.utils.get_algo_price_usdt', return_value=0.1945)
+    def test_contract_records_staking_runs(self, mock_price):
+        """Test that staking runs are appended and survive claims."""
+        now = [86400 * 200]
+        history = RewardHistory()
+        contract = DigitalMarketplace(MagicMock(), "CREATOR", "KEY", "handle",
+                                      clock=lambda: now[0], reward_history=history)
+        contract.token_holders = {"WHALE": 20_000 * 10 ** 8, "SMALL": 10 ** 8}
+        
+        now[0] += 86400
+        contract.calculate_staking_rewards()
+        contract.staking_rewards["WHALE"] = 0
+        now[0] += 86400
+        contract.calculate_staking_rewards()
+        
+        earned = history.holder_total("WHALE", day_of(now[0]) - 1, day_of(now[0]))
+        self.assertGreater(earned, 0)
+        self.assertEqual(earned, 2 * contract.get_staking_rewards("WHALE"))
+        self.assertNotIn("SMALL", history.statement(0, day_of(now[0])))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Tests for the multi-marketplace host.
+"""
+import contextlib
+import io
+import unittest
+from unittest.mock import MagicMock
+
+from algosdk import account
+
+from digital_marketplace.config import DECIMALS, MarketplaceConfig
+from digital_marketplace.host import CachedParamsClient, MarketplaceHost
+from digital_marketplace.simulator import LocalAlgodClient
+from digital_marketplace.utils import PriceOracle
+
+class TestCachedParamsClient(unittest.TestCase):
+    """Test cases for shared suggested params."""
+    
+    def test_params_are_shared_until_expiry(self):
+        """Test that params are fetched once per TTL and copied per caller."""
+        now = [0.0]
+        inner = LocalAlgodClient()
+        client = CachedParamsClient(inner, ttl=2.0, clock=lambda: now[0])
+        
+        first = client.suggested_params()
+        first.fee = 5000
+        second = client.suggested_params()
+        self.assertEqual(client.fetches, 1)
+        self.assertEqual(second.fee, 1000)
+        
+        now[0] += 2.0
+        client.suggested_params()
+        self.assertEqual(client.fetches, 2)
+        # Other calls pass through
+        self.assertEqual(client.status()["last-round"], inner.status()["last-round"])
+
+class TestPriceOracle(unittest.TestCase):
+    """Test cases for the isolated price cache."""
+    
+    def test_fetches_once_per_period(self):
+        """Test that the price is cached and kept when a fetch fails."""
+        now = [1000]
+        fetch = MagicMock(return_value=0.25)
+        oracle = PriceOracle(cache_duration=300, fetch=fetch, clock=lambda: now[0])
+        
+        self.assertEqual(oracle.price(), 0.25)
+        self.assertEqual(oracle.price(), 0.25)
+        self.assertEqual(fetch.call_count, 1)
+        
+        now[0] += 301
+        fetch.side_effect = RuntimeError("down")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(oracle.price(), 0.25)
+        self.assertEqual(fetch.call_count, 2)
+
+class TestMarketplaceHost(unittest.TestCase):
+    """Test cases for hosting several marketplaces."""
+    
+    def setUp(self):
+        """Set up a host over a local node with a pinned price."""
+        self.oracle = PriceOracle(fetch=lambda: 0.2)
+        self.host = MarketplaceHost(LocalAlgodClient(), workers=4, price_oracle=self.oracle,
+                                    clock=lambda: 10 * 86400)
+        self.creator_key, self.creator = account.generate_account()
+    
+    def tearDown(self):
+        """Stop the host."""
+        self.host.close()
+    
+    def _add(self, config=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.host.add(self.creator, self.creator_key, "octocat", config=config)
+    
+    def test_marketplaces_share_clients_and_keep_state(self):
+        """Test that marketplaces are keyed by asset and isolated."""
+        first = self._add()
+        second = self._add()
+        
+        self.assertEqual(sorted(self.host), sorted([first.asset_id, second.asset_id]))
+        self.assertIs(self.host.get(first.asset_id), first)
+        self.assertIs(first.algod_client, second.algod_client)
+        self.assertIs(first.price_oracle, second.price_oracle)
+        self.assertIsNot(first.change_feed, second.change_feed)
+        
+        first._set_balance("test", "HOLDER", 5)
+        self.assertNotIn("HOLDER", second.token_holders)
+        
+        with self.assertRaises(ValueError):
+            self.host.add(self.creator, self.creator_key, "octocat", asset_id=first.asset_id)
+        self.assertIs(self.host.remove(second.asset_id), second)
+        self.assertNotIn(second.asset_id, self.host)
+    
+    def test_staking_uses_each_config(self):
+        """Test that each marketplace applies its own threshold and rate."""
+        default = self._add()
+        generous = self._add(MarketplaceConfig(staking_threshold_usdt=100,
+                                               staking_reward_percentage=10))
+        balance = 1_000 * (10 ** DECIMALS)
+        for marketplace in (default, generous):
+            marketplace.last_staking_calculation = 0
+            marketplace._set_balance("test", "HOLDER", balance)
+        
+        results = self.host.run_staking()
+        
+        self.assertEqual(results, {default.asset_id: None, generous.asset_id: None})
+        # 1,000 USDT is below the default 10K threshold
+        self.assertEqual(default.get_staking_rewards("HOLDER"), 0)
+        expected = int(1_000 * 0.10 / 365 / 0.2 * 1_000_000)
+        self.assertEqual(generous.get_staking_rewards("HOLDER"), expected)
+    
+    def test_submit_runs_on_shared_workers(self):
+        """Test that operations run on the host's thread pool."""
+        marketplace = self._add()
+        future = self.host.submit(marketplace.asset_id, "get_staking_rewards", "HOLDER")
+        self.assertEqual(future.result(timeout=5), 0)
+        
+        with self.assertRaises(KeyError):
+            self.host.submit(12345, "get_staking_rewards", "HOLDER")
+
+if __name__ == "__main__":
+    unittest.main()
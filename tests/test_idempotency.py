@@ -0,0 +1,241 @@
+"""
+Tests for idempotency keys and transaction leases.
+"""
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from algosdk import account
+from algosdk.error import AlgodHTTPError, ConfirmationTimeoutError
+from algosdk.future import transaction
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.config import TOTAL_SUPPLY, DECIMALS
+from digital_marketplace.idempotency import (
+    IdempotencyCache,
+    IdempotencyConflictError,
+    derive_lease
+)
+
+class TestIdempotencyCache(unittest.TestCase):
+    """Test cases for the idempotency cache."""
+    
+    def test_completed_request_replayed(self):
+        """Test that a retry returns the stored result without rerunning."""
+        cache = IdempotencyCache()
+        func = MagicMock(return_value=("TX_ID", 10))
+        
+        self.assertEqual(cache.run("key", ("deposit", "A", 1), func), ("TX_ID", 10))
+        self.assertEqual(cache.run("key", ("deposit", "A", 1), func), ("TX_ID", 10))
+        
+        func.assert_called_once()
+        self.assertEqual(cache.hits, 1)
+    
+    def test_in_flight_retry_waits(self):
+        """Test that a retry during the original request shares its result."""
+        cache = IdempotencyCache()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "TX_ID"
+        
+        results = []
+        original = threading.Thread(target=lambda: results.append(cache.run("key", "fp", slow)))
+        original.start()
+        started.wait(5)
+        retry = threading.Thread(target=lambda: results.append(cache.run("key", "fp", slow)))
+        retry.start()
+        release.set()
+        original.join(5)
+        retry.join(5)
+        
+        self.assertEqual(results, ["TX_ID", "TX_ID"])
+        self.assertEqual(len(calls), 1)
+    
+    def test_failure_releases_key(self):
+        """Test that a failed request can be retried with the same key."""
+        cache = IdempotencyCache()
+        
+        with self.assertRaises(RuntimeError):
+            cache.run("key", "fp", MagicMock(side_effect=RuntimeError()))
+        
+        self.assertEqual(cache.run("key", "fp", lambda: "TX_ID"), "TX_ID")
+    
+    def test_failure_after_send_resolves_sent_request(self):
+        """Test that a retry after a post-send failure finishes the sent request."""
+        cache = IdempotencyCache()
+        finish = MagicMock(side_effect=[TimeoutError(), "TX_ID"])
+        
+        def request():
+            cache.sent("key", finish)
+            return finish()
+        
+        with self.assertRaises(TimeoutError):
+            cache.run("key", "fp", request)
+        func = MagicMock()
+        
+        self.assertEqual(cache.run("key", "fp", func), "TX_ID")
+        func.assert_not_called()
+        self.assertEqual(cache.run("key", "fp", func), "TX_ID")
+        self.assertEqual(finish.call_count, 2)
+    
+    def test_key_reuse_rejected(self):
+        """Test that a key cannot be reused for a different request."""
+        cache = IdempotencyCache()
+        cache.run("key", ("deposit", "A", 1), lambda: "TX_ID")
+        
+        with self.assertRaises(IdempotencyConflictError):
+            cache.run("key", ("deposit", "A", 2), lambda: "TX_ID")
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used completed entries are evicted."""
+        cache = IdempotencyCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.run(key, key, lambda: key)
+        cache.run("a", "a", lambda: "a")
+        cache.run("c", "c", lambda: "c")
+        
+        self.assertEqual(cache.get("a"), "a")
+        self.assertIsNone(cache.get("b"))
+
+class TestIdempotentWithdraw(unittest.TestCase):
+    """Test cases for idempotent contract operations."""
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_withdraw_retry_sends_once_with_leases(self, mock_wait_for_confirmation):
+        """Test that a retried withdrawal is not resubmitted."""
+        mock_wait_for_confirmation.return_value = {"confirmed-round": 1}
+        mock_client = MagicMock()
+        mock_client.suggested_params.return_value = transaction.SuggestedParams(
+            fee=1000, first=1, last=1000, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+            gen="testnet-v1.0", flat_fee=True
+        )
+        mock_client.send_transactions.return_value = "TX_ID"
+        
+        creator_key, creator_address = account.generate_account()
+        user_key, user_address = account.generate_account()
+        contract = DigitalMarketplace(mock_client, creator_address, creator_key, "handle")
+        contract.asset_id = 12345
+        token_amount = 100_000_000
+        contract.token_holders = {
+            creator_address: TOTAL_SUPPLY * (10 ** DECIMALS) - token_amount,
+            user_address: token_amount
+        }
+        
+        with patch("digital_marketplace.contract.usdt_to_algo", return_value=1000):
+            first = contract.withdraw(user_address, user_key, token_amount, idempotency_key="req-1")
+            retry = contract.withdraw(user_address, user_key, token_amount, idempotency_key="req-1")
+        
+        self.assertEqual(first, retry)
+        mock_client.send_transactions.assert_called_once()
+        signed = mock_client.send_transactions.call_args.args[0]
+        self.assertEqual([s.transaction.lease for s in signed],
+                         [derive_lease(user_address, "req-1", 0),
+                          derive_lease(user_address, "req-1", 1)])
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_retry_after_timeout_credits_once(self, mock_wait_for_confirmation):
+        """Test that a retry after a confirmation timeout waits for the sent group."""
+        mock_wait_for_confirmation.side_effect = [
+            ConfirmationTimeoutError("timed out"), {"confirmed-round": 2}
+        ]
+        contract, users = self._contract(users=1)
+        user_address, user_key = users[0]
+        
+        with patch("digital_marketplace.contract.usdt_to_algo", return_value=1000):
+            with self.assertRaises(ConfirmationTimeoutError):
+                contract.withdraw(user_address, user_key, 100_000_000, idempotency_key="req-1")
+            self.assertEqual(contract.token_holders[user_address], 100_000_000)
+            
+            tx_id, _ = contract.withdraw(user_address, user_key, 100_000_000,
+                                         idempotency_key="req-1")
+        
+        self.assertEqual(tx_id, "TX_ID")
+        contract.algod_client.send_transactions.assert_called_once()
+        self.assertEqual(contract.token_holders[user_address], 0)
+        self.assertEqual(sum(contract.token_holders.values()), TOTAL_SUPPLY * (10 ** DECIMALS))
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_retry_after_failed_send_waits_for_group(self, mock_wait_for_confirmation):
+        """Test that a send error that may have reached the node keeps the key."""
+        mock_wait_for_confirmation.return_value = {"confirmed-round": 2}
+        contract, users = self._contract(users=1)
+        user_address, user_key = users[0]
+        contract.algod_client.send_transactions.side_effect = AlgodHTTPError("unavailable", 503)
+        
+        with patch("digital_marketplace.contract.usdt_to_algo", return_value=1000):
+            with self.assertRaises(AlgodHTTPError):
+                contract.withdraw(user_address, user_key, 100_000_000, idempotency_key="req-1")
+            self.assertEqual(contract.token_holders[user_address], 100_000_000)
+            
+            # The group landed after all: the retry confirms it instead of resending
+            tx_id, _ = contract.withdraw(user_address, user_key, 100_000_000,
+                                         idempotency_key="req-1")
+        
+        group = contract.algod_client.send_transactions.call_args.args[0]
+        self.assertEqual(tx_id, group[0].get_txid())
+        contract.algod_client.send_transactions.assert_called_once()
+        mock_wait_for_confirmation.assert_called_once_with(contract.algod_client, tx_id, 4)
+        self.assertEqual(contract.token_holders[user_address], 0)
+        self.assertEqual(sum(contract.token_holders.values()), TOTAL_SUPPLY * (10 ** DECIMALS))
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_rejected_send_releases_key(self, mock_wait_for_confirmation):
+        """Test that a group the node refused can be retried from scratch."""
+        mock_wait_for_confirmation.return_value = {"confirmed-round": 2}
+        contract, users = self._contract(users=1)
+        user_address, user_key = users[0]
+        contract.algod_client.send_transactions.side_effect = [
+            AlgodHTTPError("overspend", 400), "TX_ID"
+        ]
+        
+        with patch("digital_marketplace.contract.usdt_to_algo", return_value=1000):
+            with self.assertRaises(AlgodHTTPError):
+                contract.withdraw(user_address, user_key, 100_000_000, idempotency_key="req-1")
+            tx_id, _ = contract.withdraw(user_address, user_key, 100_000_000,
+                                         idempotency_key="req-1")
+        
+        self.assertEqual(tx_id, "TX_ID")
+        self.assertEqual(contract.algod_client.send_transactions.call_count, 2)
+        self.assertEqual(contract.token_holders[user_address], 0)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_same_key_from_different_users(self, mock_wait_for_confirmation):
+        """Test that two users reusing a client key do not collide."""
+        mock_wait_for_confirmation.return_value = {"confirmed-round": 1}
+        contract, users = self._contract(users=2)
+        
+        with patch("digital_marketplace.contract.usdt_to_algo", return_value=1000):
+            for address, key in users:
+                contract.withdraw(address, key, 100_000_000, idempotency_key="req-1")
+        
+        groups = [call.args[0] for call in contract.algod_client.send_transactions.call_args_list]
+        self.assertEqual(len(groups), 2)
+        self.assertNotEqual(groups[0][1].transaction.lease, groups[1][1].transaction.lease)
+    
+    def _contract(self, users):
+        """Create a contract with a mock client and funded test users."""
+        mock_client = MagicMock()
+        mock_client.suggested_params.return_value = transaction.SuggestedParams(
+            fee=1000, first=1, last=1000, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+            gen="testnet-v1.0", flat_fee=True
+        )
+        mock_client.send_transactions.return_value = "TX_ID"
+        
+        creator_key, creator_address = account.generate_account()
+        contract = DigitalMarketplace(mock_client, creator_address, creator_key, "handle")
+        contract.asset_id = 12345
+        accounts = [(address, key) for key, address in
+                    (account.generate_account() for _ in range(users))]
+        contract.token_holders = {creator_address: TOTAL_SUPPLY * (10 ** DECIMALS) - 100_000_000 * users}
+        for address, _ in accounts:
+            contract.token_holders[address] = 100_000_000
+        return contract, accounts
+
+if __name__ == "__main__":
+    unittest.main()
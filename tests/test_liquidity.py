@@ -0,0 +1,144 @@
+"""
+Tests for creator liquidity tracking.
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+
+from algosdk import account
+from algosdk.error import ConfirmationTimeoutError
+from algosdk.future import transaction
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.liquidity import CreatorLiquidity, InsufficientLiquidityError
+
+class TestCreatorLiquidity(unittest.TestCase):
+    """Test cases for cached creator holdings and reservations."""
+    
+    def setUp(self):
+        """Set up a tracker over a mocked creator account."""
+        self.algod_client = MagicMock()
+        self.algod_client.status.return_value = {"last-round": 100}
+        self.algod_client.account_info.return_value = {
+            "round": 100,
+            "amount": 1_000_000,
+            "min-balance": 200_000,
+            "assets": [{"asset-id": 7, "amount": 5_000}],
+        }
+        self.now = 0.0
+        self.liquidity = CreatorLiquidity(self.algod_client, "CREATOR", asset_id=7,
+                                          ttl=30.0, round_time=3.0, clock=lambda: self.now)
+    
+    def test_reservations_are_held_until_settled(self):
+        """Test that reservations reduce availability until released."""
+        first = self.liquidity.reserve(algo=500_000, tokens=1_000)
+        
+        self.assertEqual(self.liquidity.available_algo, 800_000 - 501_000)
+        self.assertEqual(self.liquidity.available_tokens, 4_000)
+        with self.assertRaises(InsufficientLiquidityError):
+            self.liquidity.reserve(algo=400_000)
+        
+        first.release()
+        self.liquidity.reserve(algo=400_000).commit()
+        
+        self.assertEqual(self.liquidity.algo, 1_000_000 - 401_000)
+        self.assertEqual(self.liquidity.reserved_algo, 0)
+        self.assertEqual(self.liquidity.rejections, 1)
+    
+    def test_reservations_decided_locally(self):
+        """Test that reservations neither read the account nor poll the node until the TTL."""
+        for _ in range(10):
+            self.now += 2.0
+            self.liquidity.reserve(algo=1).release()
+        self.assertEqual(self.algod_client.account_info.call_count, 1)
+        self.algod_client.status.assert_not_called()
+        
+        self.algod_client.account_info.return_value = dict(
+            self.algod_client.account_info.return_value, round=110
+        )
+        # The first read was at 2s
+        self.now = 32.0
+        self.liquidity.reserve(algo=1).release()
+        self.liquidity.reserve(algo=1).release()
+        self.assertEqual(self.algod_client.account_info.call_count, 2)
+        self.assertEqual(self.liquidity.round, 110)
+        self.algod_client.status.assert_not_called()
+    
+    def test_unknown_outcome_held_until_last_valid(self):
+        """Test that a request that may still land keeps its reservation."""
+        reservation = self.liquidity.reserve(algo=500_000)
+        reservation.settle(ConfirmationTimeoutError("timed out"), last_valid=101)
+        self.assertEqual(self.liquidity.reserved_algo, 501_000)
+        
+        # Round 101 could still include it: the estimate does not pass it yet
+        self.now = 5.0
+        self.liquidity.reserve(algo=1).release()
+        self.algod_client.status.assert_not_called()
+        
+        # The estimate passes it but the node is still at round 101
+        self.now = 6.0
+        self.algod_client.status.return_value = {"last-round": 101}
+        self.algod_client.account_info.return_value = dict(
+            self.algod_client.account_info.return_value, round=101
+        )
+        self.liquidity.reserve(algo=1).release()
+        self.liquidity.reserve(algo=1).release()
+        self.assertEqual(self.liquidity.status_polls, 1)
+        self.assertEqual(self.liquidity.reserved_algo, 501_000)
+        
+        # From round 102 the read shows whether it landed
+        self.now = 9.0
+        self.algod_client.status.return_value = {"last-round": 102}
+        self.algod_client.account_info.return_value = dict(
+            self.algod_client.account_info.return_value, round=102, amount=499_000
+        )
+        self.liquidity.reserve(algo=1).release()
+        self.assertEqual(self.liquidity.status_polls, 2)
+        self.assertEqual(self.liquidity.reserved_algo, 0)
+        self.assertEqual(self.liquidity.algo, 499_000)
+    
+    def test_context_manager_releases_on_error(self):
+        """Test that a failed request returns its reservation."""
+        with self.assertRaises(RuntimeError):
+            with self.liquidity.reserve(algo=100_000):
+                raise RuntimeError("rejected")
+        
+        self.assertEqual(self.liquidity.reserved_algo, 0)
+        self.assertEqual(self.liquidity.algo, 1_000_000)
+    
+    @patch('digital_marketplace.utils.get_algo_price_usdt', return_value=0.1945)
+    def test_contract_rejects_before_signing(self, mock_price):
+        """Test that an uncoverable claim never reaches the node."""
+        contract = DigitalMarketplace(self.algod_client, "CREATOR", "KEY", "handle",
+                                      liquidity=self.liquidity)
+        contract.staking_rewards["HOLDER"] = 2_000_000
+        
+        # Signing with the placeholder key would raise a different error
+        with self.assertRaises(InsufficientLiquidityError):
+            contract.claim_staking_rewards("HOLDER")
+        
+        self.algod_client.send_transaction.assert_not_called()
+        self.assertEqual(contract.get_staking_rewards("HOLDER"), 2_000_000)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_contract_holds_payout_on_timeout(self, mock_wait_for_confirmation):
+        """Test that a claim whose confirmation timed out stays reserved."""
+        mock_wait_for_confirmation.side_effect = ConfirmationTimeoutError("timed out")
+        self.algod_client.suggested_params.return_value = transaction.SuggestedParams(
+            fee=1000, first=100, last=1100, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+            gen="testnet-v1.0", flat_fee=True
+        )
+        self.algod_client.send_transaction.return_value = "TX_ID"
+        creator_key, creator_address = account.generate_account()
+        _, holder_address = account.generate_account()
+        contract = DigitalMarketplace(self.algod_client, creator_address, creator_key, "handle",
+                                      liquidity=self.liquidity)
+        contract.staking_rewards[holder_address] = 300_000
+        
+        with self.assertRaises(ConfirmationTimeoutError):
+            contract.claim_staking_rewards(holder_address)
+        
+        self.assertEqual(self.liquidity.reserved_algo, 301_000)
+        self.assertEqual(self.liquidity._held[0].last_valid, 1100)
+
+if __name__ == "__main__":
+    unittest.main()
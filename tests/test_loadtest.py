@@ -0,0 +1,96 @@
+"""
+Tests for the concurrent load-test harness.
+"""
+import random
+import unittest
+
+from digital_marketplace import utils
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.loadtest import LoadTest, parse_mix
+from digital_marketplace.simulator import LocalAlgodClient
+
+class TestLoadTest(unittest.TestCase):
+    """Test cases for load generation and reporting."""
+    
+    def setUp(self):
+        """Save the price cache, which the load test pins."""
+        self.price_cache = dict(utils._algo_price_cache)
+        self.price_last_update = utils._algo_price_last_update
+    
+    def tearDown(self):
+        """Restore the price cache."""
+        utils._algo_price_cache.clear()
+        utils._algo_price_cache.update(self.price_cache)
+        utils._algo_price_last_update = self.price_last_update
+    
+    def test_thread_mode_reports_phases(self):
+        """Test that thread workers complete operations with phase timings."""
+        load_test = LoadTest(LocalAlgodClient(), users=4, rate=200, duration=0.3,
+                             mix={"deposit": 1}, rng=random.Random(1))
+        report = load_test.run()
+        summary = report.summary()
+        
+        self.assertGreater(report.completed, 0)
+        self.assertEqual(summary["deposit"]["errors"], 0)
+        for phase in ("params", "sign", "submit", "confirm"):
+            self.assertEqual(summary[f"deposit.{phase}"]["count"], report.completed)
+        self.assertNotIn("deposit.queue", summary)
+        self.assertEqual(report.drift, 0)
+    
+    def test_asyncio_mode_mixes_operations(self):
+        """Test that asyncio arrivals are spread over the operation mix."""
+        load_test = LoadTest(LocalAlgodClient(), users=4, rate=400, duration=0.3,
+                             mode="asyncio", rng=random.Random(2))
+        report = load_test.run()
+        summary = report.summary()
+        
+        for op in ("deposit", "withdraw", "claim"):
+            self.assertGreater(summary[op]["count"], 0)
+            self.assertEqual(summary[op]["errors"], 0)
+        self.assertIn("claim.queue", summary)
+        self.assertGreater(report.throughput, 0)
+        self.assertTrue(report.conserved)
+    
+    def test_ledger_drift_is_reported(self):
+        """Test that a contract losing balance updates fails the run without errors."""
+        class LossyMarketplace(DigitalMarketplace):
+            def _confirm_withdrawal(self, tx_id, sender_address, token_amount, *args):
+                # Debits the user but never credits the creator
+                result = super()._confirm_withdrawal(tx_id, sender_address, token_amount, *args)
+                self.token_holders[self.creator_address] -= token_amount
+                return result
+        
+        load_test = LoadTest(LocalAlgodClient(), users=2, rate=100, duration=0.2,
+                             mix={"withdraw": 1}, rng=random.Random(4),
+                             contract_factory=lambda *a: LossyMarketplace(*a, "loadtest"))
+        report = load_test.run()
+        
+        self.assertGreater(report.completed, 0)
+        self.assertEqual(report.summary()["withdraw"]["errors"], 0)
+        self.assertFalse(report.conserved)
+        self.assertEqual(report.drift, -report.completed * 10 ** 8)
+    
+    def test_node_errors_are_counted(self):
+        """Test that failed submissions show up as errors."""
+        client = LocalAlgodClient(error_rate=1.0)
+        load_test = LoadTest(client, users=2, rate=100, duration=0.2,
+                             mix={"withdraw": 1}, rng=random.Random(3))
+        # Token creation must succeed before errors are injected
+        client.error_rate = 0.0
+        load_test.contract = load_test._setup()
+        client.error_rate = 1.0
+        
+        report = load_test.run()
+        
+        self.assertEqual(report.completed, 0)
+        self.assertGreater(report.summary()["withdraw"]["errors"], 0)
+        self.assertEqual(report.summary()["withdraw"]["error_rate"], 1.0)
+    
+    def test_parse_mix(self):
+        """Test parsing operation weights."""
+        self.assertEqual(parse_mix("deposit=5, claim=1"), {"deposit": 5.0, "claim": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("transfer=1")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Tests for bulk account onboarding.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from algosdk import account
+from algosdk.error import AlgodHTTPError, ConfirmationTimeoutError
+from algosdk.future import transaction
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.liquidity import CreatorLiquidity
+from digital_marketplace.onboarding import (
+    BulkOnboarder,
+    STATUS_CONFIRMED,
+    STATUS_FAILED,
+    STATUS_UNCONFIRMED
+)
+
+class TestBulkOnboarder(unittest.TestCase):
+    """Test cases for the bulk onboarding pipeline."""
+    
+    def setUp(self):
+        """Set up a contract with a mock client and real test accounts."""
+        self.mock_client = MagicMock()
+        self.mock_client.suggested_params.return_value = transaction.SuggestedParams(
+            fee=1000, first=1, last=1000, gh="SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+            gen="testnet-v1.0", flat_fee=True, min_fee=1000
+        )
+        self.mock_client.send_transactions.side_effect = lambda signed: signed[0].get_txid()
+        
+        creator_key, creator_address = account.generate_account()
+        self.contract = DigitalMarketplace(self.mock_client, creator_address, creator_key, "handle")
+        self.contract.asset_id = 12345
+        
+        self.accounts = [
+            (address, key) for key, address in (account.generate_account() for _ in range(20))
+        ]
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_groups_are_maximal_and_fee_pooled(self, mock_wait_for_confirmation):
+        """Test that accounts are packed eight per group with pooled fees."""
+        report = BulkOnboarder(self.contract).run(self.accounts)
+        
+        groups = [call.args[0] for call in self.mock_client.send_transactions.call_args_list]
+        self.assertEqual([len(g) for g in groups], [16, 16, 8])
+        
+        funding, opt_in = groups[0][0].transaction, groups[0][1].transaction
+        self.assertEqual(funding.sender, self.contract.creator_address)
+        self.assertEqual(funding.fee, 2000)
+        self.assertEqual(opt_in.fee, 0)
+        self.assertEqual(opt_in.receiver, opt_in.sender)
+        self.assertEqual(report.count(STATUS_CONFIRMED), 20)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_failed_group_reported(self, mock_wait_for_confirmation):
+        """Test that a rejected group marks only its own accounts failed."""
+        self.mock_client.send_transactions.side_effect = [
+            AlgodHTTPError("overspend", 400), "TX_ID", "TX_ID"
+        ]
+        
+        report = BulkOnboarder(self.contract).run(self.accounts)
+        
+        self.assertEqual(report.summary(), {STATUS_FAILED: 8, STATUS_CONFIRMED: 12})
+        self.assertEqual(report.status[self.accounts[0][0]], STATUS_FAILED)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_resume_from_checkpoint(self, mock_wait_for_confirmation):
+        """Test that a resumed run skips accounts already onboarded."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "onboarding.jsonl")
+            
+            BulkOnboarder(self.contract, checkpoint_path=path).run(self.accounts[:10])
+            self.mock_client.send_transactions.reset_mock()
+            
+            report = BulkOnboarder(self.contract, checkpoint_path=path).run(self.accounts)
+        
+        groups = [call.args[0] for call in self.mock_client.send_transactions.call_args_list]
+        self.assertEqual(sum(len(g) for g in groups), 20)
+        self.assertEqual(report.count(STATUS_CONFIRMED), 20)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_params_fetched_per_group(self, mock_wait_for_confirmation):
+        """Test that every group is built on freshly fetched params."""
+        BulkOnboarder(self.contract).run(self.accounts)
+        
+        self.assertEqual(self.mock_client.suggested_params.call_count, 3)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_timed_out_group_not_funded_twice(self, mock_wait_for_confirmation):
+        """Test that a group that timed out is verified before it is retried."""
+        mock_wait_for_confirmation.side_effect = ConfirmationTimeoutError("timed out")
+        self.mock_client.account_info.return_value = {"assets": []}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "onboarding.jsonl")
+            
+            report = BulkOnboarder(self.contract, checkpoint_path=path).run(self.accounts[:8])
+            self.assertEqual(report.count(STATUS_UNCONFIRMED), 8)
+            self.mock_client.send_transactions.reset_mock()
+            
+            # Still within the group's validity window: it may yet land
+            self.mock_client.status.return_value = {"last-round": 1000}
+            report = BulkOnboarder(self.contract, checkpoint_path=path).run(self.accounts[:8])
+            self.assertEqual(report.count(STATUS_UNCONFIRMED), 8)
+            self.mock_client.send_transactions.assert_not_called()
+            
+            # It landed after all
+            self.mock_client.account_info.return_value = {"assets": [{"asset-id": 12345}]}
+            report = BulkOnboarder(self.contract, checkpoint_path=path).run(self.accounts[:8])
+            self.assertEqual(report.count(STATUS_CONFIRMED), 8)
+            self.mock_client.send_transactions.assert_not_called()
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_expired_group_retried(self, mock_wait_for_confirmation):
+        """Test that a group that can no longer land is sent again."""
+        mock_wait_for_confirmation.side_effect = [ConfirmationTimeoutError("timed out"), None]
+        self.mock_client.account_info.return_value = {"assets": []}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "onboarding.jsonl")
+            
+            BulkOnboarder(self.contract, checkpoint_path=path).run(self.accounts[:8])
+            self.mock_client.send_transactions.reset_mock()
+            
+            self.mock_client.status.return_value = {"last-round": 1001}
+            report = BulkOnboarder(self.contract, checkpoint_path=path).run(self.accounts[:8])
+        
+        self.assertEqual(self.mock_client.send_transactions.call_count, 1)
+        self.assertEqual(report.count(STATUS_CONFIRMED), 8)
+    
+    def track_liquidity(self, amount):
+        """Track the creator's liquidity over a mocked account holding ``amount``."""
+        self.mock_client.status.return_value = {"last-round": 1}
+        self.mock_client.account_info.return_value = {
+            "round": 1, "amount": amount, "min-balance": 100_000, "assets": []
+        }
+        self.contract.liquidity = CreatorLiquidity(self.mock_client, self.contract.creator_address,
+                                                   asset_id=12345)
+        return self.contract.liquidity
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_funding_reserved_from_liquidity(self, mock_wait_for_confirmation):
+        """Test that groups the creator cannot fund are rejected before sending."""
+        liquidity = self.track_liquidity(2_000_000)
+        
+        report = BulkOnboarder(self.contract).run(self.accounts)
+        
+        # Only the first group of eight fits: 8 * (200_000 funding + 2 * 1000 fees)
+        self.assertEqual(self.mock_client.send_transactions.call_count, 1)
+        self.assertEqual(report.summary(), {STATUS_CONFIRMED: 8, STATUS_FAILED: 12})
+        self.assertEqual(liquidity.reserved_algo, 0)
+        self.assertEqual(liquidity.algo, 2_000_000 - 1_616_000)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_timed_out_funding_stays_reserved(self, mock_wait_for_confirmation):
+        """Test that a group whose confirmation timed out keeps its funding reserved."""
+        mock_wait_for_confirmation.side_effect = ConfirmationTimeoutError("timed out")
+        liquidity = self.track_liquidity(2_000_000)
+        
+        report = BulkOnboarder(self.contract).run(self.accounts[:8])
+        
+        self.assertEqual(report.count(STATUS_UNCONFIRMED), 8)
+        self.assertEqual(liquidity.reserved_algo, 1_616_000)
+        self.assertEqual(liquidity._held[0].last_valid, 1000)
+    
+    @patch("algosdk.future.transaction.wait_for_confirmation")
+    def test_rejected_funding_released(self, mock_wait_for_confirmation):
+        """Test that a group the node rejects returns its reservation."""
+        self.mock_client.send_transactions.side_effect = AlgodHTTPError("overspend", 400)
+        liquidity = self.track_liquidity(2_000_000)
+        
+        report = BulkOnboarder(self.contract).run(self.accounts[:8])
+        
+        self.assertEqual(report.count(STATUS_FAILED), 8)
+        self.assertEqual(liquidity.reserved_algo, 0)
+        self.assertEqual(liquidity.algo, 2_000_000)
+
+if __name__ == "__main__":
+    unittest.main()
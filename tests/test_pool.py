@@ -0,0 +1,81 @@
+"""
+Tests for the algod client pool.
+"""
+import unittest
+from unittest.mock import MagicMock
+
+from algosdk.error import AlgodHTTPError
+from algosdk.v2client import algod
+
+from digital_marketplace.pool import AlgodClientPool, NoHealthyNodeError
+
+class TestAlgodClientPool(unittest.TestCase):
+    """Test cases for the algod client pool."""
+
+    def setUp(self):
+        """Set up test environment before each test."""
+        self.primary = MagicMock()
+        self.secondary = MagicMock()
+        self.primary.status.return_value = {"last-round": 100}
+        self.secondary.status.return_value = {"last-round": 100}
+        self.pool = AlgodClientPool(
+            [self.primary, self.secondary],
+            names=["primary", "secondary"]
+        )
+
+    def test_reads_go_to_lowest_latency_node(self):
+        """Test that reads are routed to the fastest healthy node."""
+        self.pool.check_health()
+        self.pool.nodes[0].latency = 0.200
+        self.pool.nodes[1].latency = 0.010
+        self.secondary.asset_info.return_value = {"index": 1}
+
+        self.assertEqual(self.pool.asset_info(1), {"index": 1})
+        self.primary.asset_info.assert_not_called()
+
+    def test_lagging_node_marked_unhealthy(self):
+        """Test that a node trailing the others is excluded from reads."""
+        self.secondary.status.return_value = {"last-round": 90}
+
+        health = self.pool.check_health()
+
+        self.assertEqual(health, {"primary": True, "secondary": False})
+
+    def test_submissions_fail_over(self):
+        """Test that submissions move to another node when the primary fails."""
+        self.primary.send_transactions.side_effect = AlgodHTTPError("unavailable", 503)
+        self.secondary.send_transactions.return_value = "TX_ID"
+
+        self.assertEqual(self.pool.send_transactions(["STXN"]), "TX_ID")
+        self.assertEqual(self.pool.primary.name, "secondary")
+
+    def test_unreachable_primary_fails_over(self):
+        """Test failover on the URLError raised when a node is down."""
+        down = algod.AlgodClient("a" * 64, "http://127.0.0.1:9")
+        pool = AlgodClientPool([down, self.secondary], names=["down", "secondary"])
+        self.secondary.send_raw_transaction.return_value = "TX_ID"
+
+        self.assertEqual(pool.status(), {"last-round": 100})
+        self.assertEqual(pool.send_raw_transaction("AA=="), "TX_ID")
+        self.assertEqual(pool.primary.name, "secondary")
+        self.assertFalse(pool.nodes[0].healthy)
+
+    def test_rejected_submission_not_failed_over(self):
+        """Test that a rejected transaction is not resent to other nodes."""
+        self.primary.send_transaction.side_effect = AlgodHTTPError("overspend", 400)
+
+        with self.assertRaises(AlgodHTTPError):
+            self.pool.send_transaction("STXN")
+
+        self.secondary.send_transaction.assert_not_called()
+
+    def test_all_nodes_down(self):
+        """Test the error raised when no node can serve a read."""
+        self.primary.status.side_effect = ConnectionError()
+        self.secondary.status.side_effect = ConnectionError()
+
+        with self.assertRaises(NoHealthyNodeError):
+            self.pool.status()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests for the sampling profiler hooks.
+"""
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+import unittest
+
+from digital_marketplace.profiling import SamplingProfiler
+
+class Worker:
+    """Stand-in for a contract with a slow and an allocating method."""
+    
+    def slow(self):
+        time.sleep(0.05)
+        return "done"
+    
+    def allocate(self):
+        return [bytearray(1024) for _ in range(100)]
+
+class TestSamplingProfiler(unittest.TestCase):
+    """Test cases for opt-in sampling of method calls."""
+    
+    def test_detach_restores_methods(self):
+        """Test that nothing stays wrapped once the profiler is detached."""
+        worker = Worker()
+        profiler = SamplingProfiler(sample_rate=1.0)
+        
+        profiler.attach(worker, ["slow"])
+        self.assertIn("slow", vars(worker))
+        profiler.detach()
+        
+        self.assertNotIn("slow", vars(worker))
+        self.assertFalse(profiler.attached)
+        self.assertIs(Worker.slow, vars(Worker)["slow"])
+    
+    def test_samples_stacks_of_profiled_calls(self):
+        """Test that a profiled call's stack is sampled and written collapsed."""
+        worker = Worker()
+        with SamplingProfiler(sample_rate=1.0, interval=0.002) as profiler:
+            profiler.attach(worker, ["slow"])
+            self.assertEqual(worker.slow(), "done")
+        
+        self.assertEqual(profiler.profiled["slow"], 1)
+        self.assertTrue(any(stack.startswith("slow;") and "test_profiling.py:slow" in stack
+                            for stack in profiler.stacks))
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stacks.txt")
+            written = profiler.write_collapsed(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(len(lines), written)
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+    
+    def test_sample_rate_zero_skips_profiling(self):
+        """Test that unsampled calls are only counted."""
+        worker = Worker()
+        with SamplingProfiler(sample_rate=0.0) as profiler:
+            profiler.attach(worker, ["slow"])
+            worker.slow()
+        
+        self.assertEqual(profiler.calls["slow"], 1)
+        self.assertEqual(profiler.profiled["slow"], 0)
+        self.assertFalse(profiler.stacks)
+    
+    def test_allocation_snapshots(self):
+        """Test that tracemalloc records a profiled call's allocations."""
+        worker = Worker()
+        with SamplingProfiler(sample_rate=1.0, trace_allocations=True) as profiler:
+            profiler.attach(worker, ["allocate"])
+            kept = worker.allocate()
+        
+        self.assertEqual(len(kept), 100)
+        self.assertFalse(tracemalloc.is_tracing())
+        allocated = sum(size for stack, size in profiler.allocations.items()
+                        if "test_profiling.py" in stack)
+        self.assertGreaterEqual(allocated, 100 * 1024)
+    
+    def test_memory_live_before_call_not_charged(self):
+        """Test that only growth during the call is charged when already tracing."""
+        worker = Worker()
+        tracemalloc.start()
+        try:
+            before = [bytearray(1024) for _ in range(500)]
+            with SamplingProfiler(sample_rate=1.0, trace_allocations=True) as profiler:
+                profiler.attach(worker, ["allocate"])
+                kept = worker.allocate()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        
+        self.assertEqual((len(before), len(kept)), (500, 100))
+        allocated = sum(size for stack, size in profiler.allocations.items()
+                        if "test_profiling.py" in stack)
+        self.assertGreaterEqual(allocated, 100 * 1024)
+        self.assertLess(allocated, 500 * 1024)
+    
+    def test_calls_counted_across_threads(self):
+        """Test that concurrent calls are all counted."""
+        worker = Worker()
+        with SamplingProfiler(sample_rate=0.0) as profiler:
+            profiler.attach(Worker, ["allocate"])
+            threads = [threading.Thread(target=lambda: [worker.allocate() for _ in range(50)])
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(profiler.calls["allocate"], 200)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for hash-bucket reconciliation.
+"""
+import unittest
+from unittest.mock import MagicMock
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.reconcile import (
+    BucketDigests,
+    ChainSnapshot,
+    Reconciler,
+    indexer_balances
+)
+
+class TestReconciliation(unittest.TestCase):
+    """Test cases for bucket digests and reconciliation."""
+    
+    def setUp(self):
+        """Set up a contract whose ledger matches the chain."""
+        self.contract = DigitalMarketplace(MagicMock(), "CREATOR", "KEY", "handle")
+        self.chain = {f"HOLDER_{i}": (i + 1) * 100 for i in range(500)}
+        for address, balance in self.chain.items():
+            self.contract._set_balance("seed", address, balance)
+    
+    def test_incremental_digests_match_rebuild(self):
+        """Test that O(1) updates agree with digesting from scratch."""
+        digests = BucketDigests.from_balances(self.chain.items(), buckets=64)
+        digests.update("HOLDER_1", 200, 0)
+        digests.update("NEW", 0, 5)
+        
+        expected = dict(self.chain)
+        del expected["HOLDER_1"]
+        expected["NEW"] = 5
+        self.assertEqual(digests.digests, BucketDigests.from_balances(expected.items(), 64).digests)
+    
+    def test_only_mismatching_buckets_are_diffed(self):
+        """Test that a drifted balance is found by diffing one bucket."""
+        reconciler = Reconciler(self.contract, buckets=64)
+        self.assertTrue(reconciler.reconcile(ChainSnapshot(self.chain.items(), 64)).consistent)
+        
+        self.contract._set_balance("deposit", "HOLDER_7", 1)
+        self.contract._set_balance("deposit", "HOLDER_8", 0)
+        source = MagicMock(wraps=ChainSnapshot(self.chain.items(), 64))
+        report = reconciler.reconcile(source)
+        
+        self.assertEqual(report.differences, {"HOLDER_7": (1, 800), "HOLDER_8": (0, 900)})
+        self.assertLessEqual(len(report.mismatched), 2)
+        self.assertEqual(source.bucket_balances.call_count, len(report.mismatched))
+        reconciler.close()
+    
+    def test_digests_follow_every_change(self):
+        """Test that balance changes update the tracked digests without a rescan."""
+        reconciler = Reconciler(self.contract, buckets=16)
+        for i in range(5):
+            self.contract._set_balance("deposit", f"HOLDER_{i}", self.chain[f"HOLDER_{i}"] + 1)
+        self.contract._set_balance("withdraw", "HOLDER_9", 0)
+        
+        expected = BucketDigests.from_balances(self.contract.token_holders.items(), 16)
+        self.assertEqual(reconciler.local.digests, expected.digests)
+        self.assertNotIn("HOLDER_9", set().union(*reconciler.local.members))
+        
+        # Only the addresses of mismatching buckets are read, never the whole ledger
+        self.contract.token_holders = MagicMock(wraps=self.contract.token_holders)
+        report = reconciler.reconcile(ChainSnapshot(self.chain.items(), 16))
+        self.assertEqual(len(report.differences), 6)
+        self.contract.token_holders.items.assert_not_called()
+        self.assertLessEqual(self.contract.token_holders.get.call_count,
+                             sum(len(reconciler.local.members[b]) for b in report.mismatched))
+        reconciler.close()
+        self.assertIsNone(self.contract.bucket_index)
+    
+    def test_rebuild_after_ledger_replaced(self):
+        """Test that rebuild digests a ledger assigned wholesale."""
+        reconciler = Reconciler(self.contract, buckets=16)
+        self.contract.token_holders = {"OTHER": 1}
+        
+        reconciler.rebuild()
+        
+        self.assertEqual(reconciler.rebuilds, 1)
+        self.assertEqual(reconciler.local.digests,
+                         BucketDigests.from_balances([("OTHER", 1)], 16).digests)
+        self.assertTrue(reconciler.reconcile(ChainSnapshot([("OTHER", 1)], 16)).consistent)
+        reconciler.close()
+    
+    def test_indexer_pagination(self):
+        """Test streaming asset balances across indexer pages."""
+        indexer = MagicMock()
+        indexer.asset_balances.side_effect = [
+            {"balances": [{"address": "A", "amount": 1}], "next-token": "t1"},
+            {"balances": [{"address": "B", "amount": 2}]},
+        ]
+        
+        self.assertEqual(list(indexer_balances(indexer, 42, page_size=1)), [("A", 1), ("B", 2)])
+        indexer.asset_balances.assert_called_with(42, limit=1, next_page="t1")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for the operation log replay engine.
+"""
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from digital_marketplace import utils
+from digital_marketplace.metrics import percentile
+from digital_marketplace.replay import ReplayEngine, iter_log
+from digital_marketplace.simulator import LocalAlgodClient
+
+RECORDS = [
+    {"ts": 1700000000.0, "op": "deposit", "address": "ALICE", "amount": 60_000_000_000},
+    {"ts": 1700000010.0, "op": "deposit", "address": "BOB", "amount": 5_000_000},
+    {"ts": 1700000020.0, "op": "withdraw", "address": "BOB", "amount": 10 ** 12},
+    {"ts": 1700086500.0, "op": "stake-run"},
+    {"ts": 1700086560.0, "op": "claim", "address": "ALICE"},
+]
+
+class TestReplayEngine(unittest.TestCase):
+    """Test cases for the replay engine."""
+    
+    def test_replay_from_log(self):
+        """Test replaying a log file at maximum speed."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ops.jsonl")
+            with open(path, "w") as f:
+                f.write("\n".join(json.dumps(r) for r in RECORDS) + "\n")
+            
+            engine = ReplayEngine(LocalAlgodClient())
+            report = engine.run(iter_log(path))
+        
+        summary = report.summary()
+        self.assertEqual(report.operations, 5)
+        self.assertEqual(summary["deposit"]["count"], 2)
+        self.assertEqual(summary["withdraw"]["errors"], 1)
+        self.assertEqual(summary["claim"]["count"], 1)
+        self.assertEqual(len(report.digest), 64)
+    
+    def test_replay_is_deterministic(self):
+        """Test that two replays of the same log reach the same ledger."""
+        first = ReplayEngine(LocalAlgodClient()).run(RECORDS)
+        second = ReplayEngine(LocalAlgodClient()).run(RECORDS)
+        
+        self.assertEqual(first.digest, second.digest)
+    
+    def test_clock_follows_log(self):
+        """Test that staking sees the log's timestamps instead of wall time."""
+        engine = ReplayEngine(LocalAlgodClient())
+        engine.run(RECORDS[:1] + [{"ts": 1700050000.0, "op": "stake-run"}])
+        
+        alice, _ = engine.accounts.get("ALICE")
+        self.assertEqual(engine.contract.get_staking_rewards(alice), 0)
+        
+        engine.run([{"ts": 1700086400.0, "op": "stake-run"}])
+        self.assertGreater(engine.contract.get_staking_rewards(alice), 0)
+    
+    def test_scaled_speed_waits(self):
+        """Test that scaled replay waits for each operation's offset."""
+        delays = []
+        engine = ReplayEngine(LocalAlgodClient(), speed=10.0, sleep=delays.append)
+        
+        engine.run(RECORDS[:2])
+        
+        self.assertEqual(len(delays), 1)
+        self.assertAlmostEqual(delays[0], 1.0, delta=0.1)
+    
+    def test_replay_leaves_process_state_alone(self):
+        """Test that a replay neither pins the shared price nor swallows stdout."""
+        price_cache = dict(utils._algo_price_cache)
+        price_last_update = utils._algo_price_last_update
+        engine = ReplayEngine(LocalAlgodClient(), algo_price=0.5)
+        output = io.StringIO()
+        
+        with redirect_stdout(output):
+            engine.run(RECORDS)
+            print("after replay")
+        
+        self.assertEqual(output.getvalue(), "after replay\n")
+        self.assertEqual(engine.contract._algo_price(), 0.5)
+        self.assertEqual(utils._algo_price_cache, price_cache)
+        self.assertEqual(utils._algo_price_last_update, price_last_update)
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        samples = list(range(1, 101))
+        
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Tests for the transaction submission scheduler.
+"""
+import random
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from algosdk.error import AlgodHTTPError
+from algosdk.v2client import algod
+
+from digital_marketplace.scheduler import (
+    SubmissionScheduler,
+    TokenBucket,
+    TransactionExpiredError,
+    is_retryable,
+    LANE_WITHDRAWAL,
+    LANE_DEPOSIT,
+    LANE_REWARD
+)
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for the token bucket."""
+
+    def test_burst_then_refill(self):
+        """Test that the bucket allows a burst and then refills at the rate."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+        for _ in range(3):
+            self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+
+        clock.now = 0.5
+        self.assertEqual(bucket.try_acquire(), 0)
+
+class TestSubmissionScheduler(unittest.TestCase):
+    """Test cases for the submission scheduler."""
+
+    def setUp(self):
+        """Set up test environment before each test."""
+        self.mock_client = MagicMock()
+        self.mock_client.status.return_value = {"last-round": 10}
+        self.scheduler = SubmissionScheduler(
+            self.mock_client,
+            rate=1000,
+            burst=1000,
+            base_delay=0.001,
+            max_delay=0.002,
+            rng=random.Random(0)
+        )
+
+    def tearDown(self):
+        """Stop the dispatcher after each test."""
+        self.scheduler.close()
+
+    def test_is_retryable(self):
+        """Test classification of submission errors."""
+        self.assertTrue(is_retryable(AlgodHTTPError("rate limited", 429)))
+        self.assertTrue(is_retryable(AlgodHTTPError("unavailable", 503)))
+        self.assertTrue(is_retryable(ConnectionError()))
+        self.assertFalse(is_retryable(AlgodHTTPError("overspend", 400)))
+
+    def test_unreachable_node_is_retryable(self):
+        """Test that the URLError algosdk raises for a down node is retried."""
+        client = algod.AlgodClient("a" * 64, "http://127.0.0.1:9")
+        with self.assertRaises(Exception) as context:
+            client.status()
+        self.assertTrue(is_retryable(context.exception))
+
+    def test_rate_limit_per_pool_node(self):
+        """Test that each node of a pool gets its own token bucket."""
+        self.mock_client.primary.name = "node-a"
+        self.mock_client.send_transaction.return_value = "TX_ID"
+        self.scheduler.send("STXN", LANE_DEPOSIT, timeout=5)
+
+        self.mock_client.primary.name = "node-b"
+        self.scheduler.send("STXN", LANE_DEPOSIT, timeout=5)
+
+        self.assertIs(self.scheduler._bucket(), self.scheduler._node_buckets["node-b"])
+        self.mock_client.primary.name = "node-a"
+        self.assertIs(self.scheduler._bucket(), self.scheduler.bucket)
+
+    def test_retry_then_succeed(self):
+        """Test that a rate-limited submission is retried."""
+        self.mock_client.send_transactions.side_effect = [
+            AlgodHTTPError("rate limited", 429),
+            "TX_ID"
+        ]
+
+        tx_id = self.scheduler.send(["STXN"], LANE_DEPOSIT, last_valid=100, timeout=5)
+
+        self.assertEqual(tx_id, "TX_ID")
+        self.assertEqual(self.mock_client.send_transactions.call_count, 2)
+
+    def test_non_retryable_error_raised(self):
+        """Test that a rejected submission is not retried."""
+        self.mock_client.send_transaction.side_effect = AlgodHTTPError("overspend", 400)
+
+        with self.assertRaises(AlgodHTTPError):
+            self.scheduler.send("STXN", LANE_REWARD, timeout=5)
+
+        self.mock_client.send_transaction.assert_called_once()
+
+    def test_expired_transaction_not_retried(self):
+        """Test that nothing is retried past its last valid round."""
+        self.mock_client.send_transaction.side_effect = AlgodHTTPError("unavailable", 503)
+        self.mock_client.status.return_value = {"last-round": 101}
+
+        with self.assertRaises(TransactionExpiredError):
+            self.scheduler.send("STXN", LANE_DEPOSIT, last_valid=100, timeout=5)
+
+        self.mock_client.send_transaction.assert_called_once()
+
+    def test_lane_priority(self):
+        """Test that withdrawals are sent before queued reward payouts."""
+        started = threading.Event()
+        gate = threading.Event()
+        sent = []
+
+        def send_transaction(stxn):
+            started.set()
+            gate.wait(5)
+            sent.append(stxn)
+            return stxn
+
+        self.mock_client.send_transaction.side_effect = send_transaction
+
+        # The first payout blocks the dispatcher while the others are queued
+        first = self.scheduler.submit("REWARD_1", LANE_REWARD)
+        started.wait(5)
+        futures = [
+            self.scheduler.submit("REWARD_2", LANE_REWARD),
+            self.scheduler.submit("DEPOSIT", LANE_DEPOSIT),
+            self.scheduler.submit("WITHDRAWAL", LANE_WITHDRAWAL)
+        ]
+        gate.set()
+
+        first.result(5)
+        for future in futures:
+            future.result(5)
+
+        self.assertEqual(sent, ["REWARD_1", "WITHDRAWAL", "DEPOSIT", "REWARD_2"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Tests for the read-only HTTP service.
+"""
+import asyncio
+import json
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from digital_marketplace.config import DECIMALS, MarketplaceConfig
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.service import ReadService
+from digital_marketplace.utils import PriceOracle
+
+class TestReadService(unittest.TestCase):
+    """Test cases for cached, coalesced reads."""
+    
+    def setUp(self):
+        """Set up a service over a contract with a few holders."""
+        self.algod_client = MagicMock()
+        self.contract = DigitalMarketplace(self.algod_client, "CREATOR", "KEY", "handle")
+        self.contract.asset_id = 42
+        self.contract._set_balance("seed", "ALICE", 500)
+        self.contract._set_reward("seed", "ALICE", 9)
+        self.service = ReadService(self.contract)
+    
+    def request(self, target, method="GET", headers=None, body=b""):
+        """Run one request through the handler."""
+        return asyncio.run(self.service.handle(method, target, headers or {}, body))
+    
+    def test_balance_etag_follows_ledger_version(self):
+        """Test conditional reads before and after a ledger change."""
+        status, headers, body = self.request("/balances/ALICE")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["balance"], 500)
+        
+        status, _, _ = self.request("/balances/ALICE", headers={"if-none-match": headers["ETag"]})
+        self.assertEqual(status, 304)
+        self.assertEqual(self.service.cache_hits, 1)
+        
+        self.contract._set_balance("deposit", "BOB", 1)
+        status, new_headers, _ = self.request("/balances/ALICE",
+                                              headers={"if-none-match": headers["ETag"]})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(new_headers["ETag"], headers["ETag"])
+    
+    def test_batch_endpoints(self):
+        """Test GET and POST batch balance reads."""
+        _, _, body = self.request("/balances?addresses=ALICE,BOB")
+        balances = json.loads(body)["balances"]
+        self.assertEqual(balances["ALICE"], {"balance": 500, "pending_rewards": 9})
+        self.assertEqual(balances["BOB"], {"balance": 0, "pending_rewards": 0})
+        
+        _, _, body = self.request("/balances", "POST", body=b'{"addresses": ["ALICE"]}')
+        self.assertEqual(json.loads(body)["balances"]["ALICE"]["balance"], 500)
+        
+        self.service.max_batch = 1
+        status, _, _ = self.request("/balances?addresses=ALICE,BOB")
+        self.assertEqual(status, 413)
+    
+    def test_post_bodies_get_distinct_etags(self):
+        """Test that a different POST body at the same URL is not a 304."""
+        _, headers, _ = self.request("/balances", "POST", body=b'{"addresses": ["ALICE"]}')
+        
+        status, other_headers, body = self.request(
+            "/balances", "POST", headers={"if-none-match": headers["ETag"]},
+            body=b'{"addresses": ["BOB"]}'
+        )
+        
+        self.assertEqual(status, 200)
+        self.assertIn("BOB", json.loads(body)["balances"])
+        self.assertNotEqual(other_headers["ETag"], headers["ETag"])
+    
+    def test_concurrent_upstream_reads_are_coalesced(self):
+        """Test that identical token info requests share one node call."""
+        def slow_asset_info(asset_id):
+            time.sleep(0.05)
+            return {"index": asset_id}
+        self.algod_client.asset_info.side_effect = slow_asset_info
+        
+        async def burst():
+            return await asyncio.gather(*(
+                self.service.handle("GET", "/token", {}) for _ in range(20)
+            ))
+        
+        responses = asyncio.run(burst())
+        
+        self.assertTrue(all(status == 200 for status, _, _ in responses))
+        self.assertEqual(json.loads(responses[0][2])["info"], {"index": 42})
+        self.assertEqual(self.algod_client.asset_info.call_count, 1)
+        
+        # Served from the micro-cache within the TTL
+        self.request("/token")
+        self.assertEqual(self.algod_client.asset_info.call_count, 1)
+    
+    @patch('digital_marketplace.utils.get_algo_price_usdt', return_value=0.2)
+    def test_quotes_and_errors(self, mock_price):
+        """Test quote endpoints and error statuses."""
+        status, _, body = self.request("/quote/deposit?amount=1000000")
+        self.assertEqual(status, 200)
+        self.assertGreater(json.loads(body)["tokens"], 0)
+        
+        self.assertEqual(self.request("/quote/withdrawal?amount=x")[0], 400)
+        self.assertEqual(self.request("/missing")[0], 404)
+        self.assertEqual(self.request("/token", "DELETE")[0], 405)
+    
+    def test_quotes_use_marketplace_config_and_oracle(self):
+        """Test that quotes apply the marketplace's own fee and price."""
+        contract = DigitalMarketplace(self.algod_client, "CREATOR", "KEY", "handle",
+                                      config=MarketplaceConfig(fixed_fee_usdt=1.0),
+                                      price_oracle=PriceOracle(fetch=lambda: 0.5))
+        service = ReadService(contract)
+        
+        _, _, body = asyncio.run(service.handle("GET", "/quote/deposit?amount=10000000", {}))
+        # 10 ALGO is 5 USDT, less the 1 USDT fee
+        self.assertEqual(json.loads(body)["tokens"], 4 * (10 ** DECIMALS))
+        target = f"/quote/withdrawal?amount={3 * 10 ** DECIMALS}"
+        _, _, body = asyncio.run(service.handle("GET", target, {}))
+        self.assertEqual(json.loads(body)["algo"], 4_000_000)
+    
+    def test_http_round_trip(self):
+        """Test keep-alive requests over a real socket."""
+        async def exchange():
+            server = await self.service.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            bodies = []
+            for _ in range(2):
+                writer.write(b"GET /balances/ALICE HTTP/1.1\r\nHost: test\r\n\r\n")
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+                bodies.append(await reader.readexactly(length))
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return head, bodies
+        
+        head, bodies = asyncio.run(exchange())
+        
+        self.assertTrue(head.startswith(b"HTTP/1.1 200 OK"))
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(json.loads(bodies[0])["pending_rewards"], 9)
+    
+    def test_invalid_content_length_rejected(self):
+        """Test that a malformed or negative Content-Length gets a 400."""
+        async def exchange(length):
+            server = await self.service.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /balances HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return response
+        
+        for length in (b"-1", b"abc", b"1_0"):
+            response = asyncio.run(exchange(length))
+            self.assertTrue(response.startswith(b"HTTP/1.1 400 Bad Request"), response)
+            self.assertIn(b"Connection: close", response)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for sharded staking reward computation.
+"""
+import unittest
+from types import MappingProxyType
+from unittest.mock import patch
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.config import DECIMALS, STAKING_THRESHOLD_USDT
+from digital_marketplace.sharding import (
+    layout_holders,
+    shard_of,
+    sharded_staking_rewards
+)
+
+class TestSharding(unittest.TestCase):
+    """Test cases for sharded staking."""
+    
+    def setUp(self):
+        """Set up a ledger with eligible and ineligible holders."""
+        threshold = STAKING_THRESHOLD_USDT * (10 ** DECIMALS)
+        self.token_holders = {
+            f"HOLDER_{i}": threshold // 2 + i * 7_919_000_003 for i in range(200)
+        }
+    
+    def test_shard_of_is_stable(self):
+        """Test that addresses map to the same shard across processes."""
+        self.assertEqual(shard_of("HOLDER_0", 8), 1)
+        self.assertEqual(shard_of("HOLDER_1", 8), 7)
+        self.assertTrue(all(0 <= shard_of(a, 8) < 8 for a in self.token_holders))
+    
+    def test_layout_splits_ledger_order_evenly(self):
+        """Test that the staking layout keeps ledger order in even slices."""
+        for holders in (self.token_holders, MappingProxyType(self.token_holders)):
+            addresses, balances, bounds = layout_holders(holders, 8)
+            
+            self.assertEqual(addresses, list(self.token_holders))
+            self.assertEqual(list(balances), list(self.token_holders.values()))
+            self.assertEqual(bounds[0], (0, 25))
+            self.assertEqual(bounds[-1], (175, 200))
+    
+    def test_matches_sequential_calculation(self):
+        """Test that sharded rewards equal the single-process loop."""
+        contract = DigitalMarketplace(None, "CREATOR", "KEY", "handle")
+        contract.token_holders = dict(self.token_holders)
+        contract.last_staking_calculation = 0
+        
+        with patch("digital_marketplace.contract.get_current_timestamp") as mock_timestamp, \
+             patch("digital_marketplace.utils.get_algo_price_usdt") as mock_price:
+            mock_timestamp.return_value = 100000
+            mock_price.return_value = 0.25
+            contract.calculate_staking_rewards()
+        
+        sharded = sharded_staking_rewards(self.token_holders, 0.25, workers=2)
+        
+        self.assertTrue(sharded)
+        self.assertEqual(sharded, contract.staking_rewards)
+    
+    def test_contract_workers_option(self):
+        """Test that the contract merges sharded rewards into staking_rewards."""
+        contract = DigitalMarketplace(None, "CREATOR", "KEY", "handle")
+        contract.token_holders = dict(self.token_holders)
+        contract.staking_rewards = {"HOLDER_199": 5}
+        contract.last_staking_calculation = 0
+        
+        with patch("digital_marketplace.contract.get_current_timestamp") as mock_timestamp, \
+             patch("digital_marketplace.contract.get_algo_price_usdt") as mock_price:
+            mock_timestamp.return_value = 100000
+            mock_price.return_value = 0.25
+            contract.calculate_staking_rewards(workers=2)
+        
+        expected = sharded_staking_rewards(self.token_holders, 0.25, workers=1)
+        self.assertEqual(contract.staking_rewards["HOLDER_199"], expected["HOLDER_199"] + 5)
+        self.assertNotIn("HOLDER_0", contract.staking_rewards)
+
+if __name__ == "__main__":
+    unittest.main()
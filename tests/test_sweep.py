@@ -0,0 +1,185 @@
+"""
+Tests for the incremental staking sweep.
+"""
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from digital_marketplace.cli import load_state, save_state
+from digital_marketplace.config import DECIMALS, STAKING_THRESHOLD_USDT
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.sweep import StakingSweep, SweepJournal
+from digital_marketplace.tiering import TieredStore
+from digital_marketplace.utils import PriceOracle
+
+DAY = 86400
+
+class TestStakingSweep(unittest.TestCase):
+    """Test cases for time-budgeted, resumable staking sweeps."""
+    
+    def setUp(self):
+        """Set up holders, some eligible, a day after the last run."""
+        self.holders = {f"HOLDER{i}": (i + 1) * STAKING_THRESHOLD_USDT * (10 ** DECIMALS) // 3
+                        for i in range(7)}
+        self.expected = self._contract()
+        self.expected.calculate_staking_rewards()
+    
+    def _contract(self):
+        contract = DigitalMarketplace(MagicMock(), "CREATOR", None, "octocat",
+                                      clock=lambda: 2 * DAY,
+                                      price_oracle=PriceOracle(fetch=lambda: 0.2))
+        contract.last_staking_calculation = DAY
+        contract.token_holders = dict(self.holders)
+        return contract
+    
+    def _sweep(self, contract):
+        # Every timer read advances a second, so a zero budget ends each tick
+        # after one chunk
+        ticks = itertools.count()
+        return StakingSweep(contract, chunk_size=2, timer=lambda: float(next(ticks)))
+    
+    def test_ticks_credit_in_chunks(self):
+        """Test that a sweep spreads over ticks and completes only at the end."""
+        contract = self._contract()
+        sweep = self._sweep(contract)
+        
+        self.assertFalse(sweep.step(budget=0))
+        self.assertEqual(contract.staking_sweep["cursor"], "HOLDER1")
+        self.assertEqual(sweep.progress()["processed"], 2)
+        self.assertEqual(contract.last_staking_calculation, DAY)
+        
+        progress = sweep.run(budget=0)
+        
+        self.assertEqual(progress["ticks"], 4)
+        self.assertEqual(progress["processed"], 7)
+        self.assertEqual(progress["fraction"], 1.0)
+        self.assertEqual(sweep.latency.count("tick"), 4)
+        self.assertIsNone(contract.staking_sweep)
+        self.assertEqual(contract.last_staking_calculation, 2 * DAY)
+        self.assertEqual(contract.staking_rewards, self.expected.staking_rewards)
+        # Nothing is due until another day has passed
+        self.assertTrue(sweep.step())
+        self.assertEqual(contract.staking_rewards, self.expected.staking_rewards)
+    
+    def test_resumes_from_saved_state(self):
+        """Test that a sweep interrupted after a save never credits twice."""
+        contract = self._contract()
+        self._sweep(contract).step(budget=0)
+        self._sweep(contract).step(budget=0)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            save_state(contract, path)
+            # A chunk credited after the save is lost with the process
+            self._sweep(contract).step(budget=0)
+            restarted = self._contract()
+            load_state(restarted, path)
+        
+        self.assertEqual(restarted.staking_sweep["processed"], 4)
+        self._sweep(restarted).run(budget=0)
+        self.assertEqual(restarted.staking_rewards, self.expected.staking_rewards)
+        self.assertEqual(restarted.last_staking_calculation, 2 * DAY)
+    
+    def test_holders_added_after_begin_wait(self):
+        """Test that a resumed sweep credits only the holders present when it began."""
+        contract = self._contract()
+        self._sweep(contract).step(budget=0)
+        contract._set_balance("deposit", "LATE", STAKING_THRESHOLD_USDT * (10 ** DECIMALS))
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            save_state(contract, path)
+            restarted = self._contract()
+            load_state(restarted, path)
+        self._sweep(restarted).run(budget=0)
+        
+        self.assertNotIn("LATE", restarted.staking_rewards)
+        self.assertEqual(restarted.staking_rewards, self.expected.staking_rewards)
+    
+    def test_tiered_holders_are_not_promoted(self):
+        """Test that sweeping a tiered ledger leaves its hot tier alone."""
+        contract = self._contract()
+        store = TieredStore(":memory:", max_hot=2, evict_batch=1)
+        for address, balance in self.holders.items():
+            store[address] = balance
+        contract.token_holders = store
+        
+        self._sweep(contract).run(budget=0)
+        
+        self.assertEqual(store.promotions, 0)
+        self.assertEqual(contract.staking_rewards, self.expected.staking_rewards)
+        store.close()
+    
+    def test_tiered_eviction_during_begin(self):
+        """Test that a tiered ledger evicting while a sweep begins lists each holder once."""
+        contract = self._contract()
+        store = TieredStore(":memory:", max_hot=2, evict_batch=1)
+        for address, balance in self.holders.items():
+            store[address] = balance
+        contract.token_holders = store
+        scan = store._scan
+        
+        def scan_with_writes():
+            # Rewrite a holder after every page, evicting another from the hot tier
+            for i, item in enumerate(scan(page_size=2)):
+                yield item
+                if i % 2:
+                    address = f"HOLDER{i}"
+                    store[address] = self.holders[address]
+        
+        evictions = store.evictions
+        with patch.object(store, "_scan", scan_with_writes):
+            self.assertTrue(self._sweep(contract).begin())
+        
+        self.assertGreater(store.evictions, evictions)
+        self.assertEqual(contract.staking_sweep["holders"], sorted(self.holders))
+        self.assertEqual(contract.staking_sweep["total"], len(self.holders))
+        self._sweep(contract).run(budget=0)
+        self.assertEqual(contract.staking_rewards, self.expected.staking_rewards)
+        store.close()
+    
+    def test_journal_resumes_without_full_saves(self):
+        """Test that per-tick journal records restore an interrupted sweep."""
+        contract = self._contract()
+        sweep = self._sweep(contract)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state.json")
+            save_state(contract, path)
+            journal = SweepJournal(path + ".sweep")
+            self.assertTrue(sweep.begin())
+            journal.start(contract.staking_sweep)
+            for _ in range(2):
+                sweep.step(budget=0)
+                journal.record(sweep)
+            # A tick that was never journaled is lost with the process
+            sweep.step(budget=0)
+            
+            with open(journal.path) as f:
+                ticks = [json.loads(line) for line in f][1:]
+            restarted = self._contract()
+            load_state(restarted, path)
+            self.assertTrue(SweepJournal(journal.path).replay(restarted))
+            self.assertEqual(restarted.staking_sweep["processed"], 4)
+            self._sweep(restarted).run(budget=0)
+            # A journal of a completed sweep is ignored
+            self.assertFalse(journal.replay(restarted))
+        
+        self.assertTrue(all(len(tick["rewards"]) <= 2 for tick in ticks))
+        self.assertEqual(restarted.staking_rewards, self.expected.staking_rewards)
+        self.assertEqual(restarted.last_staking_calculation, 2 * DAY)
+    
+    def test_full_calculation_finishes_pending_sweep(self):
+        """Test that calculate_staking_rewards completes a sweep in progress."""
+        contract = self._contract()
+        self._sweep(contract).step(budget=0)
+        
+        contract.calculate_staking_rewards()
+        
+        self.assertIsNone(contract.staking_sweep)
+        self.assertEqual(contract.staking_rewards, self.expected.staking_rewards)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Tests for hot/cold tiered holder state.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.tiering import TieredStore, enable_tiering
+
+class TestTieredStore(unittest.TestCase):
+    """Test cases for the tiered mapping."""
+    
+    def setUp(self):
+        """Set up a store with a small hot tier."""
+        self.store = TieredStore(":memory:", max_hot=10, evict_batch=5)
+        for i in range(100):
+            self.store[f"ADDR_{i:03d}"] = i + 1
+    
+    def test_hot_tier_is_bounded(self):
+        """Test that least recently used addresses move to the cold tier."""
+        self.assertLessEqual(self.store.hot_size, 10)
+        self.assertEqual(len(self.store), 100)
+        self.assertEqual(self.store.hot_size + self.store.cold_size, 100)
+        self.assertIn("ADDR_000", self.store)
+    
+    def test_cold_entries_are_paged_in(self):
+        """Test that reading a cold address promotes it."""
+        self.assertEqual(self.store["ADDR_000"], 1)
+        self.assertEqual(self.store.promotions, 1)
+        self.assertIn("ADDR_000", self.store._hot)
+        self.assertEqual(self.store.get("MISSING", 0), 0)
+        self.assertEqual(len(self.store), 100)
+    
+    def test_zero_values_are_removed(self):
+        """Test that zeroed addresses leave both tiers."""
+        self.store["ADDR_000"] = 0
+        self.store["ADDR_099"] = 0
+        
+        self.assertNotIn("ADDR_000", self.store)
+        self.assertNotIn("ADDR_099", self.store)
+        self.assertEqual(len(self.store), 98)
+        with self.assertRaises(KeyError):
+            del self.store["ADDR_000"]
+    
+    def test_scans_do_not_promote(self):
+        """Test that items() covers both tiers without paging in."""
+        items = dict(self.store.items())
+        
+        self.assertEqual(items, {f"ADDR_{i:03d}": i + 1 for i in range(100)})
+        self.assertEqual(sum(self.store.values()), sum(range(1, 101)))
+        self.assertEqual(self.store.promotions, 0)
+    
+    def test_flush_persists_cold_tier(self):
+        """Test that a flushed store reopens with the same contents."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "holders.sqlite")
+            store = TieredStore(path, max_hot=3)
+            store.update({"A": 1, "B": 2, "C": 3, "D": 4})
+            store.close()
+            
+            reopened = TieredStore(path, max_hot=3)
+            self.assertEqual(dict(reopened.items()), {"A": 1, "B": 2, "C": 3, "D": 4})
+            self.assertEqual(reopened.hot_size, 0)
+            reopened.close()
+    
+    def test_scan_survives_tier_changes(self):
+        """Test that evictions and promotions during a scan never repeat or drop an address."""
+        seen = []
+        for address, _ in self.store._scan(page_size=10):
+            seen.append(address)
+            if len(seen) == 15:
+                # Promote cold addresses and evict others mid-scan
+                for i in range(0, 100, 3):
+                    self.store[f"ADDR_{i:03d}"]
+                self.store["ZZZ_NEW"] = 1
+        
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), {f"ADDR_{i:03d}" for i in range(100)} | {"ZZZ_NEW"})
+    
+    def test_unflushed_writes_survive_crash(self):
+        """Test that hot entries are durable without flush()."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "holders.sqlite")
+            store = TieredStore(path, max_hot=3)
+            store.update({"A": 1, "B": 2, "C": 3, "D": 4})
+            store["A"] = 10
+            store["B"] = 0
+            
+            # Reopened while the first store is abandoned without flush()
+            reopened = TieredStore(path, max_hot=3)
+            self.assertEqual(dict(reopened.items()), {"A": 10, "C": 3, "D": 4})
+            self.assertEqual(len(reopened), 3)
+            reopened.close()
+            store.close()
+    
+    @patch('digital_marketplace.utils.get_algo_price_usdt', return_value=0.25)
+    def test_contract_staking_over_tiered_state(self, mock_price):
+        """Test a staking run over tiered balances."""
+        contract = DigitalMarketplace(MagicMock(), "CREATOR", "KEY", "handle", clock=lambda: 0)
+        contract.token_holders = {f"HOLDER_{i}": (i + 1) * 10 ** 12 for i in range(50)}
+        contract.token_holders["EMPTY"] = 0
+        expected = DigitalMarketplace(MagicMock(), "CREATOR", "KEY", "handle", clock=lambda: 86400)
+        expected.token_holders = dict(contract.token_holders)
+        expected.last_staking_calculation = 0
+        expected.calculate_staking_rewards()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            balances, rewards = enable_tiering(contract, tmp, max_hot=8)
+            contract.clock = lambda: 86400
+            contract.calculate_staking_rewards()
+            
+            self.assertNotIn("EMPTY", balances)
+            self.assertLessEqual(rewards.hot_size, 8)
+            self.assertEqual(dict(rewards.items()), expected.staking_rewards)
+            balances.close()
+            rewards.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests for the multiversion token ledger.
+"""
+import contextlib
+import io
+import unittest
+
+from algosdk import account
+
+from digital_marketplace.contract import DigitalMarketplace
+from digital_marketplace.simulator import LocalAlgodClient
+from digital_marketplace.versioning import PrunedRoundError, VersionedLedger
+
+class TestVersionedLedger(unittest.TestCase):
+    """Test cases for point-in-time balance queries."""
+    
+    def setUp(self):
+        """Set up balance changes over rounds 10 to 40."""
+        self.ledger = VersionedLedger()
+        self.ledger.record("ALICE", 100, 10, timestamp=1000)
+        self.ledger.record("BOB", 50, 20, timestamp=1100)
+        self.ledger.record("ALICE", 70, 20, timestamp=1100)
+        self.ledger.record("ALICE", 60, 20, timestamp=1100)
+        self.ledger.record("BOB", 0, 30, timestamp=1200)
+        self.ledger.record("ALICE", 90, 40, timestamp=1300)
+    
+    def test_balance_as_of_round(self):
+        """Test lookups between, at and around recorded rounds."""
+        self.assertEqual(self.ledger.balance_as_of("ALICE", 9), 0)
+        self.assertEqual(self.ledger.balance_as_of("ALICE", 10), 100)
+        self.assertEqual(self.ledger.balance_as_of("ALICE", 25), 60)
+        self.assertEqual(self.ledger.balance_as_of("ALICE", 1000), 90)
+        self.assertEqual(self.ledger.balance_as_of("BOB", 29), 50)
+        self.assertEqual(self.ledger.balance_as_of("CAROL", 29), 0)
+        # Two changes in round 20 keep only the last
+        self.assertEqual(list(self.ledger.history("ALICE")), [(10, 100), (20, 60), (40, 90)])
+    
+    def test_snapshot_and_time_queries(self):
+        """Test bulk snapshots and timestamp lookups."""
+        self.assertEqual(self.ledger.snapshot(20), {"ALICE": 60, "BOB": 50})
+        self.assertEqual(self.ledger.snapshot(30), {"ALICE": 60})
+        self.assertEqual(self.ledger.round_at(1150), 20)
+        self.assertEqual(self.ledger.balance_at_time("BOB", 1199), 50)
+        self.assertEqual(self.ledger.balance_at_time("BOB", 999), 0)
+    
+    def test_prune_keeps_queries_after_horizon(self):
+        """Test that pruning drops old versions but keeps later answers."""
+        dropped = self.ledger.prune(30)
+        
+        # ALICE's round 10 version and all of BOB, who is empty since 30
+        self.assertEqual(dropped, 1 + 2)
+        self.assertEqual(list(self.ledger.addresses()), ["ALICE"])
+        self.assertEqual(self.ledger.balance_as_of("ALICE", 30), 60)
+        self.assertEqual(self.ledger.snapshot(40), {"ALICE": 90})
+        with self.assertRaises(PrunedRoundError):
+            self.ledger.balance_as_of("ALICE", 29)
+    
+    def test_retention_prunes_automatically(self):
+        """Test that old rounds fall out of a bounded ledger."""
+        ledger = VersionedLedger(retention_rounds=10)
+        for round_num in range(1, 101):
+            ledger.record("ALICE", round_num, round_num)
+        
+        self.assertLessEqual(len(ledger), 20)
+        self.assertEqual(ledger.balance_as_of("ALICE", 95), 95)
+        self.assertGreaterEqual(ledger.horizon, 80)
+        # Changes without a round and late confirmations keep round order
+        self.assertEqual(ledger.record("BOB", 5), 100)
+        self.assertEqual(ledger.record("BOB", 7, 50), 100)
+        self.assertEqual(ledger.balance_as_of("BOB", 100), 7)
+    
+    def test_contract_records_confirmed_rounds(self):
+        """Test that contract balance changes are versioned by round."""
+        creator_key, creator = account.generate_account()
+        ledger = VersionedLedger()
+        contract = DigitalMarketplace(LocalAlgodClient(first_round=500), creator, creator_key,
+                                      "octocat", versioned_ledger=ledger)
+        with contextlib.redirect_stdout(io.StringIO()):
+            contract.create_token()
+        
+        self.assertEqual(ledger.balance_as_of(creator, 500), contract.token_holders[creator])
+        self.assertEqual(ledger.balance_as_of(creator, 499), 0)
+
+if __name__ == "__main__":
+    unittest.main()